@@ -0,0 +1,70 @@
+"""
+Startup time of ``import bq_loader`` and of the batch CLI.
+
+Every run starts a fresh interpreter with ``-X importtime``. The median
+cumulative import time of the package, the modules with the largest own
+import time and the wall time of ``python -m bq_loader --help`` are printed.
+The run fails if a heavy library, e.g. the BigQuery client, is imported
+together with the package or the median exceeds ``--budget-ms``.
+
+Usage: python -m benchmarks.bench_import [--runs 10] [--budget-ms 300] [--top 10]
+"""
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+HEAVY_MODULES = ('google.cloud.bigquery', 'google.cloud.storage', 'google.api_core.exceptions',
+                 'concurrent.futures.process', 'requests', 'inquirer', 'google_crc32c')
+
+
+def import_times(module: str) -> dict:
+    """
+    Returns the own and cumulative import time in microseconds of every
+    module which is imported together with the module.
+    """
+
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                             capture_output=True, text=True, check=True)
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+
+def cli_seconds() -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-m', 'bq_loader', '--help'], capture_output=True, check=True)
+    return time.perf_counter() - start
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, default=300)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    runs = [import_times('bq_loader') for _ in range(args.runs)]
+    package = statistics.median(times['bq_loader'][1] for times in runs) / 1000
+    cli = statistics.median(cli_seconds() for _ in range(args.runs)) * 1000
+
+    print(f'import bq_loader:           {package:8.1f} ms')
+    print(f'python -m bq_loader --help: {cli:8.1f} ms')
+    print()
+    for name, (own, cumulative) in sorted(runs[-1].items(), key=lambda item: item[1][0], reverse=True)[:args.top]:
+        print(f'{own / 1000:8.1f} ms {cumulative / 1000:8.1f} ms  {name}')
+
+    heavy = sorted(name for name in runs[-1] if name.startswith(HEAVY_MODULES))
+    if heavy:
+        print(f'\nHeavy modules imported with bq_loader: {", ".join(heavy)}')
+
+    return 1 if heavy or package > args.budget_ms else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""
+Per-file overhead of resolving the BigQuery client and the LoadJobConfig.
+
+The uncached variant mirrors the former behaviour of ``JobConfig``, which
+created a new client and re-parsed the schema file for every file. Client
+construction uses anonymous credentials, so no Google account is needed.
+
+Usage: python -m benchmarks.bench_job_config [n_files]
+"""
+import sys
+import json
+import time
+import tempfile
+from unittest import mock
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import bigquery
+from google.cloud.bigquery import LoadJobConfig
+from bq_loader import JobConfig
+from bq_loader.clients import clear_caches
+
+
+Client = bigquery.Client
+
+
+def anonymous_client(*args, **kwargs):
+    return Client(project='bench', credentials=AnonymousCredentials())
+
+
+def uncached_config(job_config: JobConfig) -> LoadJobConfig:
+    client = anonymous_client()
+    config = LoadJobConfig()
+    config.source_format = bigquery.SourceFormat.NEWLINE_DELIMITED_JSON
+    config.schema = client.schema_from_json(job_config.schema_file_path)
+    return config
+
+
+def main(n_files: int = 1000) -> None:
+    schema = [{'name': f'field_{i}', 'type': 'STRING', 'mode': 'NULLABLE'} for i in range(50)]
+
+    with tempfile.NamedTemporaryFile('w', suffix='.json') as schema_file:
+        json.dump(schema, schema_file)
+        schema_file.flush()
+
+        job_config = JobConfig(project_id='bench',
+                               dataset_id='bench',
+                               schema_file_path=schema_file.name,
+                               source_format='jsonl')
+
+        start = time.perf_counter()
+        for _ in range(n_files):
+            anonymous_client()
+            uncached_config(job_config)
+        before = (time.perf_counter() - start) / n_files
+
+        clear_caches()
+        with mock.patch('google.cloud.bigquery.Client', anonymous_client):
+            start = time.perf_counter()
+            for _ in range(n_files):
+                job_config.client
+                job_config.config
+            after = (time.perf_counter() - start) / n_files
+
+    print(f'uncached: {before * 1e6:10.1f} us/file')
+    print(f'cached:   {after * 1e6:10.1f} us/file')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,191 @@
+"""
+Throughput and latency of ``create_table_from_local``, ``create_table_from_bucket``
+and ``upload_files_to_bucket`` against local fake BigQuery and Cloud Storage
+backends, across file counts, file sizes and concurrency settings.
+
+Every scenario is written as one record to a JSON results file. With
+``--baseline`` the throughput of each scenario is compared with an earlier
+results file and the run fails if it dropped by more than ``--tolerance``.
+The throughput of scenarios which upload the files is measured in MB/s,
+that of ``create_table_from_bucket``, which only runs a load job on blobs
+already in the bucket, in jobs/s.
+
+Usage: python -m benchmarks.bench_suite [--files 10 100] [--sizes 65536 1048576]
+       [--concurrency 4 16] [--latency 0.02] [--bandwidth BYTES_PER_S]
+       [--error-rate 0.0] [--output results.json] [--baseline baseline.json]
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import platform
+import contextlib
+from unittest import mock
+from bq_loader import create_table_from_local, create_table_from_bucket, upload_files_to_bucket, RunMetrics
+from benchmarks.fake_gcs import FakeGCSServer
+from benchmarks.fake_bigquery import FakeBigQueryClient
+
+SCHEMA = [{'name': 'value', 'type': 'STRING', 'mode': 'NULLABLE'}]
+
+
+def write_files(directory: str, n_files: int, file_size: int) -> None:
+    line = b'{"value": "' + b'x' * 100 + b'"}\n'
+    data = line * (file_size // len(line) + 1)
+    for i in range(n_files):
+        with open(os.path.join(directory, f'{i}.jsonl'), 'wb') as file:
+            file.write(data[:file_size])
+
+
+UPLOADS_BYTES = {'create_table_from_local': True, 'upload_files_to_bucket': True, 'create_table_from_bucket': False}
+
+
+def record(function: str, n_files: int, file_size: int, concurrency: int,
+           seconds: float, metrics: RunMetrics, errors: int) -> dict:
+    report = metrics.report()
+    latency = {phase: {'mean_seconds': entry['seconds'] / entry['count'], 'max_seconds': entry['max_seconds']}
+               for phase, entry in report['phases'].items()}
+    jobs_per_second = report['jobs']['count'] / seconds
+    if UPLOADS_BYTES[function]:
+        mb_per_second = n_files * file_size / seconds / 1024 ** 2
+        throughput, unit = mb_per_second, 'MB/s'
+    else:
+        mb_per_second = None
+        throughput, unit = jobs_per_second, 'jobs/s'
+    return {'function': function,
+            'n_files': n_files,
+            'file_size': file_size,
+            'concurrency': concurrency,
+            'seconds': seconds,
+            'files_per_second': n_files / seconds,
+            'jobs_per_second': jobs_per_second,
+            'mb_per_second': mb_per_second,
+            'throughput': throughput,
+            'unit': unit,
+            'errors': errors,
+            'latency': latency}
+
+
+def run_local(directory: str, schema_path: str, bigquery_client: FakeBigQueryClient, concurrency: int) -> tuple:
+    metrics = RunMetrics()
+    errors = bigquery_client.errors
+    with mock.patch('bq_loader.get_bigquery_client', lambda: bigquery_client):
+        start = time.perf_counter()
+        with contextlib.suppress(Exception):
+            create_table_from_local('bench', 'bench', 'bench', os.path.join(directory, '*'), schema_path, 'jsonl',
+                                    max_uploads=concurrency, metrics=metrics)
+        seconds = time.perf_counter() - start
+    return seconds, metrics, bigquery_client.errors - errors
+
+
+def run_bucket(schema_path: str, bigquery_client: FakeBigQueryClient) -> tuple:
+    metrics = RunMetrics()
+    errors = bigquery_client.errors
+    with mock.patch('bq_loader.get_bigquery_client', lambda: bigquery_client):
+        start = time.perf_counter()
+        create_table_from_bucket('gs://bench/bench/*', 'bench', 'bench', 'bench', schema_path, 'jsonl',
+                                 metrics=metrics)
+        seconds = time.perf_counter() - start
+    return seconds, metrics, bigquery_client.errors - errors
+
+
+def run_upload(directory: str, server: FakeGCSServer, concurrency: int) -> tuple:
+    metrics = RunMetrics()
+    errors = server.errors
+    client = server.client()
+    with mock.patch('bq_loader.get_storage_client', lambda: client):
+        start = time.perf_counter()
+        with contextlib.suppress(Exception):
+            upload_files_to_bucket('bench', os.path.join(directory, '*'), 'bench',
+                                   max_workers=concurrency, metrics=metrics)
+        seconds = time.perf_counter() - start
+    return seconds, metrics, server.errors - errors
+
+
+def compare(results: list, baseline: list, tolerance: float) -> list:
+    """
+    Returns the scenarios whose throughput dropped by more than the tolerance.
+    Results are only compared with a baseline in the same unit.
+    """
+
+    def key(result: dict) -> tuple:
+        return result['function'], result['n_files'], result['file_size'], result['concurrency']
+
+    previous = {key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(key(result))
+        if before and before.get('unit') == result['unit'] \
+                and result['throughput'] < before['throughput'] * (1 - tolerance):
+            regressions.append((result, before))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--files', type=int, nargs='+', default=[10, 100])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[64 * 1024, 1024 ** 2])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[4, 16])
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--bandwidth', type=float, default=None)
+    parser.add_argument('--queue-seconds', type=float, default=0.1)
+    parser.add_argument('--execution-seconds', type=float, default=0.5)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', default=None)
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as schema_dir, \
+            FakeGCSServer(latency=args.latency, bandwidth=args.bandwidth, error_rate=args.error_rate) as server:
+        schema_path = os.path.join(schema_dir, 'schema.json')
+        with open(schema_path, 'w') as schema_file:
+            json.dump(SCHEMA, schema_file)
+
+        bigquery_client = FakeBigQueryClient(latency=args.latency,
+                                             bandwidth=args.bandwidth,
+                                             queue_seconds=args.queue_seconds,
+                                             execution_seconds=args.execution_seconds,
+                                             error_rate=args.error_rate)
+
+        for n_files in args.files:
+            for file_size in args.sizes:
+                with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+                    write_files(directory, n_files, file_size)
+                    scenarios = [('create_table_from_bucket', 1, *run_bucket(schema_path, bigquery_client))]
+                    for concurrency in args.concurrency:
+                        scenarios.append(('create_table_from_local', concurrency,
+                                          *run_local(directory, schema_path, bigquery_client, concurrency)))
+                        scenarios.append(('upload_files_to_bucket', concurrency,
+                                          *run_upload(directory, server, concurrency)))
+
+                for function, concurrency, seconds, metrics, errors in scenarios:
+                    result = record(function, n_files, file_size, concurrency, seconds, metrics, errors)
+                    results.append(result)
+                    print(f'{function:<26} {n_files:6d} x {file_size:>9d} B  c={concurrency:<3d} '
+                          f'{result["files_per_second"]:10.1f} files/s {result["throughput"]:10.1f} {result["unit"]:<6} '
+                          f'{errors:4d} errors')
+
+    with open(args.output, 'w') as output_file:
+        json.dump({'python': platform.python_version(),
+                   'platform': platform.platform(),
+                   'settings': vars(args),
+                   'results': results}, output_file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as baseline_file:
+            baseline = json.load(baseline_file)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        for result, before in regressions:
+            print(f'Regression: {result["function"]} {result["n_files"]} x {result["file_size"]} B '
+                  f'c={result["concurrency"]}: {before["throughput"]:.1f} -> {result["throughput"]:.1f} {result["unit"]}')
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
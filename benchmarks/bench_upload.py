@@ -0,0 +1,59 @@
+"""
+Throughput of ``upload_files_to_bucket`` against a local fake Cloud Storage server.
+
+The legacy engine mirrors the former implementation, a process pool sized
+to the number of cores with a new storage client per file. The thread
+engine is run with several numbers of workers.
+
+Usage: python -m benchmarks.bench_upload [n_files] [file_size] [latency]
+"""
+import io
+import os
+import sys
+import time
+import tempfile
+import contextlib
+from unittest import mock
+from multiprocessing import cpu_count
+from concurrent.futures import ProcessPoolExecutor
+from bq_loader import upload_files_to_bucket
+from benchmarks.fake_gcs import FakeGCSServer
+
+
+def legacy_upload(url: str, blob_name: str, file_path: str) -> None:
+    from google.auth.credentials import AnonymousCredentials
+    from google.cloud import storage
+    client = storage.Client(project='bench', credentials=AnonymousCredentials(),
+                            client_options={'api_endpoint': url})
+    client.bucket('bench').blob(blob_name).upload_from_filename(file_path)
+
+
+def report(name: str, n_files: int, n_bytes: int, seconds: float) -> None:
+    print(f'{name:<20} {n_files / seconds:10.1f} files/s {n_bytes / seconds / 1024 ** 2:10.1f} MB/s')
+
+
+def main(n_files: int = 200, file_size: int = 256 * 1024, latency: float = 0.02) -> None:
+    with tempfile.TemporaryDirectory() as directory, FakeGCSServer(latency=latency) as server:
+        for i in range(n_files):
+            with open(os.path.join(directory, f'{i}.jsonl'), 'wb') as file:
+                file.write(os.urandom(file_size))
+        files = [os.path.join(directory, f'{i}.jsonl') for i in range(n_files)]
+        n_bytes = n_files * file_size
+
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=cpu_count()) as executor:
+            list(executor.map(legacy_upload, [server.url] * n_files, files, files))
+        report(f'processes ({cpu_count()})', n_files, n_bytes, time.perf_counter() - start)
+
+        client = server.client()
+        for max_workers in (4, 16, 64):
+            with mock.patch('bq_loader.get_storage_client', lambda: client), \
+                    contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                upload_files_to_bucket('bench', os.path.join(directory, '*'), 'bench', max_workers=max_workers)
+                seconds = time.perf_counter() - start
+            report(f'threads ({max_workers})', n_files, n_bytes, seconds)
+
+
+if __name__ == '__main__':
+    main(*(float(arg) if '.' in arg else int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,100 @@
+"""
+An in-process stand-in for the BigQuery load job endpoints.
+
+``load_table_from_file`` reads the whole stream, limited by ``bandwidth``
+(bytes per second and upload), after ``latency`` seconds per request. The
+returned job waits ``queue_seconds`` for slots and runs ``execution_seconds``
+before it is done. A share of ``error_rate`` jobs fails with BadRequest.
+The jobs report the statistics of real load jobs, e.g. slot milliseconds.
+"""
+import time
+import random
+import itertools
+import threading
+from datetime import datetime, timedelta, timezone
+from google.api_core.exceptions import BadRequest
+
+
+class FakeLoadJob:
+
+    def __init__(self, job_id: str, size: int, queue_seconds: float, execution_seconds: float, failed: bool):
+        self.job_id = job_id
+        self.created = datetime.now(timezone.utc)
+        self.started = self.created + timedelta(seconds=queue_seconds)
+        self.ended = self.started + timedelta(seconds=execution_seconds)
+        self.errors = None
+        self.error_result = None
+        self._failed = failed
+        self._properties = {'statistics': {'totalSlotMs': str(int(execution_seconds * 1000)),
+                                           'load': {'inputFileBytes': str(size)}}}
+
+    @property
+    def state(self) -> str:
+        return 'DONE' if self.done() else 'RUNNING'
+
+    def done(self) -> bool:
+        if datetime.now(timezone.utc) < self.ended:
+            return False
+        if self._failed and self.error_result is None:
+            self.error_result = {'reason': 'invalid', 'message': 'injected error'}
+            self.errors = [self.error_result]
+        return True
+
+    def result(self):
+        delay = (self.ended - datetime.now(timezone.utc)).total_seconds()
+        if delay > 0:
+            time.sleep(delay)
+        self.done()
+        if self._failed:
+            raise BadRequest('injected error', errors=self.errors)
+        return self
+
+
+class FakeBigQueryClient:
+
+    def __init__(self,
+                 latency: float = 0.0,
+                 bandwidth: float = None,
+                 queue_seconds: float = 0.0,
+                 execution_seconds: float = 0.0,
+                 error_rate: float = 0.0,
+                 seed: int = 0):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.queue_seconds = queue_seconds
+        self.execution_seconds = execution_seconds
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.jobs = {}
+        self.bytes_received = 0
+        self.errors = 0
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def _new_job(self, size: int) -> FakeLoadJob:
+        with self._lock:
+            failed = self.random.random() < self.error_rate
+            self.errors += failed
+            job = FakeLoadJob(f'fake_job_{next(self._ids)}', size,
+                              self.queue_seconds, self.execution_seconds, failed)
+            self.jobs[job.job_id] = job
+        return job
+
+    def load_table_from_file(self, file_obj, destination, job_config=None):
+        time.sleep(self.latency)
+        size = 0
+        start = time.perf_counter()
+        while chunk := file_obj.read(1024 ** 2):
+            size += len(chunk)
+            if self.bandwidth:
+                time.sleep(max(size / self.bandwidth - (time.perf_counter() - start), 0))
+        with self._lock:
+            self.bytes_received += size
+        return self._new_job(size)
+
+    def load_table_from_uri(self, source_uris, destination, job_config=None):
+        time.sleep(self.latency)
+        return self._new_job(0)
+
+    def get_job(self, job_id):
+        return self.jobs[job_id]
@@ -0,0 +1,139 @@
+"""
+An in-process stand-in for the Cloud Storage upload endpoints.
+
+It understands multipart and resumable uploads of the JSON API, which is
+enough for ``Blob.upload_from_filename`` and ``Blob.upload_from_file``.
+Payloads are counted and discarded. ``latency`` seconds are added to every
+request and ``bandwidth`` (bytes per second and connection) limits transfers.
+A share of ``error_rate`` requests is answered with 503 Service Unavailable.
+"""
+import json
+import time
+import random
+import itertools
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import storage
+
+
+class FakeGCSServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0.0, bandwidth: float = None, error_rate: float = 0.0, seed: int = 0):
+        super().__init__(('127.0.0.1', 0), FakeGCSHandler)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.errors = 0
+        self.random = random.Random(seed)
+        self.sessions = {}
+        self.objects = {}
+        self.bytes_received = 0
+        self.lock = threading.Lock()
+        self._ids = itertools.count()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def client(self) -> storage.Client:
+        return storage.Client(project='bench',
+                              credentials=AnonymousCredentials(),
+                              client_options={'api_endpoint': self.url})
+
+    def inject_error(self) -> bool:
+        with self.lock:
+            failed = self.random.random() < self.error_rate
+            self.errors += failed
+        return failed
+
+    def new_session(self, bucket: str, name: str) -> str:
+        with self.lock:
+            upload_id = str(next(self._ids))
+            self.sessions[upload_id] = {'bucket': bucket, 'name': name, 'size': 0}
+        return upload_id
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
+class FakeGCSHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _receive(self) -> int:
+        length = int(self.headers.get('Content-Length', 0))
+        remaining = length
+        start = time.perf_counter()
+        while remaining:
+            chunk = self.rfile.read(min(remaining, 1024 ** 2))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+        if self.server.bandwidth:
+            time.sleep(max(length / self.server.bandwidth - (time.perf_counter() - start), 0))
+        with self.server.lock:
+            self.server.bytes_received += length
+        return length
+
+    def _reply(self, status: int, body: dict = None, headers: dict = None) -> None:
+        payload = json.dumps(body).encode() if body is not None else b''
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _resource(self, bucket: str, name: str, size: int) -> dict:
+        with self.server.lock:
+            self.server.objects[(bucket, name)] = size
+        return {'kind': 'storage#object', 'bucket': bucket, 'name': name, 'size': str(size)}
+
+    def do_POST(self):
+        time.sleep(self.server.latency)
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        bucket = url.path.split('/b/')[1].split('/')[0]
+        name = query.get('name', [''])[0]
+        length = self._receive()
+
+        if self.server.inject_error():
+            return self._reply(503, {'error': {'code': 503, 'message': 'injected error'}})
+
+        if query.get('uploadType') == ['resumable']:
+            upload_id = self.server.new_session(bucket, name)
+            self._reply(200, headers={'Location': f'{self.server.url}{url.path}?uploadType=resumable&upload_id={upload_id}'})
+        else:
+            self._reply(200, self._resource(bucket, name, length))
+
+    def do_PUT(self):
+        time.sleep(self.server.latency)
+        query = parse_qs(urlparse(self.path).query)
+        session = self.server.sessions[query['upload_id'][0]]
+        length = self._receive()
+
+        if self.server.inject_error():
+            return self._reply(503, {'error': {'code': 503, 'message': 'injected error'}})
+
+        byte_range, total = self.headers['Content-Range'].split(' ')[1].split('/')
+        session['size'] += length
+
+        if total != '*' and session['size'] >= int(total):
+            self._reply(200, self._resource(session['bucket'], session['name'], session['size']))
+        else:
+            self._reply(308, headers={'Range': f'bytes=0-{session["size"] - 1}'})
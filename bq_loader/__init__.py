@@ -1,12 +1,41 @@
-from google.cloud import bigquery, storage
-from google.cloud.bigquery import LoadJobConfig, SourceFormat
-from google.api_core.exceptions import BadRequest
-from multiprocessing import cpu_count
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
 import os
-import glob
+import time
+import shutil
+import mimetypes
+import tempfile
+import itertools
+import threading
 from dataclasses import dataclass
-from .utils import source_format_validator, write_disposition_validator, print_progress
+from contextlib import contextmanager, suppress
+from functools import cached_property
+from typing import List, Optional, Union, Tuple, Iterable
+from .utils import (source_format_validator, write_disposition_validator, compression_validator,
+                    partition_type_validator)
+from .pipeline import LoadPipeline, FileLoadResult
+from .clients import get_bigquery_client, get_storage_client, load_schema, configure_connection_pool
+from .coalesce import coalesce_files, FileBatch, TEXT_FORMATS
+from .compression import GzipStream
+from .manifest import Manifest, PENDING, DONE
+from .resumable import upload_file_resumable
+from .composite import upload_file_composite
+from .sync import plan_sync, HashCache
+from .validation import validate_files, ValidationReport
+from .inference import infer_schema
+from .conversion import convert_files, SUFFIXES
+from .streaming import stream_rows_to_table, StreamResult
+from .metrics import RunMetrics, PrometheusExporter, OpenTelemetryExporter
+from .spec import run_spec, load_spec, TaskResult
+from .batch import JobPoller, BucketLoadResult
+from .partition import split_by_partition, load_partitions, partition_id
+from .scheduler import Scheduler, TokenBucket, CircuitBreaker, is_transient
+from .staging import load_staged, shard_files, merge_statement
+from .discovery import discover_files, iter_files, DiscoveredFile
+from .rows import chunk_rows, load_rows, RowStream, RowChunk
+from .export import (export_table_to_bucket, export_table_to_local, download_files_from_bucket, download_blob,
+                     read_table_to_local, DownloadResult, ReadResult)
+from .plan import plan_load, plan_upload, measured_throughput, check_destination, LoadPlan, Throughput
+from .progress import Progress, ProgressBar, ProgressSnapshot, ProgressTask, resolve_progress
 
 
 @dataclass
@@ -19,22 +48,32 @@ class JobConfig:
     csv_quote_character: str = '"'
     csv_allow_quoted_newlines: bool = False
     csv_skip_leading_rows: int = 0
-    write_disposition: str = bigquery.WriteDisposition.WRITE_EMPTY
+    write_disposition: str = 'WRITE_EMPTY'
     table_description: str = ''
     ignore_unknown_values: bool = False
+    parquet_enable_list_inference: bool = False
+    avro_use_logical_types: bool = False
+    time_partitioning_type: str = None
+    time_partitioning_field: str = None
+    clustering_fields: List[str] = None
 
     @property
     def client(self):
-        client = bigquery.Client()
+        client = get_bigquery_client()
         return client
 
     @property
     def dataset(self):
+        from google.cloud import bigquery
+
         dataset = bigquery.Dataset(f'{self.project_id}.{self.dataset_id}')
         return dataset
 
-    @property
+    @cached_property
     def config(self):
+        from google.cloud import bigquery
+        from google.cloud.bigquery import LoadJobConfig, SourceFormat
+
         source_format = source_format_validator(self.source_format)
         write_disposition = write_disposition_validator(self.write_disposition)
 
@@ -43,7 +82,7 @@ class JobConfig:
         job_config.source_format=source_format
         job_config.write_disposition = write_disposition
         job_config.ignore_unknown_values=self.ignore_unknown_values
-        job_config.schema=self.client.schema_from_json(self.schema_file_path)
+        job_config.schema=load_schema(self.schema_file_path)
         job_config.destination_table_description = self.table_description
 
         if source_format == SourceFormat.CSV:
@@ -52,9 +91,50 @@ class JobConfig:
             job_config.allow_quoted_newlines = self.csv_allow_quoted_newlines
             job_config.skip_leading_rows = self.csv_skip_leading_rows
 
+        if source_format == SourceFormat.PARQUET and self.parquet_enable_list_inference:
+            parquet_options = bigquery.ParquetOptions()
+            parquet_options.enable_list_inference = True
+            job_config.parquet_options = parquet_options
+
+        if source_format == SourceFormat.AVRO and self.avro_use_logical_types:
+            job_config.use_avro_logical_types = True
+
+        partition_type = partition_type_validator(self.time_partitioning_type)
+        if partition_type or self.time_partitioning_field:
+            job_config.time_partitioning = bigquery.TimePartitioning(
+                type_=partition_type or bigquery.TimePartitioningType.DAY,
+                field=self.time_partitioning_field)
+
+        if self.clustering_fields:
+            job_config.clustering_fields = list(self.clustering_fields)
+
         return job_config
 
 
+def _counted(files: Iterable[DiscoveredFile], metrics: RunMetrics) -> Iterable[DiscoveredFile]:
+    """
+    Counts the discovered files. The seconds spent waiting for the scan are
+    observed as the 'glob' phase once the files are consumed, since the scan
+    runs while they are processed.
+    """
+
+    files = iter(files)
+    waited = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                file = next(files)
+            except StopIteration:
+                return
+            finally:
+                waited += time.perf_counter() - start
+            metrics.count('files_found')
+            yield file
+    finally:
+        metrics.observe('glob', waited)
+
+
 def create_table_from_local(table_id: str,
                             project_id: str,
                             dataset_id: str,
@@ -65,12 +145,40 @@ def create_table_from_local(table_id: str,
                             csv_quote_character: str = '"',
                             csv_allow_quoted_newlines: bool = False,
                             csv_skip_leading_rows: int = 0,
-                            write_disposition: str = bigquery.WriteDisposition.WRITE_EMPTY,
+                            write_disposition: str = 'WRITE_EMPTY',
                             table_description: str = '',
-                            ignore_unknown_values: bool = False) -> None:
+                            ignore_unknown_values: bool = False,
+                            max_uploads: int = 4,
+                            max_in_flight_bytes: int = 4 * 1024 ** 3,
+                            coalesce_bytes: int = 0,
+                            compression: str = None,
+                            manifest_path: str = None,
+                            validate: bool = False,
+                            quarantine_dir: str = None,
+                            convert_to: str = None,
+                            conversion_dir: str = None,
+                            metrics: RunMetrics = None,
+                            report_path: str = None,
+                            time_partitioning_type: str = None,
+                            time_partitioning_field: str = None,
+                            clustering_fields: List[str] = None,
+                            route_partitions: bool = False,
+                            max_partitions: int = 4,
+                            partition_dir: str = None,
+                            scheduler: Scheduler = None,
+                            staging_shards: int = 0,
+                            merge_keys: List[str] = None,
+                            include: List[str] = None,
+                            exclude: List[str] = None,
+                            dry_run: bool = False,
+                            history: List[str] = None,
+                            progress: Union[bool, Progress] = True) -> Union[List[FileLoadResult], LoadPlan]:
     """
     This function creates a table from a local file or directory.
 
+    Files are uploaded concurrently while a separate poller waits for the
+    submitted load jobs.
+
     Parameters
     ----------
     table_id: str
@@ -80,7 +188,9 @@ def create_table_from_local(table_id: str,
     dataset_id: str
         The name of the dataset in BigQuery
     file_path: str
-        The directory or file from which the table is created
+        The directory, file or path pattern from which the table is created,
+        e.g. 'data/**/*.jsonl'. Files are loaded while the directories are
+        still scanned.
     schema_file_path: str
         Path to the table schema
     source_format: str
@@ -91,41 +201,399 @@ def create_table_from_local(table_id: str,
         The table description
     ignore_unknown_values: bool
         Whether unknown values should be ignored or not
+    max_uploads: int
+        Number of concurrent uploads
+    max_in_flight_bytes: int
+        Upper bound of bytes which are uploaded at the same time
+    coalesce_bytes: int
+        If greater than 0, small jsonl or csv files are concatenated into one
+        load job per batch of about this many bytes
+    compression: str
+        If 'gzip', jsonl or csv files are compressed while they are uploaded
+    manifest_path: str
+        Path of a local run manifest. A rerun with the same manifest skips
+        files which were already loaded into the table.
+    validate: bool
+        If True, jsonl or csv files are checked against the schema before
+        anything is uploaded
+    quarantine_dir: str
+        If given together with validate, invalid rows are moved into
+        '.rejected' files in this directory and the valid rows are loaded
+    convert_to: str
+        If 'parquet' or 'avro', jsonl or csv files are converted into this
+        format with the types of the schema before they are loaded. Each
+        converted file is deleted once its load job finished.
+    conversion_dir: str
+        The directory of the converted files. A temporary directory is used
+        if not given.
+    metrics: RunMetrics
+        Collects the duration of each phase and the statistics of the load jobs
+    report_path: str
+        If given, the run report of the metrics is written to this JSON file
+    time_partitioning_type: str
+        'HOUR', 'DAY', 'MONTH' or 'YEAR'. The table is partitioned by this
+        unit of time_partitioning_field or of the ingestion time.
+    time_partitioning_field: str
+        The DATE, DATETIME or TIMESTAMP column by which the table is partitioned
+    clustering_fields: List[str]
+        Up to four columns by which the table is clustered
+    route_partitions: bool
+        If True, the rows of jsonl or csv files are split by the partition of
+        time_partitioning_field and each partition is loaded by its own job
+        into 'table$<partition id>'. With WRITE_TRUNCATE only these partitions
+        are replaced.
+    max_partitions: int
+        Number of partitions which are loaded at the same time
+    partition_dir: str
+        The directory of the split files. If not given, the files are split
+        into '<manifest_path>.partitions' with a manifest and into a
+        temporary directory without, and removed after the load.
+    scheduler: Scheduler
+        Paces the uploads and retries them after transient errors. Load jobs
+        which failed for transient reasons are requeued.
+    staging_shards: int
+        If greater than 0, the files are loaded in parallel into this many
+        staging tables, which are published to the table with one copy job
+        and deleted afterwards. The table receives either all rows or none.
+    merge_keys: List[str]
+        If given, the staging tables are merged into the table on these
+        columns instead of copied: matching rows are updated and all other
+        rows are inserted
+    include: List[str]
+        If given, only files which match one of these patterns are loaded.
+        Patterns without '/' are matched against the file name.
+    exclude: List[str]
+        Files and directories which match one of these patterns are skipped
+    dry_run: bool
+        If True, nothing is uploaded. The files are sized, the compression
+        ratio is sampled, the job configuration is checked against the table
+        and the estimated load jobs, bytes, duration and cost are printed.
+    history: List[str]
+        Paths of run reports of previous runs, from which the throughput of
+        a dry run is estimated
+    progress: Union[bool, Progress]
+        Whether a progress bar with the upload rate, the estimated time
+        remaining, the uploads in flight and the finished jobs is printed, or
+        a Progress whose callbacks receive the progress
+    Returns
+    -------
+    Union[List[FileLoadResult], LoadPlan]
+        Size, upload throughput, job id and state of each file, batch or
+        partition, or the plan of a dry run
+    Raises
+    ------
+    FileNotFoundError
+        If the file_path does not exist
+    ValueError
+        If the compression is not supported for the source format, if the
+        validation found invalid rows and no quarantine_dir is given, if
+        partitions are routed without time_partitioning_field or if staging
+        tables are combined with routed partitions or a manifest
     """
 
+    compression = compression_validator(compression)
+
+    if compression and source_format not in TEXT_FORMATS:
+        raise ValueError('Files in source format {0} cannot be compressed.'.format(source_format))
+
+    if convert_to and (compression or coalesce_bytes > 0):
+        raise ValueError('Converted files cannot be compressed or coalesced.')
+
+    if route_partitions and not time_partitioning_field:
+        raise ValueError('Partitions can only be routed by a time_partitioning_field.')
+
+    if route_partitions and (convert_to or coalesce_bytes > 0 or source_format not in TEXT_FORMATS):
+        raise ValueError('Only jsonl or csv files which are not converted or coalesced can be routed to partitions.')
+
+    staged = staging_shards > 0 or bool(merge_keys)
+    if staged and (route_partitions or manifest_path):
+        raise ValueError('Staging tables cannot be combined with routed partitions or a manifest.')
+
     job_config = JobConfig(project_id=project_id,
                            dataset_id=dataset_id,
                            schema_file_path=schema_file_path,
-                           source_format=source_format,
+                           source_format=convert_to or source_format,
                            csv_field_delimiter=csv_field_delimiter,
                            csv_quote_character=csv_quote_character,
                            csv_allow_quoted_newlines=csv_allow_quoted_newlines,
                            csv_skip_leading_rows=csv_skip_leading_rows,
                            write_disposition=write_disposition,
                            table_description=table_description,
-                           ignore_unknown_values=ignore_unknown_values)
+                           ignore_unknown_values=ignore_unknown_values,
+                           parquet_enable_list_inference=bool(convert_to),
+                           avro_use_logical_types=bool(convert_to),
+                           time_partitioning_type=time_partitioning_type,
+                           time_partitioning_field=time_partitioning_field,
+                           clustering_fields=clustering_fields)
+
+    metrics = metrics or RunMetrics()
+    scheduler = scheduler or Scheduler(metrics=metrics)
+    manifest = None
+    conversion = None
+    partitioning = None
+
+    try:
+        with metrics.timer('client'):
+            client = job_config.client
+            dataset = job_config.dataset
+            configure_connection_pool(client, max_uploads)
+
+        with metrics.timer('schema'):
+            config = job_config.config
+
+        files = discover_files(file_path, include=include, exclude=exclude)
+
+        if dry_run:
+            with metrics.timer('plan'):
+                plan = plan_load(client,
+                                 dataset.table(table_id),
+                                 config,
+                                 _counted(files, metrics),
+                                 source_format=source_format,
+                                 max_uploads=max_uploads,
+                                 compression=compression,
+                                 coalesce_bytes=coalesce_bytes,
+                                 staging_shards=staging_shards,
+                                 merge_keys=merge_keys,
+                                 throughput=measured_throughput(history))
+            if route_partitions:
+                plan.warnings.append('Routed partitions are loaded by one job per partition, which is not estimated.')
+            print(plan)
+            return plan
+
+        files = (file.path for file in _counted(files, metrics))
+
+        if validate:
+            with metrics.timer('validate'):
+                report = validate_files(list(files),
+                                        schema_file_path=schema_file_path,
+                                        source_format=source_format,
+                                        csv_field_delimiter=csv_field_delimiter,
+                                        csv_quote_character=csv_quote_character,
+                                        csv_allow_quoted_newlines=csv_allow_quoted_newlines,
+                                        csv_skip_leading_rows=csv_skip_leading_rows,
+                                        ignore_unknown_values=ignore_unknown_values,
+                                        quarantine_dir=quarantine_dir)
+
+            if not report.valid:
+                if not quarantine_dir:
+                    raise ValueError(f'Validation failed: {report}')
+                print(f'Rows quarantined in {quarantine_dir}: {report}')
+
+            files = report.files
+
+        if coalesce_bytes > 0:
+            with metrics.timer('coalesce'):
+                files = coalesce_files(files,
+                                       target_size=coalesce_bytes,
+                                       source_format=source_format,
+                                       skip_leading_rows=csv_skip_leading_rows)
+
+        if convert_to:
+            if conversion_dir is None:
+                conversion = tempfile.TemporaryDirectory()
+                conversion_dir = conversion.name
+            files = (converted for _, converted in convert_files(files,
+                                                                 schema_file_path=schema_file_path,
+                                                                 source_format=source_format,
+                                                                 target_format=convert_to,
+                                                                 output_dir=conversion_dir,
+                                                                 csv_field_delimiter=csv_field_delimiter,
+                                                                 csv_quote_character=csv_quote_character,
+                                                                 csv_skip_leading_rows=csv_skip_leading_rows))
+
+        manifest = Manifest(manifest_path) if manifest_path else None
 
-    client = job_config.client
-    dataset = job_config.dataset
+        if route_partitions:
+            if partition_dir is None:
+                if manifest_path:
+                    partitioning = f'{os.path.abspath(manifest_path)}.partitions'
+                else:
+                    partitioning = tempfile.mkdtemp()
+                partition_dir = partitioning
 
-    jobs = []
+            with metrics.timer('partition'):
+                partitions = split_by_partition(files,
+                                                partition_field=time_partitioning_field,
+                                                source_format=source_format,
+                                                output_dir=partition_dir,
+                                                partition_type=(time_partitioning_type or 'DAY').upper(),
+                                                schema=[{'name': field.name, 'type': field.field_type}
+                                                        for field in config.schema],
+                                                csv_field_delimiter=csv_field_delimiter,
+                                                csv_quote_character=csv_quote_character,
+                                                csv_skip_leading_rows=csv_skip_leading_rows)
 
-    files = glob.glob(file_path)
+            from google.cloud.bigquery import LoadJobConfig, SourceFormat
 
-    if not files:
-        raise FileNotFoundError('No such file or directory: {0}'.format(file_path))
+            partition_config = LoadJobConfig.from_api_repr(config.to_api_repr())
+            if partition_config.source_format == SourceFormat.CSV:
+                partition_config.skip_leading_rows = 0
 
-    for file in files:
-        with open(os.path.abspath(file), 'rb') as source_file:
-            job = client.load_table_from_file(source_file,
-                                              dataset.table(table_id),
-                                              job_config=job_config.config)
+            with metrics.timer('load'):
+                return load_partitions(client,
+                                       dataset.table(table_id),
+                                       partition_config,
+                                       partitions,
+                                       max_partitions=max_partitions,
+                                       max_in_flight_bytes=max_in_flight_bytes,
+                                       compression=compression,
+                                       manifest=manifest,
+                                       metrics=metrics,
+                                       scheduler=scheduler,
+                                       progress=progress)
 
-            jobs.append(job)
+        if staged:
+            with metrics.timer('load'):
+                return load_staged(client,
+                                   dataset.table(table_id),
+                                   config,
+                                   files,
+                                   shards=staging_shards or max_uploads,
+                                   merge_keys=merge_keys,
+                                   max_uploads=max_uploads,
+                                   max_in_flight_bytes=max_in_flight_bytes,
+                                   compression=compression,
+                                   metrics=metrics,
+                                   scheduler=scheduler,
+                                   progress=progress)
 
-    for n, job in enumerate(jobs, start=1):
-        print_progress(n/len(jobs))
-        job.result()
+        pipeline = LoadPipeline(client,
+                                dataset.table(table_id),
+                                config,
+                                max_uploads=max_uploads,
+                                max_in_flight_bytes=max_in_flight_bytes,
+                                compression=compression,
+                                manifest=manifest,
+                                metrics=metrics,
+                                scheduler=scheduler,
+                                progress=progress,
+                                delete_loaded=bool(convert_to))
+
+        with metrics.timer('load'):
+            return pipeline.run(files)
+    finally:
+        if manifest is not None:
+            manifest.close()
+        if conversion is not None:
+            conversion.cleanup()
+        if partitioning is not None:
+            shutil.rmtree(partitioning, ignore_errors=True)
+        if report_path:
+            metrics.write_report(report_path)
+
+
+def create_table_from_rows(rows,
+                           table_id: str,
+                           project_id: str,
+                           dataset_id: str,
+                           schema_file_path: str,
+                           write_disposition: str = 'WRITE_EMPTY',
+                           table_description: str = '',
+                           ignore_unknown_values: bool = False,
+                           chunk_size: int = 10000,
+                           workers: int = 4,
+                           rows_per_job: int = None,
+                           time_partitioning_type: str = None,
+                           time_partitioning_field: str = None,
+                           clustering_fields: List[str] = None,
+                           metrics: RunMetrics = None,
+                           report_path: str = None) -> List[FileLoadResult]:
+    """
+    This function creates a table from rows in memory without writing files.
+
+    The rows are serialized in chunks on background threads while they are
+    uploaded to the load job: dicts and DataFrames as newline delimited
+    JSON, Arrow tables and record batches as Parquet. Only a few chunks are
+    held in memory at a time, so generators of any length can be loaded.
+
+    Parameters
+    ----------
+    rows: Union[Iterable[dict], DataFrame, pyarrow.Table, Iterable[Union[DataFrame, pyarrow.Table, pyarrow.RecordBatch]]]
+        The rows as dicts, a pandas DataFrame, an Arrow table or an iterable
+        of DataFrames, Arrow tables or record batches
+    table_id: str
+        The name of the table
+    project_id: str
+        The name of the project in BigQuery
+    dataset_id: str
+        The name of the dataset in BigQuery
+    schema_file_path: str
+        Path to the table schema
+    write_disposition: str
+        Describes whether a job should overwrite or append the existing destination table if it already exists
+    table_description: str
+        The table description
+    ignore_unknown_values: bool
+        Whether unknown values should be ignored or not
+    chunk_size: int
+        Number of rows which are serialized at once
+    workers: int
+        Number of threads which serialize chunks in parallel
+    rows_per_job: int
+        If given, a new load job is started after about this many rows and
+        the write disposition only applies to the first job
+    time_partitioning_type: str
+        'HOUR', 'DAY', 'MONTH' or 'YEAR'. The table is partitioned by this
+        unit of time_partitioning_field or of the ingestion time.
+    time_partitioning_field: str
+        The DATE, DATETIME or TIMESTAMP column by which the table is partitioned
+    clustering_fields: List[str]
+        Up to four columns by which the table is clustered
+    metrics: RunMetrics
+        Collects the duration of each phase and the statistics of the load jobs
+    report_path: str
+        If given, the run report of the metrics is written to this JSON file
+    Returns
+    -------
+    List[FileLoadResult]
+        Bytes, upload throughput, job id and state of each load job
+    Raises
+    ------
+    TypeError
+        If the rows are of an unsupported type or of different types
+    """
+
+    metrics = metrics or RunMetrics()
+    chunks = chunk_rows(rows, chunk_size)
+
+    try:
+        head = next(chunks, None)
+        if head is None:
+            print('No rows to load.')
+            return []
+
+        source_format = 'parquet' if head.kind == 'arrow' else 'jsonl'
+        job_config = JobConfig(project_id=project_id,
+                               dataset_id=dataset_id,
+                               schema_file_path=schema_file_path,
+                               source_format=source_format,
+                               write_disposition=write_disposition,
+                               table_description=table_description,
+                               ignore_unknown_values=ignore_unknown_values,
+                               parquet_enable_list_inference=source_format == 'parquet',
+                               time_partitioning_type=time_partitioning_type,
+                               time_partitioning_field=time_partitioning_field,
+                               clustering_fields=clustering_fields)
+
+        with metrics.timer('client'):
+            client = job_config.client
+            dataset = job_config.dataset
+
+        with metrics.timer('schema'):
+            config = job_config.config
+
+        with metrics.timer('load'):
+            return load_rows(client,
+                             dataset.table(table_id),
+                             config,
+                             itertools.chain([head], chunks),
+                             workers=workers,
+                             rows_per_job=rows_per_job,
+                             metrics=metrics)
+    finally:
+        if report_path:
+            metrics.write_report(report_path)
 
 
 def create_table_from_bucket(uri: str,
@@ -138,9 +606,15 @@ def create_table_from_bucket(uri: str,
                              csv_quote_character: str = '"',
                              csv_allow_quoted_newlines: bool = False,
                              csv_skip_leading_rows: int = 0,
-                             write_disposition: str = bigquery.WriteDisposition.WRITE_EMPTY,
+                             write_disposition: str = 'WRITE_EMPTY',
                              table_description: str = '',
-                             ignore_unknown_values: bool = False) -> None:
+                             ignore_unknown_values: bool = False,
+                             metrics: RunMetrics = None,
+                             report_path: str = None,
+                             time_partitioning_type: str = None,
+                             time_partitioning_field: str = None,
+                             clustering_fields: List[str] = None,
+                             raise_errors: bool = False) -> None:
     """
     This function creates a table from a Google Bucket.
 
@@ -167,17 +641,32 @@ def create_table_from_bucket(uri: str,
         The table description
     ignore_unknown_values: bool
         Whether unknown values should be ignored or not
+    metrics: RunMetrics
+        Collects the duration of each phase and the statistics of the load job
+    report_path: str
+        If given, the run report of the metrics is written to this JSON file
+    time_partitioning_type: str
+        'HOUR', 'DAY', 'MONTH' or 'YEAR'. The table is partitioned by this
+        unit of time_partitioning_field or of the ingestion time.
+    time_partitioning_field: str
+        The DATE, DATETIME or TIMESTAMP column by which the table is partitioned
+    clustering_fields: List[str]
+        Up to four columns by which the table is clustered
+    raise_errors: bool
+        If True, a failed load job raises its error after it was printed
     Raises
     ------
     ValueError
         If the URI does not start with 'gs://'
     BadRequest
-        If the creation of the table failed
+        If the creation of the table failed and raise_errors is True
     """
 
     if not uri.startswith('gs://'):
         raise ValueError('URI must start with gs://')
 
+    from google.api_core.exceptions import BadRequest
+
     job_config = JobConfig(project_id=project_id,
                            dataset_id=dataset_id,
                            schema_file_path=schema_file_path,
@@ -188,34 +677,210 @@ def create_table_from_bucket(uri: str,
                            csv_skip_leading_rows=csv_skip_leading_rows,
                            write_disposition=write_disposition,
                            table_description=table_description,
-                           ignore_unknown_values=ignore_unknown_values)
+                           ignore_unknown_values=ignore_unknown_values,
+                           time_partitioning_type=time_partitioning_type,
+                           time_partitioning_field=time_partitioning_field,
+                           clustering_fields=clustering_fields)
+
+    metrics = metrics or RunMetrics()
 
-    client = job_config.client
-    dataset = job_config.dataset
+    with metrics.timer('client'):
+        client = job_config.client
+        dataset = job_config.dataset
+
+    with metrics.timer('schema'):
+        config = job_config.config
 
     load_job = None
 
     try:
-        load_job = client.load_table_from_uri(uri,
-                                              dataset.table(table_id),
-                                              job_config=job_config.config)
+        with metrics.timer('submit'):
+            load_job = client.load_table_from_uri(uri,
+                                                  dataset.table(table_id),
+                                                  job_config=config)
 
-        result = load_job.result()
+        with metrics.timer('job_wait'):
+            result = load_job.result()
 
         print(f'Load BigQuery table result.state={result.state}')
     except BadRequest as e:
         print(f'Load bigquery table failed: {e}.')
         if load_job:
             print(f'Error collection:\n{load_job.errors}')
+        if raise_errors:
+            raise
+    finally:
+        if load_job is not None:
+            metrics.record_job(load_job)
+        if report_path:
+            metrics.write_report(report_path)
+
+
+def create_tables_from_bucket(loads: Iterable[Union[Tuple[str, str], dict]],
+                              project_id: str,
+                              dataset_id: str,
+                              schema_file_path: str,
+                              source_format: str,
+                              csv_field_delimiter: str = ',',
+                              csv_quote_character: str = '"',
+                              csv_allow_quoted_newlines: bool = False,
+                              csv_skip_leading_rows: int = 0,
+                              write_disposition: str = 'WRITE_EMPTY',
+                              table_description: str = '',
+                              ignore_unknown_values: bool = False,
+                              max_jobs: int = 50,
+                              min_poll_interval: float = 0.5,
+                              max_poll_interval: float = 10.0,
+                              metrics: RunMetrics = None,
+                              report_path: str = None,
+                              scheduler: Scheduler = None,
+                              progress: Union[bool, Progress] = True) -> List[BucketLoadResult]:
+    """
+    This function creates many tables from Google Buckets at the same time.
+
+    Up to ``max_jobs`` load jobs run at the same time. All running jobs are
+    polled together and the poll interval backs off while no job finishes.
+    A failed job does not stop the other jobs; its error and
+    ``load_job.errors`` are collected in its result.
+
+    Parameters
+    ----------
+    loads: Iterable[Union[Tuple[str, str], dict]]
+        Pairs of a URI and a table id, or dictionaries with the keys 'uri' and
+        'table_id' and optionally any other parameter of this function, e.g.
+        'schema_file_path', which overrides the common value for this table
+    project_id: str
+        The name of the project in BigQuery
+    dataset_id: str
+        The name of the dataset in BigQuery
+    schema_file_path: str
+        Path to the table schema
+    source_format: str
+        The file format
+    write_disposition: str
+        Describes whether a job should overwrite or append the existing destination table if it already exists
+    table_description: str
+        The table description
+    ignore_unknown_values: bool
+        Whether unknown values should be ignored or not
+    max_jobs: int
+        Number of load jobs which run at the same time
+    min_poll_interval: float
+        Seconds between two polls while jobs finish
+    max_poll_interval: float
+        Upper bound of the seconds between two polls
+    metrics: RunMetrics
+        Collects the submit and wait times and the statistics of the load jobs
+    report_path: str
+        If given, the run report of the metrics is written to this JSON file
+    scheduler: Scheduler
+        Paces the submissions and retries them after transient errors. Jobs
+        which failed for transient reasons are requeued.
+    progress: Union[bool, Progress]
+        Whether a progress bar with the finished jobs is printed, or a
+        Progress which counts the submitted and finished jobs
+    Returns
+    -------
+    List[BucketLoadResult]
+        Job id, state, duration and errors of each load in the given order
+    Raises
+    ------
+    ValueError
+        If a URI does not start with 'gs://'
+    """
+
+    common = {'project_id': project_id,
+              'dataset_id': dataset_id,
+              'schema_file_path': schema_file_path,
+              'source_format': source_format,
+              'csv_field_delimiter': csv_field_delimiter,
+              'csv_quote_character': csv_quote_character,
+              'csv_allow_quoted_newlines': csv_allow_quoted_newlines,
+              'csv_skip_leading_rows': csv_skip_leading_rows,
+              'write_disposition': write_disposition,
+              'table_description': table_description,
+              'ignore_unknown_values': ignore_unknown_values}
+
+    metrics = metrics or RunMetrics()
+
+    submissions = []
+    with metrics.timer('schema'):
+        for load in loads:
+            load = dict(load) if isinstance(load, dict) else {'uri': load[0], 'table_id': load[1]}
+            uri, table_id = load.pop('uri'), load.pop('table_id')
+
+            if not uri.startswith('gs://'):
+                raise ValueError('URI must start with gs://')
+
+            job_config = JobConfig(**{**common, **load})
+            config = job_config.config
+            destination = job_config.dataset.table(table_id)
+
+            def submit(uri=uri, destination=destination, config=config):
+                return client.load_table_from_uri(uri, destination, job_config=config)
+
+            submissions.append((BucketLoadResult(uri=uri, table_id=table_id), submit))
+
+    with metrics.timer('client'):
+        client = get_bigquery_client()
+
+    poller = JobPoller(max_jobs=max_jobs,
+                       min_poll_interval=min_poll_interval,
+                       max_poll_interval=max_poll_interval,
+                       progress=progress,
+                       metrics=metrics,
+                       scheduler=scheduler)
+
+    try:
+        with metrics.timer('load'):
+            results = poller.run(submissions)
+    finally:
+        if report_path:
+            metrics.write_report(report_path)
+
+    for result in results:
+        if result.error is not None:
+            print(f'Load of {result.uri} into {result.table_id} failed: {result.error}.')
+            if result.errors:
+                print(f'Error collection:\n{result.errors}')
+
+    return results
 
 
 def upload_files_to_bucket(bucket_name: str,
                            file_path: str,
                            gcb_dir: str,
-                           max_processes: int = cpu_count()) -> None:
+                           max_workers: int = 32,
+                           compression: str = None,
+                           manifest_path: str = None,
+                           composite_threshold: int = None,
+                           composite_chunk_size: int = 256 * 1024 ** 2,
+                           sync: bool = False,
+                           delete_orphans: bool = False,
+                           hash_cache_path: str = None,
+                           convert_to: str = None,
+                           schema_file_path: str = None,
+                           source_format: str = None,
+                           conversion_dir: str = None,
+                           csv_field_delimiter: str = ',',
+                           csv_quote_character: str = '"',
+                           csv_skip_leading_rows: int = 0,
+                           max_processes: int = None,
+                           metrics: RunMetrics = None,
+                           report_path: str = None,
+                           scheduler: Scheduler = None,
+                           include: List[str] = None,
+                           exclude: List[str] = None,
+                           dry_run: bool = False,
+                           history: List[str] = None,
+                           progress: Union[bool, Progress] = True) -> Optional[LoadPlan]:
     """
     This function uploads files into a Google Bucket.
 
+    Uploads are I/O bound, so they run on a thread pool which shares one
+    storage client and its HTTP connection pool. The number of concurrent
+    uploads is independent of the number of cores.
+
     Code of this function is inspired by:
     https://github.com/The-Academic-Observatory/observatory-platform/blob/develop/observatory-platform/observatory/platform/utils/gc_utils.py
 
@@ -224,41 +889,236 @@ def upload_files_to_bucket(bucket_name: str,
     bucket_name: str
          The name of your Google Bucket
     file_path: str
-        The directory or file which should be uploaded
+        The directory, file or path pattern which should be uploaded, e.g.
+        'data/**/*.jsonl'. Files are uploaded while the directories are still
+        scanned. The blob names are the paths relative to the directory in
+        which the pattern starts, e.g. '<gcb_dir>/2021/01/a.jsonl'.
     gcb_dir: str
         The name of the destination directory in the Google Bucket
+    max_workers: int
+        Number of concurrent uploads
+    compression: str
+        If 'gzip', files are compressed while they are uploaded and '.gz' is
+        appended to their blob names
+    manifest_path: str
+        Path of a local run manifest. A rerun with the same manifest skips
+        files which were already uploaded and resumes interrupted uploads.
+    composite_threshold: int
+        If given, uncompressed files larger than this many bytes are uploaded
+        in parallel parts which are composed into the blob
+    composite_chunk_size: int
+        Number of bytes per part of a composite upload
+    sync: bool
+        If True, the blobs in gcb_dir are listed and only files which are
+        missing or differ in size or CRC32C checksum are uploaded
+    delete_orphans: bool
+        If True in sync mode, blobs in gcb_dir without a local file are deleted
+    hash_cache_path: str
+        Path of a JSON file which caches local checksums between sync runs
+    convert_to: str
+        If 'parquet' or 'avro', jsonl or csv files are converted into this
+        format before they are uploaded. Requires schema_file_path and
+        source_format. The suffix of the blob names is replaced. Each
+        converted file is deleted once it was uploaded.
+    schema_file_path: str
+        Path to the table schema which defines the types of converted files
+    source_format: str
+        The format of the files which are converted, 'jsonl' or 'csv'
+    conversion_dir: str
+        The directory of the converted files. A temporary directory is used
+        if not given.
+    csv_field_delimiter: str
+        The field delimiter of csv files which are converted
+    csv_quote_character: str
+        The quote character of csv files which are converted
+    csv_skip_leading_rows: int
+        Number of header rows of csv files which are converted, which are not
+        part of the converted files
     max_processes: int
-        Number of concurrent tasks
+        Deprecated alias of max_workers
+    metrics: RunMetrics
+        Collects the duration of each phase and the number of uploaded files and bytes
+    report_path: str
+        If given, the run report of the metrics is written to this JSON file
+    scheduler: Scheduler
+        Paces the uploads and retries them after transient errors. A failed
+        upload does not stop the others.
+    include: List[str]
+        If given, only files which match one of these patterns are uploaded.
+        Patterns without '/' are matched against the file name.
+    exclude: List[str]
+        Files and directories which match one of these patterns are skipped
+    dry_run: bool
+        If True, nothing is uploaded. The files are sized, the compression
+        ratio is sampled and the estimated bytes, requests, duration and
+        cost are printed.
+    history: List[str]
+        Paths of run reports of previous runs, from which the throughput of
+        a dry run is estimated
+    progress: Union[bool, Progress]
+        Whether a progress bar with the upload rate, the estimated time
+        remaining and the uploads in flight is printed, or a Progress whose
+        callbacks receive the progress. Without progress, one line is printed
+        per file.
+    Returns
+    -------
+    LoadPlan
+        The plan of a dry run, otherwise None
     Raises
     ------
     FileNotFoundError
         If the file_path does not exist
+    ValueError
+        If sync is combined with compression or conversion
+    Exception
+        The first error of an upload, after all other files have been uploaded
     """
 
-    files = glob.glob(file_path)
+    compression = compression_validator(compression)
 
-    if not files:
-        raise FileNotFoundError('No such file or directory: {0}'.format(file_path))
+    if sync and (compression or convert_to):
+        raise ValueError('Compressed or converted uploads cannot be synchronized.')
 
-    with ProcessPoolExecutor(max_workers=max_processes) as executor:
-        futures = []
-        for file in files:
-            blob_name = f'{gcb_dir}/{file}'
-            future = executor.submit(
-                upload_file_to_bucket,
-                bucket_name,
-                blob_name,
-                file_path=os.path.abspath(file))
-            futures.append(future)
+    metrics = metrics or RunMetrics()
+    scheduler = scheduler or Scheduler(metrics=metrics)
 
-        for n, future in enumerate(as_completed(futures), start=1):
-            print_progress(n/len(futures))
-            future.result()
+    files = discover_files(file_path, include=include, exclude=exclude)
+
+    if max_processes is not None:
+        max_workers = max_processes
+
+    if dry_run:
+        with metrics.timer('plan'):
+            plan = plan_upload(_counted(files, metrics),
+                               f'gs://{bucket_name}/{gcb_dir}',
+                               max_workers=max_workers,
+                               compression=compression,
+                               composite_threshold=composite_threshold,
+                               composite_chunk_size=composite_chunk_size,
+                               throughput=measured_throughput(history))
+        if sync or convert_to:
+            plan.warnings.append('Files are counted before they are synchronized or converted.')
+        print(plan)
+        return plan
+
+    with metrics.timer('client'):
+        storage_client = get_storage_client()
+        configure_connection_pool(storage_client, max_workers)
+
+    files = _counted(files, metrics)
+    targets = ((f'{gcb_dir}/{file.name}', os.path.abspath(file.path)) for file in files)
+    orphans = []
+
+    if sync:
+        targets = dict(targets)
+        n_files = len(targets)
+        with metrics.timer('sync_plan'):
+            targets, orphans = plan_sync(storage_client,
+                                         bucket_name,
+                                         f'{gcb_dir}/',
+                                         targets,
+                                         HashCache(hash_cache_path),
+                                         max_workers=max_workers)
+        print(f'{len(targets)} of {n_files} files changed, {len(orphans)} blobs without local file.')
+
+    uploads = targets.items() if sync else targets
+    conversion = None
+
+    if convert_to:
+        if conversion_dir is None:
+            conversion = tempfile.TemporaryDirectory()
+            conversion_dir = conversion.name
+        names = {}
+
+        def sources():
+            for file in files:
+                names[file.path] = file.name
+                yield file.path
+
+        uploads = ((f'{gcb_dir}/{os.path.splitext(names.pop(source))[0]}{SUFFIXES[convert_to]}', converted)
+                   for source, converted in convert_files(sources(),
+                                                          schema_file_path=schema_file_path,
+                                                          source_format=source_format,
+                                                          target_format=convert_to,
+                                                          output_dir=conversion_dir,
+                                                          csv_field_delimiter=csv_field_delimiter,
+                                                          csv_quote_character=csv_quote_character,
+                                                          csv_skip_leading_rows=csv_skip_leading_rows))
+
+    slots = threading.BoundedSemaphore(max_workers * 2)
+    lock = threading.Lock()
+    errors = []
+    submitted = 0
+    owns_progress = progress is True
+    progress = resolve_progress(progress)
+    manifest = Manifest(manifest_path) if manifest_path else None
+
+    def done(future, local_path: str) -> None:
+        try:
+            if future.exception() is not None:
+                with lock:
+                    errors.append(future.exception())
+            if convert_to:
+                with suppress(OSError):
+                    os.remove(local_path)
+        finally:
+            slots.release()
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for blob_name, local_path in uploads:
+                slots.acquire()
+                with lock:
+                    submitted += 1
+                if progress is not None:
+                    progress.expect(os.path.getsize(local_path))
+                future = executor.submit(
+                    upload_file_to_bucket,
+                    bucket_name,
+                    blob_name,
+                    file_path=local_path,
+                    compression=compression,
+                    manifest=manifest,
+                    composite_threshold=composite_threshold,
+                    composite_chunk_size=composite_chunk_size,
+                    metrics=metrics,
+                    scheduler=scheduler,
+                    progress=progress)
+                future.add_done_callback(lambda future, local_path=local_path: done(future, local_path))
+    finally:
+        if owns_progress:
+            progress.close()
+        if manifest is not None:
+            manifest.close()
+        if conversion is not None:
+            conversion.cleanup()
+
+    if sync and delete_orphans and orphans:
+        with metrics.timer('delete_orphans'):
+            bucket = storage_client.bucket(bucket_name)
+            bucket.delete_blobs([bucket.blob(blob_name) for blob_name in orphans])
+        metrics.count('blobs_deleted', len(orphans))
+        print(f'Deleted {len(orphans)} blobs without local file.')
+
+    if report_path:
+        metrics.write_report(report_path)
+
+    if errors:
+        print(f'{len(errors)} of {submitted} uploads failed.')
+        raise errors[0]
 
 
 def upload_file_to_bucket(bucket_name: str,
                           blob_name: str,
-                          file_path: str) -> None:
+                          file_path: str,
+                          compression: str = None,
+                          manifest_path: str = None,
+                          composite_threshold: int = None,
+                          composite_chunk_size: int = 256 * 1024 ** 2,
+                          metrics: RunMetrics = None,
+                          scheduler: Scheduler = None,
+                          progress: Progress = None,
+                          manifest: Manifest = None) -> None:
     """
     This function uploads a single file into a Google Bucket.
 
@@ -270,12 +1130,147 @@ def upload_file_to_bucket(bucket_name: str,
         The name of the destination file
     file_path: str
         The file which should be uploaded
+    compression: str
+        If 'gzip', the file is compressed while it is uploaded and '.gz' is
+        appended to the blob name
+    manifest_path: str
+        Path of a local run manifest. The file is skipped if it was already
+        uploaded and an interrupted upload session is resumed.
+    composite_threshold: int
+        If given, an uncompressed file larger than this many bytes is uploaded
+        in parallel parts which are composed into the blob
+    composite_chunk_size: int
+        Number of bytes per part of a composite upload
+    metrics: RunMetrics
+        Collects the upload time and the number of uploaded files and bytes
+    scheduler: Scheduler
+        Paces the upload and retries it after transient errors
+    progress: Progress
+        If given, receives the bytes read by the upload instead of a line
+        being printed per file
+    manifest: Manifest
+        An open run manifest which is used instead of manifest_path, e.g. one
+        shared by the uploads of many files
     """
 
-    storage_client = storage.Client()
+    compression = compression_validator(compression)
+    metrics = metrics or RunMetrics()
+    scheduler = scheduler or Scheduler(metrics=metrics)
+    size = os.path.getsize(file_path)
+
+    if compression == 'gzip':
+        blob_name = f'{blob_name}.gz'
+
+    composite = (compression is None
+                 and composite_threshold is not None
+                 and size > composite_threshold)
+
+    storage_client = get_storage_client()
     bucket = storage_client.bucket(bucket_name)
     blob = bucket.blob(blob_name)
+    task = None
+
+    with _opened_manifest(manifest, manifest_path) as manifest:
+        if manifest is not None:
+            target = f'gs://{bucket_name}/{blob_name}'
+            entry = manifest.get('upload', target, [file_path])
+
+            if entry is not None and entry.status == DONE:
+                metrics.count('files_skipped')
+                if progress is not None:
+                    progress.skip(size)
+                else:
+                    print('File {} already uploaded to {}.'.format(file_path, blob_name))
+                return
+
+            md5_hash = None
+            task = progress.task(file_path, size) if progress is not None else None
+            with metrics.timer('upload'), _finishing(task):
+                if compression == 'gzip':
+                    scheduler.call(_upload_compressed, blob, file_path, task)
+                elif composite:
+                    scheduler.call(_upload_composite, bucket, blob_name, file_path, composite_chunk_size, task)
+                else:
+                    session = {'url': entry.session_url if entry else None}
+                    content_type = mimetypes.guess_type(file_path)[0]
+
+                    def on_session(session_url: str) -> None:
+                        session['url'] = session_url
+                        manifest.record('upload', target, [file_path], PENDING,
+                                        blob_name=blob_name, session_url=session_url)
+
+                    resource = scheduler.call(lambda: upload_file_resumable(blob,
+                                                                            file_path,
+                                                                            session_url=session['url'],
+                                                                            on_session=on_session,
+                                                                            content_type=content_type,
+                                                                            on_progress=task.update if task else None))
+                    md5_hash = resource.get('md5Hash') if resource else None
+
+            manifest.record('upload', target, [file_path], DONE,
+                            blob_name=blob_name, md5_hash=md5_hash, session_url=None)
+
+        else:
+            task = progress.task(file_path, size) if progress is not None else None
+            with metrics.timer('upload'), _finishing(task):
+                if compression == 'gzip':
+                    scheduler.call(_upload_compressed, blob, file_path, task)
+                elif composite:
+                    scheduler.call(_upload_composite, bucket, blob_name, file_path, composite_chunk_size, task)
+                elif task is not None:
+                    scheduler.call(_upload_tracked, blob, file_path, task)
+                else:
+                    scheduler.call(blob.upload_from_filename, file_path)
+
+    metrics.count('files_uploaded')
+    metrics.count('bytes_uploaded', size)
+    if progress is None:
+        print('File {} uploaded to {}.'.format(file_path, blob_name))
+
+
+@contextmanager
+def _opened_manifest(manifest: Optional[Manifest], manifest_path: Optional[str]):
+    if manifest is not None or not manifest_path:
+        yield manifest
+        return
+    with Manifest(manifest_path) as opened:
+        yield opened
+
+
+@contextmanager
+def _finishing(task: Optional[ProgressTask]):
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        if task is not None:
+            task.finish(error)
+
+
+def _open_tracked(file_path: str, task: Optional[ProgressTask]):
+    source_file = open(file_path, 'rb')
+    if task is None:
+        return source_file
+    task.update(0)
+    return task.track(source_file)
+
+
+def _upload_tracked(blob, file_path: str, task: ProgressTask) -> None:
+    with _open_tracked(file_path, task) as source_file:
+        blob.upload_from_file(source_file,
+                              size=os.path.getsize(file_path),
+                              content_type=mimetypes.guess_type(file_path)[0])
+
+
+def _upload_composite(bucket, blob_name: str, file_path: str, chunk_size: int, task: Optional[ProgressTask]) -> None:
+    if task is not None:
+        task.update(0)
+    upload_file_composite(bucket, blob_name, file_path, chunk_size=chunk_size, on_part=task.advance if task else None)
 
-    blob.upload_from_filename(file_path)
 
-    print('File {} uploaded to {}.'.format(file_path, blob_name))
+def _upload_compressed(blob, file_path: str, task: Optional[ProgressTask] = None) -> None:
+    with GzipStream(_open_tracked(file_path, task)) as stream:
+        blob.upload_from_file(stream, content_type='application/gzip')
@@ -1,5 +1,6 @@
-import inquirer
-from bq_loader import create_table_from_local, create_table_from_bucket, upload_files_to_bucket
+import sys
+import argparse
+from bq_loader import create_table_from_local, create_table_from_bucket, upload_files_to_bucket, run_spec
 
 DEFAULT_CSV_ANSWERS = {'csv_field_delimiter': ',',
                        'csv_quote_character': '"',
@@ -7,121 +8,163 @@ DEFAULT_CSV_ANSWERS = {'csv_field_delimiter': ',',
                        'csv_skip_leading_rows': 0}
 
 
-introduction_question = [
-    inquirer.List('method',
-                  message='Please choose a method',
-                  choices=['create_table_from_local',
-                              'create_table_from_bucket',
-                              'upload_files_to_bucket'])
-]
+def prompt_questions() -> dict:
+    """
+    This function returns the questions of the interactive prompts. inquirer
+    is only imported here, so batch runs do not load it.
+    """
 
-questions_create_table_from_local = [
-    inquirer.Text('table_id',
-                  message='Please enter a table id'),
+    import inquirer
 
-    inquirer.Text('project_id',
-                  message='Please enter a project id'),
+    introduction_question = [
+        inquirer.List('method',
+                      message='Please choose a method',
+                      choices=['create_table_from_local',
+                                  'create_table_from_bucket',
+                                  'upload_files_to_bucket'])
+    ]
 
-    inquirer.Text('dataset_id',
-                  message='Please enter a dataset id'),
+    questions_create_table_from_local = [
+        inquirer.Text('table_id',
+                      message='Please enter a table id'),
 
-    inquirer.Text('file_path',
-                  message='Please enter a file path'),
+        inquirer.Text('project_id',
+                      message='Please enter a project id'),
 
-    inquirer.Path('schema_file_path',
-                  message='Please enter a schema file',
-                  exists=True,
-                  path_type=inquirer.Path.FILE),
+        inquirer.Text('dataset_id',
+                      message='Please enter a dataset id'),
 
-    inquirer.List('source_format',
-                  message='Please choose a source format',
-                  choices=['jsonl', 'avro', 'csv', 'mro', 'orc', 'parquet']),
+        inquirer.Text('file_path',
+                      message='Please enter a file path'),
 
-    inquirer.List('write_disposition',
-                  message='Please choose an action that should occur if the destination table already exists',
-                  choices=['WRITE_TRUNCATE', 'WRITE_APPEND', 'WRITE_EMPTY']),
+        inquirer.Path('schema_file_path',
+                      message='Please enter a schema file',
+                      exists=True,
+                      path_type=inquirer.Path.FILE),
 
-    inquirer.Text('table_description',
-                  message='Please enter a table description'),
+        inquirer.List('source_format',
+                      message='Please choose a source format',
+                      choices=['jsonl', 'avro', 'csv', 'mro', 'orc', 'parquet']),
 
-    inquirer.Confirm('ignore_unknown_values',
-                     message='Ignore unknown values?')
-]
+        inquirer.List('write_disposition',
+                      message='Please choose an action that should occur if the destination table already exists',
+                      choices=['WRITE_TRUNCATE', 'WRITE_APPEND', 'WRITE_EMPTY']),
 
-questions_create_table_from_bucket = [
-    inquirer.Text('uri',
-                  message='Please enter a Google Bucket URI'),
+        inquirer.Text('table_description',
+                      message='Please enter a table description'),
 
-    inquirer.Text('table_id',
-                  message='Please enter a table id'),
+        inquirer.Confirm('ignore_unknown_values',
+                         message='Ignore unknown values?')
+    ]
 
-    inquirer.Text('project_id',
-                  message='Please enter a project id'),
+    questions_create_table_from_bucket = [
+        inquirer.Text('uri',
+                      message='Please enter a Google Bucket URI'),
 
-    inquirer.Text('dataset_id',
-                  message='Please enter a dataset id'),
+        inquirer.Text('table_id',
+                      message='Please enter a table id'),
 
-    inquirer.Path('schema_file_path',
-                  message='Please enter a schema file',
-                  exists=True,
-                  path_type=inquirer.Path.FILE),
+        inquirer.Text('project_id',
+                      message='Please enter a project id'),
 
-    inquirer.List('source_format',
-                  message='Please choose a source format',
-                  choices=['jsonl', 'avro', 'csv', 'mro', 'orc', 'parquet']),
+        inquirer.Text('dataset_id',
+                      message='Please enter a dataset id'),
 
-    inquirer.List('write_disposition',
-                  message='Please choose an action that should occur if the destination table already exists',
-                  choices=['WRITE_TRUNCATE', 'WRITE_APPEND', 'WRITE_EMPTY']),
+        inquirer.Path('schema_file_path',
+                      message='Please enter a schema file',
+                      exists=True,
+                      path_type=inquirer.Path.FILE),
 
-    inquirer.Text('table_description',
-                  message='Please enter a table description'),
+        inquirer.List('source_format',
+                      message='Please choose a source format',
+                      choices=['jsonl', 'avro', 'csv', 'mro', 'orc', 'parquet']),
 
-    inquirer.Confirm('ignore_unknown_values',
-                     message='Ignore unknown values?')
-]
+        inquirer.List('write_disposition',
+                      message='Please choose an action that should occur if the destination table already exists',
+                      choices=['WRITE_TRUNCATE', 'WRITE_APPEND', 'WRITE_EMPTY']),
 
-questions_upload_files_to_bucket = [
-    inquirer.Text('bucket_name',
-                  message='Please enter a bucket name'),
+        inquirer.Text('table_description',
+                      message='Please enter a table description'),
 
-    inquirer.Text('file_path',
-                  message='Please enter a file path'),
+        inquirer.Confirm('ignore_unknown_values',
+                         message='Ignore unknown values?')
+    ]
 
-    inquirer.Text('gcb_dir',
-                  message='Please enter the name of the directory which should be created')
-]
+    questions_upload_files_to_bucket = [
+        inquirer.Text('bucket_name',
+                      message='Please enter a bucket name'),
 
-questions_csv = [
-    inquirer.Text('csv_field_delimiter',
-                  message='Please enter the field delimiter character for data in CSV format',
-                  default=','),
+        inquirer.Text('file_path',
+                      message='Please enter a file path'),
 
-    inquirer.Text('csv_quote_character',
-                  message='Please enter the quote character for data in CSV format',
-                  default='"'),
+        inquirer.Text('gcb_dir',
+                      message='Please enter the name of the directory which should be created')
+    ]
 
-    inquirer.Confirm('csv_allow_quoted_newlines',
-                     message='Allow quoted newlines for data in CSV format?',
-                     default=False),
+    questions_csv = [
+        inquirer.Text('csv_field_delimiter',
+                      message='Please enter the field delimiter character for data in CSV format',
+                      default=','),
+
+        inquirer.Text('csv_quote_character',
+                      message='Please enter the quote character for data in CSV format',
+                      default='"'),
+
+        inquirer.Confirm('csv_allow_quoted_newlines',
+                         message='Allow quoted newlines for data in CSV format?',
+                         default=False),
+
+        inquirer.Text('csv_skip_leading_rows',
+                      message='Please enter the number of leading rows to skip for data in CSV format',
+                      default=0)
+    ]
+
+    return {'introduction': introduction_question,
+            'create_table_from_local': questions_create_table_from_local,
+            'create_table_from_bucket': questions_create_table_from_bucket,
+            'upload_files_to_bucket': questions_upload_files_to_bucket,
+            'csv': questions_csv}
+
+
+def run_batch(argv):
+
+    parser = argparse.ArgumentParser(prog='bqloader',
+                                     description='Runs the loads, uploads and bucket imports of a YAML or JSON spec.')
+    parser.add_argument('--spec', required=True, help='Path to the spec file')
+    parser.add_argument('--max-workers', type=int, default=None, help='Number of tasks which run at the same time')
+    parser.add_argument('--report', default=None, help='Path of the JSON run report')
+    parser.add_argument('--plan', action='store_true',
+                        help='Print the estimated jobs, bytes, time and cost of the tasks without uploading anything')
+    parser.add_argument('--history', nargs='*', default=None,
+                        help='Run reports of previous runs from which the throughput of --plan is estimated')
+    args = parser.parse_args(argv)
+
+    results = run_spec(args.spec, max_workers=args.max_workers, report_path=args.report,
+                       dry_run=args.plan, history=args.history)
+
+    return 1 if any(result.status == 'FAILED' or (result.status != 'DONE' and not args.plan)
+                    for result in results) else 0
 
-    inquirer.Text('csv_skip_leading_rows',
-                  message='Please enter the number of leading rows to skip for data in CSV format',
-                  default=0)
-]
 
 def main():
 
-    answer = inquirer.prompt(introduction_question)
+    if len(sys.argv) > 1:
+        sys.exit(run_batch(sys.argv[1:]))
+
+    import inquirer
+
+    questions = prompt_questions()
+
+    answer = inquirer.prompt(questions['introduction'])
 
     if answer['method'] == 'create_table_from_local':
 
-        answers = inquirer.prompt(questions_create_table_from_local)
+        answers = inquirer.prompt(questions['create_table_from_local'])
 
         csv_answers = None
 
         if answers['source_format'] == 'csv':
-            csv_answers = inquirer.prompt(questions_csv)
+            csv_answers = inquirer.prompt(questions['csv'])
         else:
             csv_answers = DEFAULT_CSV_ANSWERS
 
@@ -140,12 +183,12 @@ def main():
                                 ignore_unknown_values=answers['ignore_unknown_values'])
 
     if answer['method'] == 'create_table_from_bucket':
-        answers = inquirer.prompt(questions_create_table_from_bucket)
+        answers = inquirer.prompt(questions['create_table_from_bucket'])
 
         csv_answers = None
 
         if answers['source_format'] == 'csv':
-            csv_answers = inquirer.prompt(questions_csv)
+            csv_answers = inquirer.prompt(questions['csv'])
         else:
             csv_answers = DEFAULT_CSV_ANSWERS
 
@@ -164,7 +207,7 @@ def main():
                                  ignore_unknown_values=answers['ignore_unknown_values'])
 
     if answer['method'] == 'upload_files_to_bucket':
-        answers = inquirer.prompt(questions_upload_files_to_bucket)
+        answers = inquirer.prompt(questions['upload_files_to_bucket'])
         upload_files_to_bucket(bucket_name=answers['bucket_name'],
                                file_path=answers['file_path'],
                                gcb_dir=answers['gcb_dir'])
@@ -0,0 +1,168 @@
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple, Union
+from .metrics import RunMetrics
+from .progress import Progress, resolve_progress
+from .scheduler import Scheduler, is_transient
+
+
+@dataclass
+class BucketLoadResult:
+    uri: str
+    table_id: str
+    job_id: Optional[str] = None
+    state: Optional[str] = None
+    seconds: float = 0.0
+    errors: Optional[list] = None
+    error: Optional[BaseException] = None
+    attempts: int = 0
+
+
+class JobPoller:
+    """
+    Submits jobs with a cap on the number of running jobs and polls all of
+    them in one loop instead of one blocking wait per job.
+
+    The poll interval starts at ``min_poll_interval`` and grows by
+    ``backoff`` after every poll in which no job finished, up to
+    ``max_poll_interval``. It is reset once a job finished. A failed
+    submission or job is recorded in its result and does not stop the others.
+    A failed poll is retried in the next loop, since the job itself may still
+    run or have succeeded, and is never resubmitted.
+
+    Parameters
+    ----------
+    max_jobs: int
+        Number of jobs which run at the same time
+    min_poll_interval: float
+        Seconds between two polls while jobs finish
+    max_poll_interval: float
+        Upper bound of the seconds between two polls
+    backoff: float
+        Factor by which the poll interval grows
+    progress: Union[bool, Progress]
+        Whether the progress bar with the finished jobs should be printed, or
+        a Progress which counts the submitted and finished jobs
+    metrics: RunMetrics
+        Collects the submit and wait times and the statistics of the jobs
+    scheduler: Scheduler
+        Paces the submissions and retries them after transient errors. Jobs
+        which failed for transient reasons are requeued at the end.
+    """
+
+    def __init__(self,
+                 max_jobs: int = 50,
+                 min_poll_interval: float = 0.5,
+                 max_poll_interval: float = 10.0,
+                 backoff: float = 1.5,
+                 progress: Union[bool, Progress] = True,
+                 metrics: Optional[RunMetrics] = None,
+                 scheduler: Optional[Scheduler] = None):
+        self.max_jobs = max_jobs
+        self.min_poll_interval = min_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.backoff = backoff
+        self.progress = resolve_progress(progress)
+        self._owns_progress = progress is True
+        self.metrics = metrics or RunMetrics()
+        self.scheduler = scheduler or Scheduler(metrics=self.metrics)
+
+    def run(self, submissions: List[Tuple[BucketLoadResult, Callable]]) -> List[BucketLoadResult]:
+        """
+        This method submits all jobs and waits for their completion.
+
+        Parameters
+        ----------
+        submissions: List[Tuple[BucketLoadResult, Callable]]
+            Pairs of a result and a function without arguments which submits the job
+        Returns
+        -------
+        List[BucketLoadResult]
+            The results in the order of the submissions
+        """
+
+        queue = list(submissions)
+        queue.reverse()
+
+        try:
+            self._poll(queue)
+        finally:
+            if self._owns_progress:
+                self.progress.close()
+
+        return [result for result, _ in submissions]
+
+    def _poll(self, queue: List[Tuple[BucketLoadResult, Callable]]) -> None:
+        running = []
+        interval = self.min_poll_interval
+
+        while queue or running:
+            while queue and len(running) < self.max_jobs:
+                result, submit = queue.pop()
+                result.attempts += 1
+                try:
+                    with self.metrics.timer('submit'):
+                        job = self.scheduler.call(submit)
+                except Exception as e:
+                    result.error = e
+                    result.state = 'FAILED'
+                    self.metrics.count('jobs_failed')
+                    continue
+                result.job_id = getattr(job, 'job_id', None)
+                if self.progress is not None:
+                    self.progress.job_submitted()
+                running.append((result, submit, job, time.perf_counter(), 0))
+
+            still_running = []
+            for result, submit, job, submitted, poll_failures in running:
+                try:
+                    done = job.done()
+                except Exception as e:
+                    poll_failures += 1
+                    if is_transient(e) and poll_failures < self.scheduler.max_attempts:
+                        self.metrics.count('poll_retries')
+                        still_running.append((result, submit, job, submitted, poll_failures))
+                        continue
+                    result.error = e
+                    result.seconds = time.perf_counter() - submitted
+                    result.state = 'UNKNOWN'
+                    self.metrics.count('polls_failed')
+                    if self.progress is not None:
+                        self.progress.job_done()
+                    continue
+                if not done:
+                    still_running.append((result, submit, job, submitted, poll_failures))
+                    continue
+                self._finish(result, job, submitted)
+                if self.progress is not None:
+                    self.progress.job_done()
+                error_result = getattr(job, 'error_result', None)
+                if (result.error is not None and error_result is not None
+                        and result.attempts < self.scheduler.max_attempts
+                        and is_transient(result.error, error_result)):
+                    self.metrics.count('jobs_requeued')
+                    result.error = None
+                    queue.insert(0, (result, submit))
+                    continue
+                if result.error is not None:
+                    self.metrics.count('jobs_failed')
+
+            if len(still_running) < len(running):
+                interval = self.min_poll_interval
+            running = still_running
+
+            if running and not (queue and len(running) < self.max_jobs):
+                time.sleep(interval)
+                interval = min(interval * self.backoff, self.max_poll_interval)
+
+    def _finish(self, result: BucketLoadResult, job, submitted: float) -> None:
+        if result.error is None:
+            try:
+                job.result()
+            except Exception as e:
+                result.error = e
+        result.seconds = time.perf_counter() - submitted
+        result.state = 'FAILED' if result.error is not None else getattr(job, 'state', 'DONE')
+        result.errors = getattr(job, 'errors', None)
+        self.metrics.observe('job_wait', result.seconds)
+        self.metrics.record_job(job)
@@ -0,0 +1,99 @@
+import os
+import json
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def get_bigquery_client() -> 'bigquery.Client':
+    """
+    This function returns a BigQuery client which is shared within the process.
+
+    Creating a client resolves the credentials and opens a new HTTP session,
+    so it is done once instead of for every file or job.
+    """
+
+    from google.cloud import bigquery
+
+    return bigquery.Client()
+
+
+@lru_cache(maxsize=None)
+def get_storage_client() -> 'storage.Client':
+    """
+    This function returns a Google Cloud Storage client which is shared within the process.
+    """
+
+    from google.cloud import storage
+
+    return storage.Client()
+
+
+def configure_connection_pool(client, size: int) -> None:
+    """
+    This function enlarges the HTTP connection pool of a client, so that
+    ``size`` threads can use it at the same time without opening and
+    discarding connections. A pool is never shrunk.
+
+    The adapters which are mounted on the session are resized in place, so
+    adapters with their own TLS configuration, e.g. for mutual TLS, are kept.
+
+    Parameters
+    ----------
+    client: google.cloud.client.Client
+        A BigQuery or storage client
+    size: int
+        Number of connections which are kept open
+    """
+
+    session = getattr(client, '_http', None)
+    if session is None or not hasattr(session, 'get_adapter'):
+        return
+
+    from requests.adapters import HTTPAdapter
+    from requests.exceptions import InvalidSchema
+
+    for prefix in ('https://', 'http://'):
+        try:
+            adapter = session.get_adapter(prefix)
+        except InvalidSchema:
+            continue
+        if not isinstance(adapter, HTTPAdapter) or adapter._pool_maxsize >= size:
+            continue
+        adapter.poolmanager.clear()
+        adapter._pool_connections = size
+        adapter._pool_maxsize = size
+        adapter.init_poolmanager(size, size, block=adapter._pool_block)
+
+
+def load_schema(schema_file_path: str) -> list:
+    """
+    This function parses a BigQuery schema file. The parsed schema is cached
+    until the file is modified.
+
+    Parameters
+    ----------
+    schema_file_path: str
+        Path to the table schema
+    """
+
+    return list(_load_schema(os.path.abspath(schema_file_path),
+                             os.stat(schema_file_path).st_mtime_ns))
+
+
+@lru_cache(maxsize=32)
+def _load_schema(schema_file_path: str, mtime: int) -> tuple:
+    from google.cloud import bigquery
+
+    with open(schema_file_path, 'r') as schema_file:
+        return tuple(bigquery.SchemaField.from_api_repr(field) for field in json.load(schema_file))
+
+
+def clear_caches() -> None:
+    """
+    This function drops all cached clients and schemas, e.g. after a fork or
+    when the credentials changed.
+    """
+
+    get_bigquery_client.cache_clear()
+    get_storage_client.cache_clear()
+    _load_schema.cache_clear()
@@ -0,0 +1,159 @@
+import io
+import os
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List
+
+TEXT_FORMATS = ('jsonl', 'csv')
+
+
+class ConcatenatedFile(io.RawIOBase):
+    """
+    A read-only binary stream over several files.
+
+    The files are read one after another in chunks, so memory use does not
+    depend on their size. ``skip_leading_rows`` header lines are dropped from
+    every file except the first and a newline is inserted between files which
+    do not end with one, so the rows of two files are never merged.
+
+    Parameters
+    ----------
+    files: List[str]
+        The files which should be concatenated
+    skip_leading_rows: int
+        Number of header lines in each file
+    """
+
+    def __init__(self, files: List[str], skip_leading_rows: int = 0):
+        super().__init__()
+        self.name = files[0] if files else ''
+        self._files = list(files)
+        self._skip_leading_rows = skip_leading_rows
+        self._index = -1
+        self._current = None
+        self._pending = b''
+        self._last_byte = b'\n'
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if (whence == io.SEEK_SET and offset == self._position) or (whence == io.SEEK_CUR and offset == 0):
+            return self._position
+        raise io.UnsupportedOperation('ConcatenatedFile can only be read sequentially')
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast('B')
+        while True:
+            if self._pending:
+                n = min(len(view), len(self._pending))
+                view[:n] = self._pending[:n]
+                self._pending = self._pending[n:]
+                self._position += n
+                return n
+
+            if self._current is None:
+                if not self._next_file():
+                    return 0
+                continue
+
+            n = self._current.readinto(view)
+            if n:
+                self._last_byte = bytes(view[n - 1:n])
+                self._position += n
+                return n
+
+            self._current.close()
+            self._current = None
+
+    def _next_file(self) -> bool:
+        self._index += 1
+        if self._index >= len(self._files):
+            return False
+
+        self._current = open(os.path.abspath(self._files[self._index]), 'rb')
+
+        if self._index > 0:
+            for _ in range(self._skip_leading_rows):
+                self._current.readline()
+            if self._last_byte != b'\n':
+                self._pending = b'\n'
+                self._last_byte = b'\n'
+
+        return True
+
+    def close(self) -> None:
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+        super().close()
+
+
+@dataclass
+class FileBatch:
+    """
+    A group of files which is loaded by a single load job.
+    """
+
+    files: List[str] = field(default_factory=list)
+    size: int = 0
+    skip_leading_rows: int = 0
+
+    @property
+    def name(self) -> str:
+        if len(self.files) == 1:
+            return self.files[0]
+        return f'{self.files[0]} (+{len(self.files) - 1} files)'
+
+    def open(self) -> ConcatenatedFile:
+        return ConcatenatedFile(self.files, skip_leading_rows=self.skip_leading_rows)
+
+
+def coalesce_files(files: Iterable[str],
+                   target_size: int,
+                   source_format: str,
+                   skip_leading_rows: int = 0) -> Iterator[FileBatch]:
+    """
+    This function packs files into batches of roughly ``target_size`` bytes.
+
+    A file which is larger than the target size forms its own batch.
+
+    Parameters
+    ----------
+    files: Iterable[str]
+        The files which should be packed
+    target_size: int
+        The targeted number of bytes per batch
+    source_format: str
+        The file format. Only newline delimited formats can be concatenated.
+    skip_leading_rows: int
+        Number of header lines in each CSV file
+    Raises
+    ------
+    ValueError
+        If the source format cannot be concatenated
+    """
+
+    if source_format not in TEXT_FORMATS:
+        raise ValueError('Files in source format {0} cannot be coalesced.'.format(source_format))
+
+    skip_leading_rows = int(skip_leading_rows) if source_format == 'csv' else 0
+
+    batch = FileBatch(skip_leading_rows=skip_leading_rows)
+
+    for file in files:
+        size = os.path.getsize(file)
+        if batch.files and batch.size + size > target_size:
+            yield batch
+            batch = FileBatch(skip_leading_rows=skip_leading_rows)
+        batch.files.append(file)
+        batch.size += size
+
+    if batch.files:
+        yield batch
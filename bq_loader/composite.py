@@ -0,0 +1,96 @@
+import os
+import mmap
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional
+
+MAX_COMPOSE_SOURCES = 32
+
+
+def _upload_part(bucket, part_name: str, file_path: str, offset: int, length: int) -> int:
+    with open(file_path, 'rb') as file:
+        with mmap.mmap(file.fileno(), length, offset=offset, access=mmap.ACCESS_READ) as buffer:
+            bucket.blob(part_name).upload_from_file(buffer, size=length)
+    return length
+
+
+def _compose(bucket, blob_name: str, sources: List[str], temporary: List[str]) -> None:
+    """
+    Composes ``sources`` into ``blob_name``. More than 32 sources are first
+    composed into intermediate objects, which are added to ``temporary``.
+    """
+
+    while len(sources) > MAX_COMPOSE_SOURCES:
+        intermediates = []
+        for n in range(0, len(sources), MAX_COMPOSE_SOURCES):
+            name = f'{sources[n]}.compose'
+            bucket.blob(name).compose([bucket.blob(source) for source in sources[n:n + MAX_COMPOSE_SOURCES]])
+            intermediates.append(name)
+            temporary.append(name)
+        sources = intermediates
+
+    bucket.blob(blob_name).compose([bucket.blob(source) for source in sources])
+
+
+def upload_file_composite(bucket,
+                          blob_name: str,
+                          file_path: str,
+                          chunk_size: int = 256 * 1024 ** 2,
+                          max_workers: int = 8,
+                          on_part: Optional[Callable[[int], None]] = None) -> None:
+    """
+    This function uploads a large file as a parallel composite upload.
+
+    The file is split into byte ranges of ``chunk_size`` bytes which are
+    uploaded in parallel as temporary objects and then composed into the
+    final blob. Each part is read from a memory map of its byte range, so
+    memory use does not grow with the number of parts. The temporary objects
+    are deleted afterwards, also if the upload fails.
+
+    Note that composite objects have a CRC32C but no MD5 hash.
+
+    Parameters
+    ----------
+    bucket: google.cloud.storage.Bucket
+        The destination bucket
+    blob_name: str
+        The name of the destination file
+    file_path: str
+        The file which should be uploaded
+    chunk_size: int
+        Number of bytes per part, rounded up to the allocation granularity of mmap
+    max_workers: int
+        Number of parts which are uploaded at the same time
+    on_part: Callable[[int], None]
+        Called with the number of bytes of each uploaded part, from the calling thread
+    """
+
+    size = os.path.getsize(file_path)
+    granularity = mmap.ALLOCATIONGRANULARITY
+    chunk_size = max(-(-chunk_size // granularity) * granularity, granularity)
+
+    prefix = f'{blob_name}.part-{uuid.uuid4().hex}'
+    parts = []
+    temporary = []
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = []
+            for n, offset in enumerate(range(0, size, chunk_size)):
+                part_name = f'{prefix}-{n:05d}'
+                parts.append(part_name)
+                temporary.append(part_name)
+                futures.append(executor.submit(_upload_part,
+                                               bucket,
+                                               part_name,
+                                               file_path,
+                                               offset,
+                                               min(chunk_size, size - offset)))
+            for future in as_completed(futures):
+                length = future.result()
+                if on_part is not None:
+                    on_part(length)
+
+        _compose(bucket, blob_name, parts, temporary)
+    finally:
+        bucket.delete_blobs([bucket.blob(name) for name in temporary], on_error=lambda blob: None)
@@ -0,0 +1,88 @@
+import io
+import os
+import gzip
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO
+
+
+class GzipStream(io.RawIOBase):
+    """
+    A read-only binary stream which gzip-compresses another stream on the fly.
+
+    The source is read in blocks of ``block_size`` bytes. Each block is
+    compressed into its own gzip member on a thread pool, since zlib releases
+    the GIL, and the members are emitted in order. Concatenated gzip members
+    form a valid gzip file which BigQuery and Cloud Storage read like any
+    other. At most ``2 * workers`` blocks are held in memory at a time.
+
+    Parameters
+    ----------
+    source: BinaryIO
+        The stream which should be compressed
+    level: int
+        The gzip compression level
+    block_size: int
+        Number of uncompressed bytes per gzip member
+    workers: int
+        Number of threads which compress blocks in parallel
+    """
+
+    def __init__(self,
+                 source: BinaryIO,
+                 level: int = 6,
+                 block_size: int = 8 * 1024 ** 2,
+                 workers: int = os.cpu_count()):
+        super().__init__()
+        self.name = getattr(source, 'name', '')
+        self._source = source
+        self._level = level
+        self._block_size = block_size
+        self._workers = max(workers, 1)
+        self._executor = ThreadPoolExecutor(max_workers=self._workers)
+        self._futures = deque()
+        self._buffer = memoryview(b'')
+        self._eof = False
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if (whence == io.SEEK_SET and offset == self._position) or (whence == io.SEEK_CUR and offset == 0):
+            return self._position
+        raise io.UnsupportedOperation('GzipStream can only be read sequentially')
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast('B')
+        while not self._buffer:
+            self._fill()
+            if not self._futures:
+                return 0
+            self._buffer = memoryview(self._futures.popleft().result())
+
+        n = min(len(view), len(self._buffer))
+        view[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        self._position += n
+        return n
+
+    def _fill(self) -> None:
+        while not self._eof and len(self._futures) < 2 * self._workers:
+            block = self._source.read(self._block_size)
+            if not block:
+                self._eof = True
+                break
+            self._futures.append(self._executor.submit(gzip.compress, block, self._level, mtime=0))
+
+    def close(self) -> None:
+        if not self.closed:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._source.close()
+        super().close()
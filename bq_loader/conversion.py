@@ -0,0 +1,359 @@
+import os
+import re
+import csv
+import json
+import base64
+from decimal import Decimal
+from datetime import date, datetime, time, timezone
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Callable, Iterator, List, Optional, Tuple
+from .validation import TIMEZONE
+
+COLUMNAR_FORMATS = ('parquet', 'avro')
+SUFFIXES = {'parquet': '.parquet', 'avro': '.avro'}
+
+
+def _parse_timestamp(value) -> datetime:
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, tz=timezone.utc)
+    parts = re.split(r'[ T]', value.strip(), maxsplit=1)
+    day, clock = parts[0], parts[1] if len(parts) > 1 else '00:00:00'
+    offset = '+00:00'
+    match = TIMEZONE.search(clock)
+    if match:
+        zone = match.group(2).upper()
+        clock = clock[:match.start()] or '00:00:00'
+        if zone not in ('Z', 'UTC'):
+            sign, digits = zone[0], zone[1:].replace(':', '')
+            hours, minutes = (digits[:-2], digits[-2:]) if len(digits) > 2 else (digits, '00')
+            offset = f'{sign}{hours.zfill(2)}:{minutes}'
+    parsed = datetime.fromisoformat(f'{day}T{clock.strip()}{offset}')
+    return parsed.astimezone(timezone.utc)
+
+
+def _parse_bool(value) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', '1')
+    return bool(value)
+
+
+SCALAR_PARSERS = {
+    'STRING': str,
+    'GEOGRAPHY': str,
+    'JSON': lambda value: value if isinstance(value, str) else json.dumps(value),
+    'BYTES': base64.b64decode,
+    'INTEGER': int,
+    'FLOAT': float,
+    'NUMERIC': lambda value: Decimal(str(value).strip()),
+    'BIGNUMERIC': lambda value: Decimal(str(value).strip()),
+    'BOOLEAN': _parse_bool,
+    'DATE': lambda value: date.fromisoformat(value.strip()),
+    'TIME': lambda value: time.fromisoformat(value.strip()),
+    'DATETIME': lambda value: datetime.fromisoformat(value.strip().replace(' ', 'T')),
+    'TIMESTAMP': _parse_timestamp,
+}
+ALIASES = {'INT64': 'INTEGER', 'FLOAT64': 'FLOAT', 'BOOL': 'BOOLEAN', 'STRUCT': 'RECORD'}
+
+
+def _field_type(field: dict) -> str:
+    field_type = field.get('type', 'STRING').upper()
+    return ALIASES.get(field_type, field_type)
+
+
+def _field_parser(field: dict, from_csv: bool) -> Callable:
+    """
+    Returns a function which turns a value of a jsonl or csv file into the
+    Python object of the field's type.
+    """
+
+    field_type = _field_type(field)
+
+    if field_type == 'RECORD':
+        parse = _record_parser(field.get('fields', []), from_csv)
+    else:
+        scalar = SCALAR_PARSERS.get(field_type, str)
+
+        def parse(value):
+            if from_csv and value == '' and field_type != 'STRING':
+                return None
+            return scalar(value)
+
+    if field.get('mode', '').upper() == 'REPEATED':
+        return lambda values: [parse(value) for value in values] if values is not None else []
+
+    return lambda value: parse(value) if value is not None else None
+
+
+def _record_parser(schema: List[dict], from_csv: bool) -> Callable:
+    parsers = [(field['name'], _field_parser(field, from_csv)) for field in schema]
+    return lambda row: {name: parse(row.get(name)) for name, parse in parsers}
+
+
+def arrow_schema(schema: List[dict]):
+    """
+    This function translates a BigQuery schema into a pyarrow schema.
+    """
+
+    import pyarrow as pa
+
+    types = {'STRING': pa.string(), 'GEOGRAPHY': pa.string(), 'JSON': pa.string(), 'BYTES': pa.binary(),
+             'INTEGER': pa.int64(), 'FLOAT': pa.float64(), 'NUMERIC': pa.decimal128(38, 9),
+             'BIGNUMERIC': pa.decimal256(76, 38), 'BOOLEAN': pa.bool_(), 'DATE': pa.date32(),
+             'TIME': pa.time64('us'), 'DATETIME': pa.timestamp('us'), 'TIMESTAMP': pa.timestamp('us', tz='UTC')}
+
+    def arrow_field(field: dict):
+        field_type = _field_type(field)
+        if field_type == 'RECORD':
+            arrow_type = pa.struct([arrow_field(child) for child in field.get('fields', [])])
+        else:
+            arrow_type = types.get(field_type, pa.string())
+        mode = field.get('mode', 'NULLABLE').upper()
+        if mode == 'REPEATED':
+            return pa.field(field['name'], pa.list_(arrow_type), nullable=False)
+        return pa.field(field['name'], arrow_type, nullable=mode != 'REQUIRED')
+
+    return pa.schema([arrow_field(field) for field in schema])
+
+
+def avro_schema(schema: List[dict], name: str = 'Row') -> dict:
+    """
+    This function translates a BigQuery schema into an Avro schema which uses
+    logical types. Load jobs need ``use_avro_logical_types`` to read them.
+    """
+
+    types = {'STRING': 'string', 'GEOGRAPHY': 'string', 'JSON': 'string', 'BYTES': 'bytes',
+             'INTEGER': 'long', 'FLOAT': 'double', 'BOOLEAN': 'boolean',
+             'NUMERIC': {'type': 'bytes', 'logicalType': 'decimal', 'precision': 38, 'scale': 9},
+             'BIGNUMERIC': {'type': 'bytes', 'logicalType': 'decimal', 'precision': 76, 'scale': 38},
+             'DATE': {'type': 'int', 'logicalType': 'date'},
+             'TIME': {'type': 'long', 'logicalType': 'time-micros'},
+             'DATETIME': {'type': 'string', 'sqlType': 'DATETIME'},
+             'TIMESTAMP': {'type': 'long', 'logicalType': 'timestamp-micros'}}
+
+    def avro_field(field: dict, path: str) -> dict:
+        field_type = _field_type(field)
+        if field_type == 'RECORD':
+            avro_type = avro_schema(field.get('fields', []), f'{path}_{field["name"]}')
+        else:
+            avro_type = types.get(field_type, 'string')
+        mode = field.get('mode', 'NULLABLE').upper()
+        if mode == 'REPEATED':
+            return {'name': field['name'], 'type': {'type': 'array', 'items': avro_type}}
+        if mode == 'REQUIRED':
+            return {'name': field['name'], 'type': avro_type}
+        return {'name': field['name'], 'type': ['null', avro_type], 'default': None}
+
+    return {'type': 'record', 'name': name, 'fields': [avro_field(field, name) for field in schema]}
+
+
+def _read_rows(file_path: str, source_format: str, schema: List[dict], options: dict) -> Iterator[dict]:
+    if source_format == 'csv':
+        names = [field['name'] for field in schema]
+        with open(file_path, 'r', newline='', encoding='utf-8') as file:
+            reader = csv.reader(file,
+                                delimiter=options['csv_field_delimiter'],
+                                quotechar=options['csv_quote_character'] or None,
+                                quoting=csv.QUOTE_MINIMAL if options['csv_quote_character'] else csv.QUOTE_NONE)
+            for n, row in enumerate(reader):
+                if n >= options['csv_skip_leading_rows'] and row:
+                    yield dict(zip(names, row))
+    else:
+        with open(file_path, 'rb') as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _batches(rows: Iterator[dict], size: int) -> Iterator[List[dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _datetime_formatter(schema: List[dict]) -> Optional[Callable[[dict], dict]]:
+    """
+    Returns a function which turns the values of the DATETIME fields of a row,
+    also those nested in RECORD and REPEATED fields, into the strings which
+    Avro stores, or None if the schema has no DATETIME field.
+    """
+
+    def datetime_string(value):
+        return value.isoformat(sep=' ') if isinstance(value, datetime) else value
+
+    def record(nested: Callable[[dict], dict]) -> Callable:
+        return lambda value: nested(value) if isinstance(value, dict) else value
+
+    def repeated(convert: Callable) -> Callable:
+        return lambda values: [convert(value) for value in values] if isinstance(values, list) else values
+
+    converters = []
+    for field in schema:
+        field_type = _field_type(field)
+        if field_type == 'DATETIME':
+            convert = datetime_string
+        elif field_type == 'RECORD':
+            nested = _datetime_formatter(field.get('fields', []))
+            if nested is None:
+                continue
+            convert = record(nested)
+        else:
+            continue
+        if field.get('mode', '').upper() == 'REPEATED':
+            convert = repeated(convert)
+        converters.append((field['name'], convert))
+
+    if not converters:
+        return None
+
+    def format_datetimes(row: dict) -> dict:
+        for name, convert in converters:
+            if row.get(name) is not None:
+                row[name] = convert(row[name])
+        return row
+
+    return format_datetimes
+
+
+def _convert_file(file_path: str,
+                  output_path: str,
+                  source_format: str,
+                  target_format: str,
+                  schema: List[dict],
+                  options: dict) -> str:
+    parse = _record_parser(schema, from_csv=source_format == 'csv')
+    rows = (parse(row) for row in _read_rows(file_path, source_format, schema, options))
+
+    if target_format == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        arrow = arrow_schema(schema)
+        with pq.ParquetWriter(output_path, arrow, compression=options['compression'] or 'snappy') as writer:
+            for batch in _batches(rows, options['row_group_size']):
+                writer.write_table(pa.Table.from_pylist(batch, schema=arrow))
+    else:
+        import fastavro
+
+        parsed_schema = fastavro.parse_schema(avro_schema(schema))
+        format_datetimes = _datetime_formatter(schema)
+
+        def records():
+            for row in rows:
+                yield format_datetimes(row) if format_datetimes is not None else row
+
+        codec = 'deflate' if options['compression'] in (None, 'gzip', 'deflate') else options['compression']
+        with open(output_path, 'wb') as output_file:
+            fastavro.writer(output_file, parsed_schema, records(), codec=codec,
+                            sync_interval=16 * 1024 ** 2)
+
+    return output_path
+
+
+def convert_files(files: List[str],
+                  schema_file_path: str,
+                  source_format: str,
+                  target_format: str,
+                  output_dir: str,
+                  csv_field_delimiter: str = ',',
+                  csv_quote_character: str = '"',
+                  csv_skip_leading_rows: int = 0,
+                  row_group_size: int = 100000,
+                  compression: str = None,
+                  max_processes: int = os.cpu_count(),
+                  max_pending: int = None) -> Iterator[Tuple[str, str]]:
+    """
+    This function converts jsonl or csv files into Parquet or Avro files.
+
+    The files are converted in parallel worker processes. The column types are
+    taken from the BigQuery schema, so the loaded table has exactly these
+    types. Rows are read as a stream and written in row groups of
+    ``row_group_size`` rows, so memory use does not depend on the file size.
+    Converted files are yielded as soon as they are ready, which lets uploads
+    start before all files are converted. Further files are only converted
+    while fewer than ``max_pending`` converted files wait to be consumed, so
+    the disk use is bounded if the consumer deletes the files it processed.
+
+    Requires ``pyarrow`` for Parquet or ``fastavro`` for Avro.
+
+    Parameters
+    ----------
+    files: List[str]
+        The files which should be converted
+    schema_file_path: str
+        Path to the table schema
+    source_format: str
+        The format of the files, 'jsonl' or 'csv'
+    target_format: str
+        'parquet' or 'avro'
+    output_dir: str
+        The directory of the converted files
+    row_group_size: int
+        Number of rows per Parquet row group
+    compression: str
+        The compression codec, e.g. 'snappy', 'zstd' or 'gzip'. Defaults to
+        'snappy' for Parquet and 'deflate' for Avro.
+    max_processes: int
+        Number of files which are converted at the same time
+    max_pending: int
+        Number of files which are converted or wait to be consumed at the same
+        time, twice max_processes if not given
+    Returns
+    -------
+    Iterator[Tuple[str, str]]
+        Pairs of the source file and the converted file in order of completion
+    Raises
+    ------
+    ValueError
+        If the source or target format is not supported
+    """
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    if source_format not in ('jsonl', 'csv'):
+        raise ValueError('Files in source format {0} cannot be converted.'.format(source_format))
+
+    if target_format not in COLUMNAR_FORMATS:
+        raise ValueError('Target format {0} is not implemented.'.format(target_format))
+
+    if target_format == 'parquet':
+        import pyarrow  # noqa: F401
+    else:
+        import fastavro  # noqa: F401
+
+    with open(schema_file_path, 'r') as schema_file:
+        schema = json.load(schema_file)
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    options = {'csv_field_delimiter': csv_field_delimiter,
+               'csv_quote_character': csv_quote_character,
+               'csv_skip_leading_rows': int(csv_skip_leading_rows),
+               'row_group_size': row_group_size,
+               'compression': compression}
+
+    max_pending = max_pending or 2 * (max_processes or os.cpu_count())
+    sources = enumerate(files)
+
+    with ProcessPoolExecutor(max_workers=max_processes) as executor:
+        futures = {}
+
+        def submit() -> None:
+            for n, file in sources:
+                name = os.path.splitext(os.path.basename(file))[0]
+                output_path = os.path.join(output_dir, f'{n:06d}_{name}{SUFFIXES[target_format]}')
+                futures[executor.submit(_convert_file, file, output_path, source_format, target_format, schema,
+                                        options)] = file
+                if len(futures) >= max_pending:
+                    return
+
+        submit()
+        while futures:
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                yield futures.pop(future), future.result()
+            submit()
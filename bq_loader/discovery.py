@@ -0,0 +1,271 @@
+import os
+import queue
+import itertools
+import threading
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+MAGIC_CHARACTERS = ('*', '?', '[')
+
+
+@dataclass
+class DiscoveredFile:
+    path: str
+    name: str
+    size: int
+
+
+def _is_magic(part: str) -> bool:
+    return any(character in part for character in MAGIC_CHARACTERS)
+
+
+def split_pattern(file_path: str) -> Tuple[str, List[str]]:
+    """
+    This function splits a path pattern into the directory in which the scan
+    starts and the pattern of the paths relative to it.
+
+    A directory without wildcards matches the files directly in it and a
+    file without wildcards matches itself.
+
+    Parameters
+    ----------
+    file_path: str
+        A path with optional '*', '?', '[...]' and '**' wildcards, e.g. 'data/**/*.jsonl'
+    Returns
+    -------
+    Tuple[str, List[str]]
+        The root directory and the pattern of each level below it
+    """
+
+    parts = file_path.replace(os.sep, '/').split('/')
+    n = next((i for i, part in enumerate(parts) if _is_magic(part)), len(parts))
+
+    if n == len(parts):
+        if os.path.isdir(file_path):
+            return file_path, ['*']
+        return os.path.dirname(file_path), [os.path.basename(file_path)]
+
+    root = '/'.join(parts[:n])
+    if not root and file_path.startswith('/'):
+        root = '/'
+    return root, [part for part in parts[n:] if part]
+
+
+def _matches_name(name: str, pattern: str) -> bool:
+    if name.startswith('.') and not pattern.startswith('.'):
+        return False
+    return fnmatchcase(name, pattern)
+
+
+def match_path(names: List[str], patterns: List[str]) -> bool:
+    """
+    This function checks whether a relative path matches a pattern level by
+    level. '**' matches any number of levels. Like glob, wildcards do not
+    match names which start with a dot.
+
+    Parameters
+    ----------
+    names: List[str]
+        The names of the path below the root
+    patterns: List[str]
+        The pattern of each level
+    Returns
+    -------
+    bool
+        Whether the path matches
+    """
+
+    if not patterns:
+        return not names
+    if patterns[0] == '**':
+        return any(match_path(names[n:], patterns[1:]) for n in range(len(names) + 1)
+                   if not any(name.startswith('.') for name in names[:n]))
+    return bool(names) and _matches_name(names[0], patterns[0]) and match_path(names[1:], patterns[1:])
+
+
+def _may_contain(names: List[str], patterns: List[str]) -> bool:
+    """
+    Whether a directory can contain paths which match the pattern. A
+    directory which already uses up every level of the pattern cannot.
+    """
+
+    if not names:
+        return bool(patterns)
+    if not patterns:
+        return False
+    if patterns[0] == '**':
+        return not names[0].startswith('.')
+    return _matches_name(names[0], patterns[0]) and _may_contain(names[1:], patterns[1:])
+
+
+def _filtered(names: List[str], filters: Optional[List[str]]) -> bool:
+    for pattern in filters or []:
+        patterns = pattern.strip('/').split('/')
+        if len(patterns) == 1 and fnmatchcase(names[-1], patterns[0]):
+            return True
+        if match_path(names, patterns):
+            return True
+    return False
+
+
+def iter_files(file_path: str,
+               include: Optional[List[str]] = None,
+               exclude: Optional[List[str]] = None,
+               follow_symlinks: bool = False) -> Iterator[DiscoveredFile]:
+    """
+    This function yields the files which match a path pattern while the
+    directories are scanned.
+
+    Directories are read with os.scandir one at a time and their files are
+    yielded in the order in which os.scandir returns them, so the first
+    files are yielded right away and memory use does not depend on the
+    number of files. Subdirectories are entered in sorted order after the
+    files of their parent. Directories which cannot contain matches or are
+    excluded are not entered.
+
+    Parameters
+    ----------
+    file_path: str
+        A path with optional '*', '?', '[...]' and '**' wildcards, e.g. 'data/**/*.jsonl'
+    include: List[str]
+        If given, only files which match one of these patterns are yielded.
+        Patterns without '/' are matched against the file name, all others
+        against the path relative to the root of file_path.
+    exclude: List[str]
+        Files and directories which match one of these patterns are skipped
+    follow_symlinks: bool
+        Whether symbolic links to directories are followed
+    Returns
+    -------
+    Iterator[DiscoveredFile]
+        The path, the name relative to the root of file_path with '/' as
+        separator and the size of each file
+    """
+
+    root, patterns = split_pattern(file_path)
+
+    if not any(_is_magic(pattern) for pattern in patterns):
+        path = os.path.join(root, *patterns)
+        if os.path.isfile(path) and not _filtered(patterns, exclude) \
+                and (include is None or _filtered(patterns, include)):
+            yield DiscoveredFile(path=path, name='/'.join(patterns), size=os.path.getsize(path))
+        return
+
+    def scan(directory: str, names: List[str]) -> Iterator[DiscoveredFile]:
+        try:
+            scanner = os.scandir(directory or '.')
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            return
+
+        directories = []
+        with scanner:
+            for entry in scanner:
+                entry_names = names + [entry.name]
+                path = os.path.join(directory, entry.name) if directory else entry.name
+                if _filtered(entry_names, exclude):
+                    continue
+                if entry.is_dir(follow_symlinks=follow_symlinks):
+                    if _may_contain(entry_names, patterns):
+                        directories.append((entry.name, path, entry_names))
+                elif entry.is_file() and match_path(entry_names, patterns) \
+                        and (include is None or _filtered(entry_names, include)):
+                    yield DiscoveredFile(path=path, name='/'.join(entry_names), size=entry.stat().st_size)
+
+        for _, path, entry_names in sorted(directories):
+            yield from scan(path, entry_names)
+
+    yield from scan(root, [])
+
+
+def prefetch(items: Iterable, maxsize: int = 10000) -> Iterator:
+    """
+    This function consumes an iterable in a background thread and yields
+    its items through a queue of at most ``maxsize`` items, so a slow scan
+    and the work on its results overlap. An error of the iterable is raised
+    by the returned iterator.
+
+    Parameters
+    ----------
+    items: Iterable
+        The items, e.g. of iter_files
+    maxsize: int
+        Number of items which are read ahead
+    Returns
+    -------
+    Iterator
+        The items in their original order
+    """
+
+    buffer = queue.Queue(maxsize=maxsize)
+    stopped = threading.Event()
+    end = object()
+
+    def produce():
+        try:
+            for item in items:
+                while not stopped.is_set():
+                    try:
+                        buffer.put((item, None), timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stopped.is_set():
+                    return
+            buffer.put((end, None))
+        except BaseException as e:
+            buffer.put((end, e))
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            item, error = buffer.get()
+            if error is not None:
+                raise error
+            if item is end:
+                return
+            yield item
+    finally:
+        stopped.set()
+
+
+def discover_files(file_path: str,
+                   include: Optional[List[str]] = None,
+                   exclude: Optional[List[str]] = None,
+                   follow_symlinks: bool = False,
+                   maxsize: int = 10000) -> Iterator[DiscoveredFile]:
+    """
+    This function scans for the files of a path pattern in a background
+    thread and yields them as they are found.
+
+    Parameters
+    ----------
+    file_path: str
+        A path with optional '*', '?', '[...]' and '**' wildcards, e.g. 'data/**/*.jsonl'
+    include: List[str]
+        If given, only files which match one of these patterns are yielded
+    exclude: List[str]
+        Files and directories which match one of these patterns are skipped
+    follow_symlinks: bool
+        Whether symbolic links to directories are followed
+    maxsize: int
+        Number of files which are read ahead of their consumer
+    Returns
+    -------
+    Iterator[DiscoveredFile]
+        The files in the order of iter_files
+    Raises
+    ------
+    FileNotFoundError
+        If no file matches the pattern
+    """
+
+    files = prefetch(iter_files(file_path, include, exclude, follow_symlinks), maxsize)
+
+    first = next(files, None)
+    if first is None:
+        raise FileNotFoundError('No such file or directory: {0}'.format(file_path))
+
+    return itertools.chain([first], files)
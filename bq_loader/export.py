@@ -0,0 +1,694 @@
+import os
+import json
+import threading
+import time as timer
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
+from typing import Dict, List, Optional, Tuple
+from .metrics import RunMetrics
+from .rows import _json_default
+from .scheduler import Scheduler
+from .sync import HashCache, crc32c_hash
+
+READ_FORMATS = {'parquet': '.parquet', 'jsonl': '.jsonl'}
+
+
+@dataclass
+class DownloadResult:
+    blob_name: str
+    file_path: str
+    size: int
+    seconds: float = 0.0
+    ranges: int = 0
+    skipped: bool = False
+    error: Optional[Exception] = None
+
+
+@dataclass
+class ReadResult:
+    rows: int = 0
+    files: List[str] = field(default_factory=list)
+    streams: List[str] = field(default_factory=list)
+
+
+def split_uri(uri: str) -> Tuple[str, str, str]:
+    """
+    This function splits a Cloud Storage URI into the bucket name, the blob
+    name or pattern and the directory of the blobs.
+
+    Local files are named by the blob names relative to this directory,
+    e.g. 'gs://bucket/exports/crossref/part-*.jsonl' is split into 'bucket',
+    'exports/crossref/part-*.jsonl' and 'exports/crossref/'.
+
+    Parameters
+    ----------
+    uri: str
+        A URI with an optional '*' wildcard or a prefix which ends with '/'
+    Returns
+    -------
+    Tuple[str, str, str]
+        The bucket name, the blob name or pattern and the directory
+    Raises
+    ------
+    ValueError
+        If the URI does not start with 'gs://'
+    """
+
+    if not uri.startswith('gs://'):
+        raise ValueError('URI must start with gs://')
+
+    bucket_name, _, name = uri[len('gs://'):].partition('/')
+    prefix = name.split('*')[0]
+    directory = prefix[:prefix.rfind('/') + 1]
+
+    return bucket_name, name, directory
+
+
+def _ranges(size: int, chunk_size: int) -> List[Tuple[int, int]]:
+    return [(start, min(start + chunk_size, size) - 1) for start in range(0, size, chunk_size)]
+
+
+class _Download:
+    """
+    A ranged download of one blob into ``<file_path>.part``.
+
+    The byte ranges which were written are recorded in
+    ``<file_path>.part.json``, so an interrupted download continues with
+    the missing ranges as long as the blob did not change. The file is
+    renamed once its CRC32C checksum matches the blob.
+    """
+
+    def __init__(self, blob, file_path: str, chunk_size: int):
+        if blob.size is None:
+            blob.reload()
+        self.blob = blob
+        self.file_path = file_path
+        self.part_path = f'{file_path}.part'
+        self.state_path = f'{file_path}.part.json'
+        self.ranges = _ranges(blob.size, chunk_size)
+        self.state = {'size': blob.size, 'crc32c': blob.crc32c,
+                      'generation': getattr(blob, 'generation', None), 'chunk_size': chunk_size}
+        self.done = set()
+        self.remaining = 0
+        self._lock = threading.Lock()
+
+    def prepare(self) -> List[int]:
+        os.makedirs(os.path.dirname(self.file_path) or '.', exist_ok=True)
+
+        if os.path.exists(self.part_path) and os.path.exists(self.state_path):
+            with open(self.state_path, 'r') as file:
+                state = json.load(file)
+            if {key: state.get(key) for key in self.state} == self.state:
+                self.done = set(state['done'])
+
+        if not self.done:
+            with open(self.part_path, 'wb') as file:
+                file.truncate(self.state['size'])
+
+        pending = [n for n in range(len(self.ranges)) if n not in self.done]
+        self.remaining = len(pending)
+        return pending
+
+    def fetch(self, n: int) -> int:
+        start, end = self.ranges[n]
+        kwargs = {'if_generation_match': self.state['generation']} if self.state['generation'] else {}
+        data = self.blob.download_as_bytes(start=start, end=end, raw_download=True, **kwargs)
+        if len(data) != end - start + 1:
+            raise IOError('Range {0}-{1} of {2} returned {3} bytes.'.format(start, end, self.blob.name, len(data)))
+
+        with open(self.part_path, 'r+b') as file:
+            file.seek(start)
+            file.write(data)
+
+        with self._lock:
+            self.done.add(n)
+            self.remaining -= 1
+            with open(f'{self.state_path}.tmp', 'w') as file:
+                json.dump({**self.state, 'done': sorted(self.done)}, file)
+            os.replace(f'{self.state_path}.tmp', self.state_path)
+            return self.remaining
+
+    def finish(self) -> None:
+        if self.state['crc32c'] and crc32c_hash(self.part_path) != self.state['crc32c']:
+            os.remove(self.part_path)
+            os.remove(self.state_path)
+            raise ValueError('Checksum of {0} does not match {1}.'.format(self.file_path, self.blob.name))
+
+        os.replace(self.part_path, self.file_path)
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+
+
+def download_blob(blob,
+                  file_path: str,
+                  chunk_size: int = 64 * 1024 ** 2,
+                  max_workers: int = 8,
+                  scheduler: Optional[Scheduler] = None) -> int:
+    """
+    This function downloads a blob in parallel byte ranges.
+
+    The ranges are written into ``<file_path>.part`` at their offsets and
+    the file is renamed once its CRC32C checksum matches the blob. An
+    interrupted download continues with the missing ranges if the blob did
+    not change in between.
+
+    Parameters
+    ----------
+    blob: google.cloud.storage.Blob
+        The blob which should be downloaded
+    file_path: str
+        The local destination file
+    chunk_size: int
+        Number of bytes per range
+    max_workers: int
+        Number of ranges which are downloaded at the same time
+    scheduler: Scheduler
+        Retries ranges after transient errors
+    Returns
+    -------
+    int
+        Number of downloaded ranges
+    Raises
+    ------
+    ValueError
+        If the checksum of the downloaded file does not match the blob
+    """
+
+    scheduler = scheduler or Scheduler()
+    download = _Download(blob, file_path, chunk_size)
+    pending = download.prepare()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for future in [executor.submit(scheduler.call, download.fetch, n) for n in pending]:
+            future.result()
+
+    download.finish()
+    return len(pending)
+
+
+def _marker_name(name: str) -> str:
+    return name.split('*')[0] + 'export.json'
+
+
+def _list_blobs(storage_client, uri: str) -> list:
+    bucket_name, name, _ = split_uri(uri)
+    return [blob for blob in storage_client.list_blobs(bucket_name, prefix=name.split('*')[0])
+            if not blob.name.endswith('/') and ('*' not in name or fnmatchcase(blob.name, name))
+            and blob.name != _marker_name(name)]
+
+
+def _read_marker(storage_client, uri: str) -> Optional[dict]:
+    """
+    The marker which a finished export wrote next to its shards, None if
+    there is none.
+    """
+
+    bucket_name, name, _ = split_uri(uri)
+    for blob in storage_client.list_blobs(bucket_name, prefix=_marker_name(name)):
+        if blob.name == _marker_name(name):
+            return json.loads(blob.download_as_bytes())
+    return None
+
+
+def download_files_from_bucket(uri: str,
+                               local_dir: str,
+                               max_workers: int = 32,
+                               chunk_size: int = 64 * 1024 ** 2,
+                               hash_cache_path: Optional[str] = None,
+                               metrics: Optional[RunMetrics] = None,
+                               report_path: Optional[str] = None,
+                               scheduler: Optional[Scheduler] = None) -> List[DownloadResult]:
+    """
+    This function downloads the blobs of a URI into a local directory.
+
+    The blobs are listed once and split into byte ranges, which all share
+    one thread pool, so a few large shards are downloaded as fast as many
+    small ones. Like a sync upload, files which exist with the same size
+    and CRC32C checksum are skipped and interrupted downloads continue with
+    their missing ranges.
+
+    Parameters
+    ----------
+    uri: str
+        A URI with an optional '*' wildcard, e.g. 'gs://bucket/exports/part-*.jsonl',
+        or a prefix like 'gs://bucket/exports/'. The local files are named
+        by the blob names relative to the directory of the URI.
+    local_dir: str
+        The destination directory
+    max_workers: int
+        Number of ranges which are downloaded at the same time
+    chunk_size: int
+        Number of bytes per range
+    hash_cache_path: str
+        Path of a JSON file which caches local checksums between runs
+    metrics: RunMetrics
+        Collects the download time and the number of downloaded files and bytes
+    report_path: str
+        If given, the run report of the metrics is written to this JSON file
+    scheduler: Scheduler
+        Paces the ranges and retries them after transient errors
+    Returns
+    -------
+    List[DownloadResult]
+        The blob name, local path, size and duration of each file
+    Raises
+    ------
+    ValueError
+        If the URI does not start with 'gs://'
+    FileNotFoundError
+        If no blob matches the URI
+    Exception
+        The first error of a download, after all other files were downloaded
+    """
+
+    from . import get_storage_client, configure_connection_pool
+
+    bucket_name, name, directory = split_uri(uri)
+    metrics = metrics or RunMetrics()
+    scheduler = scheduler or Scheduler(metrics=metrics)
+    hash_cache = HashCache(hash_cache_path)
+
+    with metrics.timer('client'):
+        storage_client = get_storage_client()
+        configure_connection_pool(storage_client, max_workers)
+
+    with metrics.timer('list'):
+        blobs = _list_blobs(storage_client, uri)
+    if not blobs:
+        raise FileNotFoundError('No such file or directory: {0}'.format(uri))
+
+    results = []
+    downloads: Dict[str, Tuple[DownloadResult, _Download]] = {}
+    for blob in blobs:
+        file_path = os.path.join(local_dir, *blob.name[len(directory):].split('/'))
+        result = DownloadResult(blob_name=blob.name, file_path=file_path, size=blob.size or 0)
+        results.append(result)
+
+        if os.path.exists(file_path) and os.path.getsize(file_path) == blob.size \
+                and hash_cache.crc32c(file_path) == blob.crc32c:
+            result.skipped = True
+            metrics.count('files_skipped')
+            continue
+        downloads[blob.name] = (result, _Download(blob, file_path, chunk_size))
+
+    lock = threading.Lock()
+    started = {}
+
+    def finish(result: DownloadResult, download: _Download) -> None:
+        try:
+            download.finish()
+        except Exception as e:
+            result.error = e
+            return
+        result.seconds = timer.perf_counter() - started[result.file_path]
+        metrics.observe('download', result.seconds)
+        metrics.count('files_downloaded')
+
+    def fetch(result: DownloadResult, download: _Download, n: int) -> None:
+        if result.error is not None:
+            return
+        try:
+            remaining = scheduler.call(download.fetch, n)
+        except Exception as e:
+            with lock:
+                result.error = result.error or e
+            return
+        metrics.count('bytes_downloaded', download.ranges[n][1] - download.ranges[n][0] + 1)
+        if remaining == 0:
+            finish(result, download)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for result, download in downloads.values():
+            started[result.file_path] = timer.perf_counter()
+            pending = download.prepare()
+            result.ranges = len(pending)
+            if not pending:
+                finish(result, download)
+            for n in pending:
+                executor.submit(fetch, result, download, n)
+
+    hash_cache.save()
+
+    if report_path:
+        metrics.write_report(report_path)
+
+    errors = [result.error for result in results if result.error is not None]
+    print(f'{len(downloads) - len(errors)} of {len(results)} files downloaded, '
+          f'{len(results) - len(downloads)} unchanged.')
+    if errors:
+        raise errors[0]
+
+    return results
+
+
+def export_table_to_bucket(table_id: str,
+                           project_id: str,
+                           dataset_id: str,
+                           uri: str,
+                           destination_format: str = 'jsonl',
+                           compression: Optional[str] = None,
+                           metrics: Optional[RunMetrics] = None,
+                           report_path: Optional[str] = None,
+                           resume: bool = False):
+    """
+    This function exports a table into a Google Bucket with an extract job.
+
+    With a '*' wildcard in the URI, BigQuery writes the table in parallel
+    into numbered shards, which is required for tables larger than 1 GB.
+    The wildcard may not match existing blobs, since shards of an earlier,
+    larger export would be mistaken for shards of this one. Once the job
+    finished, a marker 'export.json' with the table, the format and the job
+    id is written next to the shards, e.g. 'exports/part-export.json' for
+    'gs://bucket/exports/part-*.jsonl'.
+
+    Parameters
+    ----------
+    table_id: str
+        The name of the table
+    project_id: str
+        The name of the project in BigQuery
+    dataset_id: str
+        The name of the dataset in BigQuery
+    uri: str
+        The destination, e.g. 'gs://bucket/exports/part-*.jsonl'
+    destination_format: str
+        'jsonl', 'csv', 'avro' or 'parquet'
+    compression: str
+        'gzip', 'deflate', 'snappy' or 'zstd', depending on the format
+    metrics: RunMetrics
+        Collects the duration of the extract job and its statistics
+    report_path: str
+        If given, the run report of the metrics is written to this JSON file
+    resume: bool
+        If True and the shards which match the wildcard were written by a
+        finished export of the same table, format and compression, they are
+        reused and no extract job is submitted
+    Returns
+    -------
+    google.cloud.bigquery.ExtractJob
+        The finished extract job, None if the shards of an earlier export were reused
+    Raises
+    ------
+    ValueError
+        If the URI does not start with 'gs://' or the format or compression is not supported
+    FileExistsError
+        If blobs already match the wildcard of the URI and do not belong to
+        an earlier export which can be resumed
+    """
+
+    from google.cloud.bigquery import ExtractJobConfig
+    from . import get_bigquery_client, get_storage_client
+    from .utils import destination_format_validator, export_compression_validator
+
+    split_uri(uri)
+    job_config = ExtractJobConfig(destination_format=destination_format_validator(destination_format))
+    compression = export_compression_validator(compression)
+    if compression is not None:
+        job_config.compression = compression
+
+    metrics = metrics or RunMetrics()
+    extract_job = None
+    source = f'{project_id}.{dataset_id}.{table_id}'
+    export = {'table': source,
+              'uri': uri,
+              'destination_format': job_config.destination_format,
+              'compression': compression}
+
+    try:
+        with metrics.timer('client'):
+            client = get_bigquery_client()
+
+        if '*' in uri:
+            storage_client = get_storage_client()
+            with metrics.timer('list'):
+                existing = _list_blobs(storage_client, uri)
+                marker = _read_marker(storage_client, uri) if existing and resume else None
+            if marker is not None and {key: marker.get(key) for key in export} == export:
+                print(f'Reusing {len(existing)} shards of extract job {marker.get("job_id")}.')
+                return None
+            if existing:
+                raise FileExistsError('{0} blobs already match {1}, e.g. {2}. Delete them, export to another '
+                                      'prefix or resume the export which wrote them.'
+                                      .format(len(existing), uri, existing[0].name))
+
+        with metrics.timer('submit'):
+            extract_job = client.extract_table(source, uri, job_config=job_config)
+
+        with metrics.timer('job_wait'):
+            extract_job.result()
+
+        if '*' in uri:
+            bucket_name, name, _ = split_uri(uri)
+            marker = storage_client.bucket(bucket_name).blob(_marker_name(name))
+            marker.upload_from_string(json.dumps({**export, 'job_id': extract_job.job_id}),
+                                      content_type='application/json')
+
+        print(f'Extract BigQuery table result.state={extract_job.state}')
+    finally:
+        if extract_job is not None:
+            metrics.record_job(extract_job)
+        if report_path:
+            metrics.write_report(report_path)
+
+    return extract_job
+
+
+def export_table_to_local(table_id: str,
+                          project_id: str,
+                          dataset_id: str,
+                          uri: str,
+                          local_dir: str,
+                          destination_format: str = 'jsonl',
+                          compression: Optional[str] = None,
+                          max_workers: int = 32,
+                          chunk_size: int = 64 * 1024 ** 2,
+                          delete_exported: bool = False,
+                          hash_cache_path: Optional[str] = None,
+                          metrics: Optional[RunMetrics] = None,
+                          report_path: Optional[str] = None,
+                          scheduler: Optional[Scheduler] = None,
+                          resume: bool = False) -> List[DownloadResult]:
+    """
+    This function exports a table into sharded files in a Google Bucket and
+    downloads the shards in parallel byte ranges into a local directory.
+
+    With ``resume``, a rerun after an interrupted download reuses the shards
+    of the finished export and only downloads what is missing.
+
+    Parameters
+    ----------
+    table_id: str
+        The name of the table
+    project_id: str
+        The name of the project in BigQuery
+    dataset_id: str
+        The name of the dataset in BigQuery
+    uri: str
+        The intermediate destination, e.g. 'gs://bucket/exports/part-*.jsonl'
+    local_dir: str
+        The destination directory
+    destination_format: str
+        'jsonl', 'csv', 'avro' or 'parquet'
+    compression: str
+        'gzip', 'deflate', 'snappy' or 'zstd', depending on the format
+    max_workers: int
+        Number of ranges which are downloaded at the same time
+    chunk_size: int
+        Number of bytes per range
+    delete_exported: bool
+        If True, the shards are deleted from the bucket once all of them
+        were downloaded
+    hash_cache_path: str
+        Path of a JSON file which caches local checksums between runs
+    metrics: RunMetrics
+        Collects the duration of each phase and the number of downloaded files and bytes
+    report_path: str
+        If given, the run report of the metrics is written to this JSON file
+    scheduler: Scheduler
+        Paces the ranges and retries them after transient errors
+    resume: bool
+        If True, the shards of an earlier export of the same table, format
+        and compression are downloaded instead of exporting the table again
+    Returns
+    -------
+    List[DownloadResult]
+        The blob name, local path, size and duration of each shard
+    """
+
+    metrics = metrics or RunMetrics()
+
+    export_table_to_bucket(table_id, project_id, dataset_id, uri,
+                           destination_format=destination_format,
+                           compression=compression,
+                           metrics=metrics,
+                           resume=resume)
+
+    results = download_files_from_bucket(uri, local_dir,
+                                         max_workers=max_workers,
+                                         chunk_size=chunk_size,
+                                         hash_cache_path=hash_cache_path,
+                                         metrics=metrics,
+                                         scheduler=scheduler)
+
+    if delete_exported:
+        from . import get_storage_client
+
+        bucket_name, name, _ = split_uri(uri)
+        with metrics.timer('delete_exported'):
+            bucket = get_storage_client().bucket(bucket_name)
+            bucket.delete_blobs([bucket.blob(result.blob_name) for result in results]
+                                + ([bucket.blob(_marker_name(name))] if '*' in name else []))
+        metrics.count('blobs_deleted', len(results))
+
+    if report_path:
+        metrics.write_report(report_path)
+
+    return results
+
+
+class _StreamWriter:
+
+    def __init__(self, file_path: str, file_format: str, schema):
+        self.file_path = file_path
+        self.part_path = f'{file_path}.part'
+        self.file_format = file_format
+        self._schema = schema
+        self._writer = None
+        self._file = None
+
+    def write(self, batch) -> None:
+        if self.file_format == 'parquet':
+            import pyarrow.parquet as pq
+
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.part_path, self._schema)
+            self._writer.write_batch(batch)
+        else:
+            if self._file is None:
+                self._file = open(self.part_path, 'w', encoding='utf-8')
+            self._file.write(''.join(json.dumps(row, default=_json_default, separators=(',', ':')) + '\n'
+                                     for row in batch.to_pylist()))
+
+    def close(self) -> None:
+        if self.file_format == 'parquet' and self._writer is None:
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(self.part_path, self._schema)
+        if self.file_format == 'jsonl' and self._file is None:
+            self._file = open(self.part_path, 'w', encoding='utf-8')
+
+        (self._writer or self._file).close()
+        os.replace(self.part_path, self.file_path)
+
+
+def read_table_to_local(table_id: str,
+                        project_id: str,
+                        dataset_id: str,
+                        local_dir: str,
+                        file_format: str = 'parquet',
+                        max_streams: int = 4,
+                        selected_fields: Optional[List[str]] = None,
+                        row_restriction: Optional[str] = None,
+                        metrics: Optional[RunMetrics] = None,
+                        report_path: Optional[str] = None,
+                        read_client=None) -> ReadResult:
+    """
+    This function reads a table with the BigQuery Storage Read API into
+    local Parquet or JSONL files, without an extract job or a bucket.
+
+    The read session is split into up to ``max_streams`` streams which are
+    read in parallel as Arrow record batches, each into its own file
+    'part-<n>.parquet' or 'part-<n>.jsonl'. A file is written as '.part'
+    and renamed once its stream was read completely. Streams belong to
+    their session, so an interrupted read starts over. The client resumes
+    a stream at the last row it received after a transient error.
+
+    Parameters
+    ----------
+    table_id: str
+        The name of the table
+    project_id: str
+        The name of the project in BigQuery
+    dataset_id: str
+        The name of the dataset in BigQuery
+    local_dir: str
+        The destination directory
+    file_format: str
+        'parquet' or 'jsonl'
+    max_streams: int
+        Upper bound of parallel read streams. BigQuery may create fewer.
+    selected_fields: List[str]
+        If given, only these columns are read
+    row_restriction: str
+        If given, only rows which match this SQL filter are read, e.g. "year = 2021"
+    metrics: RunMetrics
+        Collects the read time and the number of rows
+    report_path: str
+        If given, the run report of the metrics is written to this JSON file
+    read_client: google.cloud.bigquery_storage_v1.BigQueryReadClient
+        The read client. A new client is created if not given.
+    Returns
+    -------
+    ReadResult
+        The number of rows, the written files and the names of the streams
+    Raises
+    ------
+    ValueError
+        If the file format is not supported
+    """
+
+    if file_format not in READ_FORMATS:
+        raise ValueError('File format {0} is not implemented.'.format(file_format))
+
+    import pyarrow as pa
+
+    if read_client is None:
+        from google.cloud.bigquery_storage_v1 import BigQueryReadClient
+        read_client = BigQueryReadClient()
+
+    from google.cloud.bigquery_storage_v1 import types
+
+    metrics = metrics or RunMetrics()
+    os.makedirs(local_dir, exist_ok=True)
+
+    read_options = types.ReadSession.TableReadOptions(selected_fields=selected_fields or [],
+                                                      row_restriction=row_restriction or '')
+    requested = types.ReadSession(table=f'projects/{project_id}/datasets/{dataset_id}/tables/{table_id}',
+                                  data_format=types.DataFormat.ARROW,
+                                  read_options=read_options)
+
+    with metrics.timer('read_session'):
+        session = read_client.create_read_session(parent=f'projects/{project_id}',
+                                                  read_session=requested,
+                                                  max_stream_count=max_streams)
+
+    schema = pa.ipc.read_schema(pa.py_buffer(session.arrow_schema.serialized_schema))
+    result = ReadResult(streams=[stream.name for stream in session.streams])
+    lock = threading.Lock()
+
+    def read(n: int, stream_name: str) -> str:
+        writer = _StreamWriter(os.path.join(local_dir, f'part-{n:05d}{READ_FORMATS[file_format]}'),
+                               file_format, schema)
+        for response in read_client.read_rows(stream_name):
+            batch = pa.ipc.read_record_batch(
+                pa.py_buffer(response.arrow_record_batch.serialized_record_batch), schema)
+            writer.write(batch)
+            with lock:
+                result.rows += batch.num_rows
+            metrics.count('rows_read', batch.num_rows)
+        writer.close()
+        return writer.file_path
+
+    with metrics.timer('read'):
+        if result.streams:
+            with ThreadPoolExecutor(max_workers=len(result.streams)) as executor:
+                result.files = list(executor.map(read, range(len(result.streams)), result.streams))
+
+    metrics.count('files_downloaded', len(result.files))
+    print(f'{result.rows} rows read from {len(result.streams)} streams.')
+
+    if report_path:
+        metrics.write_report(report_path)
+
+    return result
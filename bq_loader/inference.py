@@ -0,0 +1,269 @@
+import os
+import re
+import csv
+import json
+from typing import List, Optional
+from .validation import INTEGER, FLOAT, TIME, TIMEZONE, _is_date, _is_datetime
+
+NUMERIC_TYPES = ('INTEGER', 'NUMERIC', 'BIGNUMERIC', 'FLOAT')
+TEMPORAL_TYPES = ('DATE', 'DATETIME', 'TIMESTAMP')
+STRING_TYPES = ('BYTES', 'GEOGRAPHY')
+ALIASES = {'INT64': 'INTEGER', 'FLOAT64': 'FLOAT', 'BOOL': 'BOOLEAN', 'STRUCT': 'RECORD'}
+
+
+def _merge_type(left: Optional[str], right: Optional[str], path: str) -> Optional[str]:
+    """
+    Returns the narrowest type which can hold values of both types.
+    """
+
+    if left is None or left == right:
+        return right
+    if right is None:
+        return left
+    if 'JSON' in (left, right):
+        return 'JSON'
+    if 'RECORD' in (left, right):
+        raise ValueError('Field {0} contains records and scalar values.'.format(path))
+    if left in NUMERIC_TYPES and right in NUMERIC_TYPES:
+        return max(left, right, key=NUMERIC_TYPES.index)
+    if left in TEMPORAL_TYPES and right in TEMPORAL_TYPES:
+        return max(left, right, key=TEMPORAL_TYPES.index)
+    if left in STRING_TYPES and right == 'STRING':
+        return left
+    return 'STRING'
+
+
+def _merge_fields(left: dict, right: dict, path: str = '') -> dict:
+    """
+    Merges two field trees of the form {name: {'type', 'mode', 'fields'}}.
+    """
+
+    merged = dict(left)
+    for name, field in right.items():
+        field_path = f'{path}{name}'
+        if name not in merged:
+            merged[name] = field
+            continue
+        current = merged[name]
+        merged[name] = {'type': _merge_type(current['type'], field['type'], field_path),
+                        'mode': 'REPEATED' if 'REPEATED' in (current['mode'], field['mode']) else 'NULLABLE',
+                        'fields': _merge_fields(current['fields'], field['fields'], f'{field_path}.')}
+    return merged
+
+
+def _string_type(value: str, from_csv: bool) -> Optional[str]:
+    value = value.strip()
+    if from_csv:
+        if value == '':
+            return None
+        if INTEGER.match(value):
+            return 'INTEGER'
+        if FLOAT.match(value):
+            return 'FLOAT'
+        if value.lower() in ('true', 'false'):
+            return 'BOOLEAN'
+    if _is_date(value):
+        return 'DATE'
+    if TIME.match(value):
+        return 'TIME'
+    if _is_datetime(TIMEZONE.sub('', value)):
+        return 'TIMESTAMP'
+    return 'STRING'
+
+
+def _value_field(value, path: str) -> dict:
+    if isinstance(value, list):
+        field = {'type': None, 'mode': 'REPEATED', 'fields': {}}
+        for item in value:
+            if isinstance(item, list):
+                raise ValueError('Field {0} contains nested arrays.'.format(path))
+            item_field = _value_field(item, path)
+            field['type'] = _merge_type(field['type'], item_field['type'], path)
+            field['fields'] = _merge_fields(field['fields'], item_field['fields'], f'{path}.')
+        return field
+
+    if isinstance(value, dict):
+        return {'type': 'RECORD', 'mode': 'NULLABLE', 'fields': _row_fields(value, f'{path}.')}
+
+    if value is None:
+        field_type = None
+    elif isinstance(value, bool):
+        field_type = 'BOOLEAN'
+    elif isinstance(value, int):
+        field_type = 'INTEGER'
+    elif isinstance(value, float):
+        field_type = 'FLOAT'
+    else:
+        field_type = _string_type(str(value), from_csv=False)
+
+    return {'type': field_type, 'mode': 'NULLABLE', 'fields': {}}
+
+
+def _row_fields(row: dict, path: str = '') -> dict:
+    return {name: _value_field(value, f'{path}{name}') for name, value in row.items()}
+
+
+def _infer_jsonl(file_path: str, options: dict) -> dict:
+    fields = {}
+    with open(file_path, 'rb') as file:
+        for n, line in enumerate(file):
+            if options['sample_rows'] is not None and n >= options['sample_rows']:
+                break
+            if line.strip():
+                fields = _merge_fields(fields, _row_fields(json.loads(line)))
+    return fields
+
+
+def _column_name(name: str, n: int) -> str:
+    name = re.sub(r'\W', '_', name.strip())
+    if not name:
+        return f'string_field_{n}'
+    return f'_{name}' if name[0].isdigit() else name
+
+
+def _infer_csv(file_path: str, options: dict) -> dict:
+    columns = []
+    types = []
+    with open(file_path, 'r', newline='', encoding='utf-8') as file:
+        reader = csv.reader(file,
+                            delimiter=options['csv_field_delimiter'],
+                            quotechar=options['csv_quote_character'] or None,
+                            quoting=csv.QUOTE_MINIMAL if options['csv_quote_character'] else csv.QUOTE_NONE)
+        for n, row in enumerate(reader):
+            if n < options['csv_skip_leading_rows']:
+                if n == 0:
+                    columns = [_column_name(name, i) for i, name in enumerate(row)]
+                continue
+            if options['sample_rows'] is not None and n - options['csv_skip_leading_rows'] >= options['sample_rows']:
+                break
+            for i, value in enumerate(row):
+                if i >= len(types):
+                    types.append(None)
+                types[i] = _merge_type(types[i], _string_type(value, from_csv=True), str(i))
+
+    columns.extend(f'string_field_{i}' for i in range(len(columns), len(types)))
+    return {name: {'type': field_type, 'mode': 'NULLABLE', 'fields': {}} for name, field_type in zip(columns, types)}
+
+
+def _infer_file(file_path: str, source_format: str, options: dict) -> dict:
+    if source_format == 'csv':
+        return _infer_csv(file_path, options)
+    return _infer_jsonl(file_path, options)
+
+
+def _csv_order(fields: dict, columns: List[str]) -> dict:
+    """
+    Orders merged fields by the columns of the csv files, since csv files
+    are loaded by position. Fields of an existing schema which are not
+    columns of the files follow them.
+    """
+
+    order = columns + [name for name in fields if name not in columns]
+    return {name: fields[name] for name in order}
+
+
+def _from_schema(schema: List[dict]) -> dict:
+    fields = {}
+    for field in schema:
+        field_type = field.get('type', 'STRING').upper()
+        fields[field['name']] = {'type': ALIASES.get(field_type, field_type),
+                                 'mode': 'REPEATED' if field.get('mode', '').upper() == 'REPEATED' else 'NULLABLE',
+                                 'fields': _from_schema(field.get('fields', []))}
+    return fields
+
+
+def _to_schema(fields: dict) -> List[dict]:
+    schema = []
+    for name, field in fields.items():
+        entry = {'name': name, 'type': field['type'] or 'STRING', 'mode': field['mode']}
+        if field['type'] == 'RECORD':
+            entry['fields'] = _to_schema(field['fields'])
+        schema.append(entry)
+    return schema
+
+
+def infer_schema(files: List[str],
+                 source_format: str,
+                 output_path: str = None,
+                 schema_file_path: str = None,
+                 sample_rows: int = None,
+                 csv_field_delimiter: str = ',',
+                 csv_quote_character: str = '"',
+                 csv_skip_leading_rows: int = 0,
+                 max_processes: int = os.cpu_count()) -> List[dict]:
+    """
+    This function infers a BigQuery schema from local jsonl or csv files.
+
+    Each file is scanned as a stream in its own process and the field types
+    found in the files are merged, so memory use depends on the size of the
+    schema and not on the size of the data. Nested objects become RECORD
+    fields and arrays REPEATED fields. Conflicting types are widened, e.g.
+    INTEGER and FLOAT to FLOAT and anything else to STRING. Fields are never
+    inferred as REQUIRED.
+
+    Parameters
+    ----------
+    files: List[str]
+        The files which should be scanned
+    source_format: str
+        The file format, 'jsonl' or 'csv'
+    output_path: str
+        If given, the schema is written to this file, ready to be used as schema_file_path
+    schema_file_path: str
+        If given, this schema is widened by the fields and types found in the files.
+        Its REQUIRED fields are relaxed to NULLABLE.
+    sample_rows: int
+        If given, only the first rows of each file are scanned
+    csv_skip_leading_rows: int
+        Number of header rows in each csv file. Column names are taken from the first row.
+    max_processes: int
+        Number of files which are scanned at the same time
+    Returns
+    -------
+    List[dict]
+        The schema in the JSON representation of BigQuery
+    Raises
+    ------
+    ValueError
+        If the source format is not supported, a field contains records and scalar values
+        or csv files contain their columns in different orders
+    """
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    if source_format not in ('jsonl', 'csv'):
+        raise ValueError('Schemas cannot be inferred from source format {0}.'.format(source_format))
+
+    fields = {}
+    if schema_file_path:
+        with open(schema_file_path, 'r') as schema_file:
+            fields = _from_schema(json.load(schema_file))
+
+    options = {'sample_rows': sample_rows,
+               'csv_field_delimiter': csv_field_delimiter,
+               'csv_quote_character': csv_quote_character,
+               'csv_skip_leading_rows': int(csv_skip_leading_rows)}
+
+    columns = []
+    with ProcessPoolExecutor(max_workers=max_processes) as executor:
+        futures = [executor.submit(_infer_file, file, source_format, options) for file in files]
+        for file, future in zip(files, futures):
+            file_fields = future.result()
+            if source_format == 'csv':
+                names = list(file_fields)
+                if names[:len(columns)] != columns[:len(names)]:
+                    raise ValueError('The columns of {0} are in a different order than in the other files.'
+                                     .format(file))
+                columns = max(columns, names, key=len)
+            fields = _merge_fields(fields, file_fields)
+
+    if source_format == 'csv':
+        fields = _csv_order(fields, columns)
+
+    schema = _to_schema(fields)
+
+    if output_path:
+        with open(output_path, 'w') as output_file:
+            json.dump(schema, output_file, indent=2)
+
+    return schema
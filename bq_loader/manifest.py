@@ -0,0 +1,166 @@
+import os
+import base64
+import hashlib
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+PENDING = 'PENDING'
+SUBMITTED = 'SUBMITTED'
+DONE = 'DONE'
+FAILED = 'FAILED'
+
+
+@dataclass
+class ManifestEntry:
+    kind: str
+    target: str
+    key: str
+    size: int
+    mtime_ns: int
+    status: str
+    md5_hash: Optional[str] = None
+    blob_name: Optional[str] = None
+    job_id: Optional[str] = None
+    session_url: Optional[str] = None
+
+
+def md5_hash(file_path: str, chunk_size: int = 8 * 1024 ** 2) -> str:
+    """
+    This function returns the base64 encoded MD5 hash of a file, the same
+    representation Cloud Storage uses for ``Blob.md5_hash``.
+    """
+
+    md5 = hashlib.md5()
+    with open(file_path, 'rb') as file:
+        while chunk := file.read(chunk_size):
+            md5.update(chunk)
+    return base64.b64encode(md5.digest()).decode('ascii')
+
+
+def fingerprint(files: Iterable[str]) -> tuple:
+    """
+    This function returns the total size and the latest modification time of
+    one or several files.
+    """
+
+    size = 0
+    mtime_ns = 0
+    for file in files:
+        stat = os.stat(file)
+        size += stat.st_size
+        mtime_ns = max(mtime_ns, stat.st_mtime_ns)
+    return size, mtime_ns
+
+
+class Manifest:
+    """
+    A local SQLite record of the files which were processed by a run.
+
+    Each entry is identified by its kind ('upload' or 'load'), its target
+    (a bucket directory or a table) and the absolute path(s) of its file(s).
+    A rerun with the same manifest skips entries whose files have not changed
+    since they were finished, reattaches to load jobs which were already
+    submitted and resumes interrupted upload sessions.
+
+    The manifest can be shared by several threads and processes.
+
+    Parameters
+    ----------
+    path: str
+        Path of the SQLite database, created if it does not exist
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('''CREATE TABLE IF NOT EXISTS entries (
+                                        kind TEXT NOT NULL,
+                                        target TEXT NOT NULL,
+                                        key TEXT NOT NULL,
+                                        size INTEGER NOT NULL,
+                                        mtime_ns INTEGER NOT NULL,
+                                        status TEXT NOT NULL,
+                                        md5_hash TEXT,
+                                        blob_name TEXT,
+                                        job_id TEXT,
+                                        session_url TEXT,
+                                        PRIMARY KEY (kind, target, key))''')
+
+    @staticmethod
+    def key(files: Iterable[str]) -> str:
+        return '\n'.join(os.path.abspath(file) for file in files)
+
+    def get(self, kind: str, target: str, files: Iterable[str]) -> Optional[ManifestEntry]:
+        """
+        This method returns the entry of the given files if they did not change
+        since it was recorded.
+        """
+
+        files = list(files)
+        with self._lock:
+            row = self._connection.execute('SELECT * FROM entries WHERE kind=? AND target=? AND key=?',
+                                           (kind, target, self.key(files))).fetchone()
+        if row is None:
+            return None
+
+        entry = ManifestEntry(*row)
+        size, mtime_ns = fingerprint(files)
+
+        if size != entry.size:
+            return None
+        if mtime_ns != entry.mtime_ns:
+            if len(files) != 1 or entry.md5_hash is None or md5_hash(files[0]) != entry.md5_hash:
+                return None
+        return entry
+
+    def is_done(self, kind: str, target: str, files: Iterable[str]) -> bool:
+        entry = self.get(kind, target, files)
+        return entry is not None and entry.status == DONE
+
+    def record(self, kind: str, target: str, files: Iterable[str], status: str, **fields) -> None:
+        """
+        This method creates or updates the entry of the given files.
+
+        Parameters
+        ----------
+        kind: str
+            'upload' or 'load'
+        target: str
+            The bucket directory or the table
+        files: Iterable[str]
+            The file(s) of the entry
+        status: str
+            One of PENDING, SUBMITTED, DONE or FAILED
+        fields
+            Values of md5_hash, blob_name, job_id or session_url
+        """
+
+        files = list(files)
+        size, mtime_ns = fingerprint(files)
+        values = {'md5_hash': None, 'blob_name': None, 'job_id': None, 'session_url': None}
+
+        with self._lock:
+            row = self._connection.execute('SELECT size, mtime_ns, md5_hash, blob_name, job_id, session_url '
+                                           'FROM entries WHERE kind=? AND target=? AND key=?',
+                                           (kind, target, self.key(files))).fetchone()
+            if row is not None and row[:2] == (size, mtime_ns):
+                values.update(zip(values, row[2:]))
+            values.update(fields)
+
+            self._connection.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                     (kind, target, self.key(files), size, mtime_ns, status,
+                                      values['md5_hash'], values['blob_name'], values['job_id'],
+                                      values['session_url']))
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,207 @@
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import List, Optional
+
+
+def job_statistics(job) -> dict:
+    """
+    This function collects the statistics of a finished BigQuery job, e.g.
+    slot milliseconds, bytes processed, queue wait and execution time.
+    Statistics which the job does not report are left out.
+    """
+
+    properties = getattr(job, '_properties', None) or {}
+    statistics = properties.get('statistics', {})
+    load = statistics.get('load', {})
+
+    stats = {'job_id': getattr(job, 'job_id', None),
+             'state': getattr(job, 'state', None),
+             'slot_ms': getattr(job, 'slot_millis', None) or statistics.get('totalSlotMs'),
+             'bytes_processed': (getattr(job, 'total_bytes_processed', None)
+                                 or statistics.get('totalBytesProcessed')
+                                 or getattr(job, 'input_file_bytes', None)
+                                 or load.get('inputFileBytes')),
+             'output_rows': getattr(job, 'output_rows', None) or load.get('outputRows'),
+             'output_bytes': getattr(job, 'output_bytes', None) or load.get('outputBytes')}
+
+    created = getattr(job, 'created', None)
+    started = getattr(job, 'started', None)
+    ended = getattr(job, 'ended', None)
+    if created and started:
+        stats['queue_seconds'] = (started - created).total_seconds()
+    if started and ended:
+        stats['execution_seconds'] = (ended - started).total_seconds()
+
+    return {name: int(value) if isinstance(value, str) and value.isdigit() else value
+            for name, value in stats.items() if value is not None}
+
+
+class PrometheusExporter:
+    """
+    Exports phase timers, counters and job statistics to Prometheus.
+
+    Requires ``prometheus_client``.
+
+    Parameters
+    ----------
+    registry: prometheus_client.CollectorRegistry
+        The registry of the metrics. The default registry is used if not given.
+    namespace: str
+        The prefix of the metric names
+    """
+
+    def __init__(self, registry=None, namespace: str = 'bq_loader'):
+        from prometheus_client import REGISTRY, Counter, Histogram
+
+        registry = registry or REGISTRY
+        self.phase_seconds = Histogram('phase_seconds', 'Duration of a phase', ['phase'],
+                                       namespace=namespace, registry=registry)
+        self.events = Counter('events', 'Counted events, e.g. files and bytes', ['name'],
+                              namespace=namespace, registry=registry)
+        self.job_slot_ms = Counter('job_slot_ms', 'Slot milliseconds of BigQuery jobs',
+                                   namespace=namespace, registry=registry)
+        self.job_bytes = Counter('job_bytes_processed', 'Bytes processed by BigQuery jobs',
+                                 namespace=namespace, registry=registry)
+
+    def on_timer(self, phase: str, seconds: float) -> None:
+        self.phase_seconds.labels(phase=phase).observe(seconds)
+
+    def on_counter(self, name: str, value: float) -> None:
+        self.events.labels(name=name).inc(value)
+
+    def on_job(self, stats: dict) -> None:
+        self.job_slot_ms.inc(stats.get('slot_ms', 0))
+        self.job_bytes.inc(stats.get('bytes_processed', 0))
+
+
+class OpenTelemetryExporter:
+    """
+    Exports phase timers as spans and histograms and counters and job
+    statistics as OpenTelemetry metrics.
+
+    Requires ``opentelemetry-api``. Without a configured SDK all calls are no-ops.
+
+    Parameters
+    ----------
+    meter: opentelemetry.metrics.Meter
+        The meter of the instruments. The meter of the global provider is used if not given.
+    tracer: opentelemetry.trace.Tracer
+        The tracer of the phase spans. The tracer of the global provider is used if not given.
+    """
+
+    def __init__(self, meter=None, tracer=None):
+        from opentelemetry import metrics, trace
+
+        meter = meter or metrics.get_meter('bq_loader')
+        self.tracer = tracer or trace.get_tracer('bq_loader')
+        self.phase_seconds = meter.create_histogram('bq_loader.phase.duration', unit='s')
+        self.events = meter.create_counter('bq_loader.events')
+        self.job_slot_ms = meter.create_counter('bq_loader.job.slot_ms', unit='ms')
+        self.job_bytes = meter.create_counter('bq_loader.job.bytes_processed', unit='By')
+
+    def on_timer(self, phase: str, seconds: float) -> None:
+        self.phase_seconds.record(seconds, {'phase': phase})
+        end = time.time_ns()
+        span = self.tracer.start_span(phase, start_time=end - int(seconds * 1e9))
+        span.end(end_time=end)
+
+    def on_counter(self, name: str, value: float) -> None:
+        self.events.add(value, {'name': name})
+
+    def on_job(self, stats: dict) -> None:
+        self.job_slot_ms.add(stats.get('slot_ms', 0))
+        self.job_bytes.add(stats.get('bytes_processed', 0))
+
+
+class RunMetrics:
+    """
+    Collects timers and counters of the phases of a run and the statistics
+    of its BigQuery jobs. It is shared by all threads of a run.
+
+    Every observation is also passed on to the exporters, e.g. a
+    ``PrometheusExporter`` or an ``OpenTelemetryExporter``.
+
+    Parameters
+    ----------
+    exporters: List
+        Objects with the methods ``on_timer(phase, seconds)``,
+        ``on_counter(name, value)`` and ``on_job(stats)``
+    """
+
+    def __init__(self, exporters: Optional[List] = None):
+        self.exporters = exporters or []
+        self.started = datetime.now(timezone.utc)
+        self.phases = {}
+        self.counters = {}
+        self.jobs = []
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timer(self, phase: str):
+        """
+        This method measures the duration of the enclosed block as one
+        occurrence of the phase.
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.perf_counter() - start)
+
+    def observe(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            entry = self.phases.setdefault(phase, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+            entry['count'] += 1
+            entry['seconds'] += seconds
+            entry['max_seconds'] = max(entry['max_seconds'], seconds)
+        for exporter in self.exporters:
+            exporter.on_timer(phase, seconds)
+
+    def count(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+        for exporter in self.exporters:
+            exporter.on_counter(name, value)
+
+    def record_job(self, job) -> dict:
+        """
+        This method records the statistics of a finished BigQuery job and adds
+        its queue wait and execution time to the phases 'job_queue' and
+        'job_execution'.
+        """
+
+        stats = job_statistics(job)
+        with self._lock:
+            self.jobs.append(stats)
+        if 'queue_seconds' in stats:
+            self.observe('job_queue', stats['queue_seconds'])
+        if 'execution_seconds' in stats:
+            self.observe('job_execution', stats['execution_seconds'])
+        for exporter in self.exporters:
+            exporter.on_job(stats)
+        return stats
+
+    def report(self) -> dict:
+        """
+        This method returns the run report as a JSON serializable dictionary.
+        """
+
+        with self._lock:
+            return {'started': self.started.isoformat(),
+                    'wall_seconds': time.perf_counter() - self._start,
+                    'phases': {phase: dict(entry) for phase, entry in self.phases.items()},
+                    'counters': dict(self.counters),
+                    'jobs': {'count': len(self.jobs),
+                             'slot_ms': sum(job.get('slot_ms', 0) for job in self.jobs),
+                             'bytes_processed': sum(job.get('bytes_processed', 0) for job in self.jobs),
+                             'output_rows': sum(job.get('output_rows', 0) for job in self.jobs),
+                             'details': list(self.jobs)}}
+
+    def write_report(self, path: str) -> None:
+        with open(path, 'w') as report_file:
+            json.dump(self.report(), report_file, indent=2, default=str)
@@ -0,0 +1,304 @@
+import os
+import re
+import csv
+import json
+import hashlib
+from datetime import date, datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Union
+from .coalesce import FileBatch
+from .conversion import _parse_timestamp
+from .manifest import Manifest
+from .metrics import RunMetrics
+from .pipeline import LoadPipeline, FileLoadResult
+from .progress import Progress, resolve_progress
+from .scheduler import Scheduler
+
+PARTITION_FORMATS = {'HOUR': '%Y%m%d%H', 'DAY': '%Y%m%d', 'MONTH': '%Y%m', 'YEAR': '%Y'}
+NULL_PARTITION = '__NULL__'
+_ISO_DATE = re.compile(r'\d{4}-\d{2}-\d{2}')
+_EPOCH = re.compile(r'[+-]?\d+(\.\d*)?')
+
+
+def _parse_datetime(value) -> datetime:
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, tz=timezone.utc).replace(tzinfo=None)
+    return datetime.fromisoformat(value.strip().replace(' ', 'T', 1))
+
+
+def partition_id(value, partition_type: str = 'DAY', field_type: Optional[str] = None) -> str:
+    """
+    This function returns the partition id of a DATE, DATETIME or TIMESTAMP
+    value, e.g. '20210131' for daily partitions. Timestamps are partitioned
+    by their UTC time like in BigQuery. Null values belong to the '__NULL__'
+    partition.
+
+    Parameters
+    ----------
+    value: Union[str, int, float, date, datetime]
+        The value of the partition column
+    partition_type: str
+        'HOUR', 'DAY', 'MONTH' or 'YEAR'
+    field_type: str
+        The type of the partition column, 'DATE', 'DATETIME' or 'TIMESTAMP'.
+        Strings of timestamps may also be seconds since the epoch. Without
+        a type, strings like '2021-01-31' are read as dates and all other
+        values as timestamps.
+    Returns
+    -------
+    str
+        The partition id which follows the '$' of a partition decorator
+    """
+
+    if value is None or value == '':
+        return NULL_PARTITION
+
+    if isinstance(value, (date, datetime)):
+        pass
+    elif field_type == 'DATE' or (field_type is None and isinstance(value, str)
+                                  and _ISO_DATE.fullmatch(value.strip())):
+        value = date.fromisoformat(value.strip())
+    else:
+        if isinstance(value, str) and _EPOCH.fullmatch(value.strip()):
+            value = float(value)
+        value = _parse_datetime(value) if field_type == 'DATETIME' else _parse_timestamp(value)
+
+    return value.strftime(PARTITION_FORMATS[partition_type])
+
+
+def _output_name(file_path: str) -> str:
+    """
+    The name of the split files of a source file, which is the same in every
+    run, so a manifest recognizes the partitions of an earlier run.
+    """
+
+    digest = hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()[:12]
+    return f'{digest}_{os.path.basename(file_path)}'
+
+
+def _split_file(file_path: str,
+                source_format: str,
+                output_dir: str,
+                options: dict) -> Dict[str, str]:
+    name = _output_name(file_path)
+    outputs = {}
+    writers = {}
+
+    def output(partition: str):
+        if partition not in outputs:
+            os.makedirs(os.path.join(output_dir, partition), exist_ok=True)
+            outputs[partition] = open(os.path.join(output_dir, partition, name), 'w',
+                                      newline='', encoding='utf-8')
+        return outputs[partition]
+
+    try:
+        if source_format == 'csv':
+            quoting = csv.QUOTE_MINIMAL if options['csv_quote_character'] else csv.QUOTE_NONE
+            dialect = {'delimiter': options['csv_field_delimiter'],
+                       'quotechar': options['csv_quote_character'] or None,
+                       'quoting': quoting}
+            with open(file_path, 'r', newline='', encoding='utf-8') as file:
+                for i, row in enumerate(csv.reader(file, **dialect)):
+                    if i < options['csv_skip_leading_rows'] or not row:
+                        continue
+                    value = row[options['column']] if options['column'] < len(row) else None
+                    partition = partition_id(value, options['partition_type'], options['field_type'])
+                    if partition not in writers:
+                        writers[partition] = csv.writer(output(partition), lineterminator='\n', **dialect)
+                    writers[partition].writerow(row)
+        else:
+            with open(file_path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    if not line.strip():
+                        continue
+                    value = json.loads(line).get(options['partition_field'])
+                    partition = partition_id(value, options['partition_type'], options['field_type'])
+                    output(partition).write(line.rstrip('\n') + '\n')
+    finally:
+        for output_file in outputs.values():
+            output_file.close()
+
+    stat = os.stat(file_path)
+    for output_file in outputs.values():
+        os.utime(output_file.name, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    return {partition: output_file.name for partition, output_file in outputs.items()}
+
+
+def split_by_partition(files: Iterable[str],
+                       partition_field: str,
+                       source_format: str,
+                       output_dir: str,
+                       partition_type: str = 'DAY',
+                       schema: List[dict] = None,
+                       csv_field_delimiter: str = ',',
+                       csv_quote_character: str = '"',
+                       csv_skip_leading_rows: int = 0,
+                       max_processes: int = os.cpu_count()) -> Dict[str, List[str]]:
+    """
+    This function splits jsonl or csv files by the partition of the value in
+    their partition column.
+
+    Each file is read as a stream in its own process and its rows are written
+    to one file per partition below ``output_dir/<partition id>``. Header
+    rows of csv files are dropped. The split files are named after the path
+    of their source file and take its modification time, so splitting the
+    same files again gives the same files and a manifest skips partitions
+    which were loaded before.
+
+    Parameters
+    ----------
+    files: Iterable[str]
+        The files which should be split
+    partition_field: str
+        The name of the DATE, DATETIME or TIMESTAMP column
+    source_format: str
+        The format of the files, 'jsonl' or 'csv'
+    output_dir: str
+        The directory of the split files
+    partition_type: str
+        'HOUR', 'DAY', 'MONTH' or 'YEAR'
+    schema: List[dict]
+        The table schema, which gives the type of the partition column and
+        its position in csv files
+    max_processes: int
+        Number of files which are split at the same time
+    Returns
+    -------
+    Dict[str, List[str]]
+        The split files by partition id in order of the partition ids
+    Raises
+    ------
+    ValueError
+        If the source format or partition type is not supported or the
+        partition column is not in the schema of csv files
+    """
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    if source_format not in ('jsonl', 'csv'):
+        raise ValueError('Files in source format {0} cannot be partitioned.'.format(source_format))
+
+    if partition_type not in PARTITION_FORMATS:
+        raise ValueError('Partition type {0} is not implemented.'.format(partition_type))
+
+    types = {field['name']: field.get('type') for field in schema or []}
+    options = {'partition_field': partition_field,
+               'partition_type': partition_type,
+               'field_type': (types.get(partition_field) or '').upper() or None,
+               'csv_field_delimiter': csv_field_delimiter,
+               'csv_quote_character': csv_quote_character,
+               'csv_skip_leading_rows': int(csv_skip_leading_rows)}
+
+    if source_format == 'csv':
+        names = [field['name'] for field in schema or []]
+        if partition_field not in names:
+            raise ValueError('Partition field {0} is not in the schema.'.format(partition_field))
+        options['column'] = names.index(partition_field)
+
+    partitions = {}
+    with ProcessPoolExecutor(max_workers=max_processes) as executor:
+        futures = [executor.submit(_split_file, file, source_format, output_dir, options) for file in files]
+        for future in futures:
+            for partition, output_path in future.result().items():
+                partitions.setdefault(partition, []).append(output_path)
+
+    return dict(sorted(partitions.items()))
+
+
+def load_partitions(client,
+                    table,
+                    job_config,
+                    partitions: Dict[str, List[str]],
+                    max_partitions: int = 4,
+                    max_in_flight_bytes: int = 4 * 1024 ** 3,
+                    compression: Optional[str] = None,
+                    manifest: Optional[Manifest] = None,
+                    metrics: Optional[RunMetrics] = None,
+                    poll_interval: float = 1.0,
+                    scheduler: Optional[Scheduler] = None,
+                    progress: Union[bool, Progress] = False) -> List[FileLoadResult]:
+    """
+    This function loads the files of each partition into its partition
+    decorator 'table$<partition id>' with one load job per partition.
+
+    Up to ``max_partitions`` partitions are uploaded and loaded at the same
+    time. With WRITE_TRUNCATE only the loaded partitions are replaced.
+
+    Parameters
+    ----------
+    client: google.cloud.bigquery.Client
+        The BigQuery client
+    table: google.cloud.bigquery.TableReference
+        The partitioned table
+    job_config: google.cloud.bigquery.LoadJobConfig
+        The configuration used for every load job
+    partitions: Dict[str, List[str]]
+        The files by partition id, e.g. from split_by_partition
+    max_partitions: int
+        Number of partitions which are loaded at the same time
+    max_in_flight_bytes: int
+        Upper bound of bytes which are uploaded at the same time by all partitions
+    compression: str
+        If 'gzip', the data is compressed while it is uploaded
+    manifest: Manifest
+        If given, partitions which were already loaded are skipped
+    metrics: RunMetrics
+        Collects upload times, job wait times and the statistics of the jobs
+    poll_interval: float
+        Seconds between two polls of a pending load job
+    scheduler: Scheduler
+        Paces the submissions of all partitions and retries transient errors
+    progress: Union[bool, Progress]
+        Whether one progress bar of all partitions should be printed, or a
+        Progress which receives the uploads and load jobs of all partitions
+    Returns
+    -------
+    List[FileLoadResult]
+        One result per partition in order of the partition ids
+    Raises
+    ------
+    Exception
+        The first error of a partition, after all other partitions have been loaded
+    """
+
+    from google.cloud.bigquery import DatasetReference, TableReference
+
+    metrics = metrics or RunMetrics()
+    scheduler = scheduler or Scheduler(metrics=metrics)
+    owns_progress = progress is True
+    progress = resolve_progress(progress)
+
+    dataset = DatasetReference(table.project, table.dataset_id)
+
+    def load(partition: str, files: List[str]) -> FileLoadResult:
+        batch = FileBatch(files=files, size=sum(os.path.getsize(file) for file in files))
+        pipeline = LoadPipeline(client,
+                                TableReference(dataset, f'{table.table_id}${partition}'),
+                                job_config,
+                                max_uploads=1,
+                                poll_interval=poll_interval,
+                                max_in_flight_bytes=max(max_in_flight_bytes // max_partitions, 1),
+                                progress=progress,
+                                compression=compression,
+                                manifest=manifest,
+                                metrics=metrics,
+                                scheduler=scheduler)
+        try:
+            [result] = pipeline.run([batch])
+        except Exception as e:
+            result = FileLoadResult(file=batch.name, size=batch.size, error=e)
+        return result
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_partitions) as executor:
+            results = list(executor.map(load, partitions.keys(), partitions.values()))
+    finally:
+        if owns_progress:
+            progress.close()
+
+    for result in results:
+        if result.error is not None:
+            raise result.error
+
+    return results
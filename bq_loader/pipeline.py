@@ -0,0 +1,397 @@
+import os
+import time
+import uuid
+import threading
+from contextlib import suppress
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Union
+from .coalesce import FileBatch
+from .compression import GzipStream
+from .manifest import Manifest, SUBMITTED, DONE, FAILED
+from .metrics import RunMetrics
+from .progress import Progress, ProgressTask, resolve_progress
+from .scheduler import Scheduler, is_transient
+
+
+@dataclass
+class FileLoadResult:
+    file: str
+    size: int
+    upload_seconds: float = 0.0
+    job_seconds: float = 0.0
+    job_id: Optional[str] = None
+    state: Optional[str] = None
+    error: Optional[BaseException] = None
+    attempts: int = 0
+
+    @property
+    def throughput(self) -> float:
+        """
+        Upload throughput of the file in MB/s.
+        """
+        if self.upload_seconds <= 0:
+            return 0.0
+        return self.size / self.upload_seconds / 1024 ** 2
+
+
+@dataclass
+class _PendingJob:
+    result: FileLoadResult
+    job: object
+    submitted: float
+    source: object
+    poll_failures: int = 0
+    next_poll: float = 0.0
+
+
+class ByteBudget:
+    """
+    A counting semaphore over bytes. It blocks ``acquire`` while the number of
+    bytes in flight would exceed ``limit``. A single item larger than the limit
+    is admitted once nothing else is in flight, so oversized files cannot
+    deadlock the pipeline.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, size: int) -> None:
+        with self._condition:
+            while self.in_flight and self.in_flight + size > self.limit:
+                self._condition.wait()
+            self.in_flight += size
+
+    def release(self, size: int) -> None:
+        with self._condition:
+            self.in_flight -= size
+            self._condition.notify_all()
+
+
+class LoadPipeline:
+    """
+    Uploads local files into BigQuery load jobs with bounded concurrency.
+
+    Uploads run on a thread pool of ``max_uploads`` workers. Admission is
+    throttled by ``max_in_flight_bytes`` so only a bounded amount of data is
+    being streamed at any time. Submitted jobs are handed to a separate poller
+    thread that waits for their completion, so uploads of further files overlap
+    with the execution of earlier jobs.
+
+    Parameters
+    ----------
+    client: google.cloud.bigquery.Client
+        The BigQuery client (or any object with a compatible ``load_table_from_file``)
+    destination: google.cloud.bigquery.TableReference
+        The destination table
+    job_config: google.cloud.bigquery.LoadJobConfig
+        The configuration used for every load job
+    max_uploads: int
+        Number of concurrent uploads
+    max_in_flight_bytes: int
+        Upper bound of bytes which are uploaded at the same time
+    poll_interval: float
+        Seconds between two polls of the pending load jobs
+    progress: Union[bool, Progress]
+        Whether the progress bar should be printed, or a Progress which
+        receives the bytes read by the uploads and the finished jobs
+    compression: str
+        If 'gzip', the data is compressed while it is uploaded
+    manifest: Manifest
+        If given, files which were already loaded are skipped and jobs which
+        were submitted by an interrupted run are awaited instead of resubmitted
+    metrics: RunMetrics
+        Collects upload times, job wait times and the statistics of the jobs
+    scheduler: Scheduler
+        Paces the submissions and retries uploads which failed with transient
+        errors. Jobs which failed for transient reasons are requeued.
+    delete_loaded: bool
+        If True, each file is deleted once its job finished and it will not
+        be uploaded again, e.g. a temporary converted file
+    """
+
+    def __init__(self,
+                 client,
+                 destination,
+                 job_config,
+                 max_uploads: int = 4,
+                 max_in_flight_bytes: int = 4 * 1024 ** 3,
+                 poll_interval: float = 1.0,
+                 progress: Union[bool, Progress] = True,
+                 compression: Optional[str] = None,
+                 manifest: Optional[Manifest] = None,
+                 metrics: Optional[RunMetrics] = None,
+                 scheduler: Optional[Scheduler] = None,
+                 delete_loaded: bool = False):
+        self.client = client
+        self.destination = destination
+        self.job_config = job_config
+        self.max_uploads = max_uploads
+        self.budget = ByteBudget(max_in_flight_bytes)
+        self.poll_interval = poll_interval
+        self.progress = resolve_progress(progress)
+        self._owns_progress = progress is True
+        self.compression = compression
+        self.manifest = manifest
+        self.metrics = metrics or RunMetrics()
+        self.scheduler = scheduler or Scheduler(metrics=self.metrics)
+        self.target = str(destination)
+        self.delete_loaded = delete_loaded
+
+        self._submitted = 0
+        self._pending = []
+        self._uploads = 0
+        self._pending_lock = threading.Lock()
+        self._uploads_finished = threading.Event()
+        self._executor = None
+
+    def run(self, files: Iterable[Union[str, FileBatch]]) -> List[FileLoadResult]:
+        """
+        This method loads all files and waits for the completion of their jobs.
+
+        Parameters
+        ----------
+        files: Iterable[Union[str, FileBatch]]
+            The files which should be loaded. Each path or batch of files is
+            loaded by one job.
+        Returns
+        -------
+        List[FileLoadResult]
+            One result per file in the order of submission
+        Raises
+        ------
+        Exception
+            The first error raised by an upload or a load job, after all other
+            files have been processed
+        """
+
+        results = []
+        self._submitted = 0
+        self._uploads_finished.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_uploads)
+
+        poller = threading.Thread(target=self._poll, daemon=True)
+        poller.start()
+
+        try:
+            for source in files:
+                if isinstance(source, str):
+                    result = FileLoadResult(file=source, size=os.path.getsize(source))
+                else:
+                    result = FileLoadResult(file=source.name, size=source.size)
+                results.append(result)
+                if self.progress is not None:
+                    self.progress.expect(result.size)
+
+                if self.manifest is not None and self._resume(result, source):
+                    if self.progress is not None:
+                        self.progress.skip(result.size)
+                    continue
+
+                self._submitted += 1
+                self._submit(result, source)
+        finally:
+            self._uploads_finished.set()
+            poller.join()
+            self._executor.shutdown()
+            if self._owns_progress:
+                self.progress.close()
+
+        for result in results:
+            if result.error is None and result.state is None:
+                result.error = RuntimeError(f'The state of the load job {result.job_id} of {result.file} is unknown.')
+
+        for result in results:
+            if result.error is not None:
+                raise result.error
+
+        return results
+
+    @staticmethod
+    def _files(source) -> List[str]:
+        return [source] if isinstance(source, str) else source.files
+
+    def _resume(self, result: FileLoadResult, source) -> bool:
+        entry = self.manifest.get('load', self.target, self._files(source))
+        if entry is None:
+            return False
+
+        if entry.status == DONE:
+            result.job_id = entry.job_id
+            result.state = 'SKIPPED'
+            self.metrics.count('files_skipped')
+            return True
+
+        if entry.status == SUBMITTED and entry.job_id:
+            try:
+                job = self.client.get_job(entry.job_id)
+            except Exception:
+                return False
+            if job.done() and job.error_result:
+                return False
+            result.job_id = entry.job_id
+            self._submitted += 1
+            if self.progress is not None:
+                self.progress.job_submitted()
+            with self._pending_lock:
+                self._pending.append(_PendingJob(result, job, time.perf_counter(), source))
+            return True
+
+        return False
+
+    def _open(self, source, task: Optional[ProgressTask] = None):
+        if isinstance(source, str):
+            source_file = open(os.path.abspath(source), 'rb')
+        else:
+            source_file = source.open()
+        if task is not None:
+            task.done = 0
+            source_file = task.track(source_file)
+        if self.compression == 'gzip':
+            return GzipStream(source_file)
+        return source_file
+
+    def _submit(self, result: FileLoadResult, source) -> None:
+        self.budget.acquire(result.size)
+        with self._pending_lock:
+            self._uploads += 1
+        self._executor.submit(self._upload, result, source)
+
+    def _load(self, source, job_id: str, task: Optional[ProgressTask] = None):
+        """
+        Uploads a source with a fixed job id. If a retried upload finds the
+        job id taken, the job was created by an attempt whose response was
+        lost and is returned instead of loading the data twice.
+        """
+
+        from google.api_core.exceptions import Conflict
+
+        try:
+            with self._open(source, task) as source_file:
+                return self.client.load_table_from_file(source_file,
+                                                        self.destination,
+                                                        job_id=job_id,
+                                                        job_config=self.job_config)
+        except Conflict:
+            self.metrics.count('jobs_recovered')
+            return self.client.get_job(job_id)
+
+    def _upload(self, result: FileLoadResult, source) -> None:
+        start = time.perf_counter()
+        result.attempts += 1
+        job = None
+        task = self.progress.task(result.file, result.size) if self.progress is not None else None
+        job_id = f'bq_loader_load_{uuid.uuid4().hex}'
+        try:
+            job = self.scheduler.call(self._load, source, job_id, task)
+        except Exception as e:
+            result.error = e
+            self.metrics.count('uploads_failed')
+        finally:
+            result.upload_seconds = time.perf_counter() - start
+            self.metrics.observe('upload', result.upload_seconds)
+            self.budget.release(result.size)
+            if task is not None:
+                task.finish(result.error)
+                if job is not None:
+                    self.progress.job_submitted()
+
+        if job is not None:
+            self.metrics.count('files_uploaded')
+            self.metrics.count('bytes_uploaded', result.size)
+            result.job_id = getattr(job, 'job_id', None)
+            if self.manifest is not None:
+                self.manifest.record('load', self.target, self._files(source), SUBMITTED, job_id=result.job_id)
+
+        with self._pending_lock:
+            if job is not None:
+                self._pending.append(_PendingJob(result, job, time.perf_counter(), source))
+            self._uploads -= 1
+
+    def _done(self, pending: _PendingJob) -> bool:
+        """
+        Polls a job. A failed poll is retried with backoff after transient
+        errors, since the job itself may still run or have succeeded. Once
+        polling gives up, the error is recorded without requeueing the job.
+        """
+
+        if time.perf_counter() < pending.next_poll:
+            return False
+        try:
+            return pending.job.done()
+        except Exception as e:
+            pending.poll_failures += 1
+            if is_transient(e) and pending.poll_failures < self.scheduler.max_attempts:
+                self.metrics.count('poll_retries')
+                pending.next_poll = time.perf_counter() + self.scheduler.backoff(pending.poll_failures)
+                return False
+            pending.result.error = e
+            pending.result.state = 'UNKNOWN'
+            self.metrics.count('polls_failed')
+            return True
+
+    def _complete(self, pending: _PendingJob) -> None:
+        result, job, source = pending.result, pending.job, pending.source
+        if result.error is not None:
+            if self.progress is not None:
+                self.progress.job_done()
+            return
+
+        try:
+            job.result()
+        except Exception as e:
+            result.error = e
+        result.job_seconds = time.perf_counter() - pending.submitted
+        result.state = getattr(job, 'state', None) or ('FAILED' if result.error else 'DONE')
+        self.metrics.observe('job_wait', result.job_seconds)
+        self.metrics.record_job(job)
+        if (result.error is not None and result.attempts < self.scheduler.max_attempts
+                and is_transient(result.error, getattr(job, 'error_result', None))):
+            self.metrics.count('jobs_requeued')
+            result.error = None
+            result.state = None
+            if self.progress is not None:
+                self.progress.job_done()
+                self.progress.expect(result.size)
+            self._submit(result, source)
+            return
+        if result.error is not None:
+            self.metrics.count('jobs_failed')
+        if self.manifest is not None:
+            self.manifest.record('load', self.target, self._files(source),
+                                 FAILED if result.error else DONE, job_id=result.job_id)
+        if self.delete_loaded:
+            for file in self._files(source):
+                with suppress(OSError):
+                    os.remove(file)
+        if self.progress is not None:
+            self.progress.job_done()
+
+    def _poll(self) -> None:
+        while True:
+            finished = self._uploads_finished.is_set()
+
+            with self._pending_lock:
+                pending, self._pending = self._pending, []
+
+            still_pending = []
+            for item in pending:
+                if not self._done(item):
+                    still_pending.append(item)
+                    continue
+                try:
+                    self._complete(item)
+                except Exception as e:
+                    if item.result.error is None:
+                        item.result.error = e
+
+            with self._pending_lock:
+                self._pending[:0] = still_pending
+                empty = not self._pending and not self._uploads
+
+            if finished and empty:
+                return
+
+            time.sleep(self.poll_interval)
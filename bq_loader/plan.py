@@ -0,0 +1,387 @@
+import gzip
+import json
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Tuple
+from .coalesce import TEXT_FORMATS
+from .discovery import DiscoveredFile
+
+DEFAULT_UPLOAD_BYTES_PER_SECOND = 8 * 1024 ** 2
+DEFAULT_JOB_SECONDS = 20.0
+LOAD_JOBS_PER_TABLE_PER_DAY = 1500
+LOAD_JOBS_PER_PROJECT_PER_DAY = 100000
+MAX_LOAD_JOB_BYTES = 15 * 1024 ** 4
+MAX_COMPRESSED_FILE_BYTES = 4 * 1024 ** 3
+STORAGE_PRICE_PER_GIB_MONTH = 0.02
+WRITE_PRICE_PER_1000_REQUESTS = 0.005
+TYPE_ALIASES = {'INT64': 'INTEGER', 'FLOAT64': 'FLOAT', 'BOOL': 'BOOLEAN', 'STRUCT': 'RECORD'}
+GIB = 1024 ** 3
+
+
+@dataclass
+class Throughput:
+    upload_bytes_per_second: float = DEFAULT_UPLOAD_BYTES_PER_SECOND
+    job_seconds: float = DEFAULT_JOB_SECONDS
+    runs: int = 0
+
+
+@dataclass
+class LoadPlan:
+    target: str
+    files: int = 0
+    bytes: int = 0
+    upload_bytes: int = 0
+    compression_ratio: float = 1.0
+    load_jobs: int = 0
+    requests: int = 0
+    upload_seconds: float = 0.0
+    job_seconds: float = 0.0
+    cost: float = 0.0
+    throughput: Throughput = field(default_factory=Throughput)
+    errors: List[str] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
+
+    @property
+    def valid(self) -> bool:
+        return not self.errors
+
+    @property
+    def seconds(self) -> float:
+        return self.upload_seconds + self.job_seconds
+
+    def __str__(self) -> str:
+        source = f'measured in {self.throughput.runs} runs' if self.throughput.runs else 'default'
+        lines = [f'Plan for {self.target}',
+                 f'  files:        {self.files}',
+                 f'  bytes:        {self.bytes / GIB:.2f} GiB',
+                 f'  uploaded:     {self.upload_bytes / GIB:.2f} GiB (compression ratio {self.compression_ratio:.2f})',
+                 f'  load jobs:    {self.load_jobs}',
+                 f'  requests:     {self.requests}',
+                 f'  time:         {self.seconds:.0f} s ({source} throughput of '
+                 f'{self.throughput.upload_bytes_per_second / 1024 ** 2:.1f} MiB/s per upload, '
+                 f'{self.throughput.job_seconds:.0f} s per job)',
+                 f'  cost:         ${self.cost:.2f} (one month of storage and the write requests)']
+        lines.extend(f'  warning: {warning}' for warning in self.warnings)
+        lines.extend(f'  error: {error}' for error in self.errors)
+        return '\n'.join(lines)
+
+
+def measured_throughput(report_paths: Optional[List[str]] = None) -> Throughput:
+    """
+    This function derives the throughput of a single upload and the average
+    duration of a load job from the JSON run reports of previous runs.
+
+    Parameters
+    ----------
+    report_paths: List[str]
+        Paths of run reports, e.g. written with report_path
+    Returns
+    -------
+    Throughput
+        The measured throughput, or the defaults for values which no report contains
+    """
+
+    throughput = Throughput()
+    uploaded = upload_seconds = job_seconds = jobs = 0
+
+    for path in report_paths or []:
+        with open(path, 'r') as report_file:
+            report = json.load(report_file)
+        phases = report.get('phases', {})
+        if 'upload' in phases and report.get('counters', {}).get('bytes_uploaded'):
+            uploaded += report['counters']['bytes_uploaded']
+            upload_seconds += phases['upload']['seconds']
+        if 'job_execution' in phases:
+            jobs += phases['job_execution']['count']
+            job_seconds += phases['job_execution']['seconds'] + phases.get('job_queue', {}).get('seconds', 0.0)
+        throughput.runs += 1
+
+    if uploaded and upload_seconds:
+        throughput.upload_bytes_per_second = uploaded / upload_seconds
+    if jobs:
+        throughput.job_seconds = job_seconds / jobs
+
+    return throughput
+
+
+def sample_compression_ratio(files: List[DiscoveredFile], sample_files: int = 5, sample_bytes: int = 1024 ** 2) -> float:
+    """
+    This function estimates the gzip compression ratio of files by
+    compressing the first ``sample_bytes`` of up to ``sample_files`` files
+    spread over the list.
+
+    Parameters
+    ----------
+    files: List[DiscoveredFile]
+        The files which would be compressed
+    sample_files: int
+        Number of sampled files
+    sample_bytes: int
+        Number of bytes which are read from each sampled file
+    Returns
+    -------
+    float
+        Compressed bytes per uncompressed byte
+    """
+
+    step = max(len(files) // max(sample_files, 1), 1)
+    raw = compressed = 0
+
+    for file in files[::step][:sample_files]:
+        with open(file.path, 'rb') as sample_file:
+            data = sample_file.read(sample_bytes)
+        raw += len(data)
+        compressed += len(gzip.compress(data, 6, mtime=0))
+
+    return compressed / raw if raw else 1.0
+
+
+def _field_type(schema_field) -> str:
+    return TYPE_ALIASES.get(schema_field.field_type.upper(), schema_field.field_type.upper())
+
+
+def check_destination(client, table, job_config, merge_keys: Optional[List[str]] = None) -> Tuple[List[str], List[str]]:
+    """
+    This function checks a load job configuration against the existing
+    destination table without starting a job.
+
+    A non-empty table cannot be loaded with WRITE_EMPTY. Appended rows need
+    the same column types and modes and may not add columns. A load job
+    cannot change the partitioning of the table. WRITE_TRUNCATE replaces
+    the schema, which is reported as a warning.
+
+    Parameters
+    ----------
+    client: google.cloud.bigquery.Client
+        The BigQuery client
+    table: google.cloud.bigquery.TableReference
+        The destination table
+    job_config: google.cloud.bigquery.LoadJobConfig
+        The configuration of the load jobs
+    merge_keys: List[str]
+        The columns on which staging tables would be merged into the table
+    Returns
+    -------
+    Tuple[List[str], List[str]]
+        The errors which would fail the load and the warnings
+    """
+
+    from google.api_core.exceptions import NotFound
+
+    errors = []
+    warnings = []
+    schema = {schema_field.name: schema_field for schema_field in job_config.schema or []}
+
+    for key in merge_keys or []:
+        if key not in schema:
+            errors.append(f'Merge key {key} is not a column of the schema.')
+
+    try:
+        existing = client.get_table(table)
+    except NotFound:
+        warnings.append(f'Table {table} does not exist and will be created.')
+        return errors, warnings
+
+    disposition = str(job_config.write_disposition or 'WRITE_APPEND')
+    rows = existing.num_rows or 0
+
+    if disposition.endswith('WRITE_EMPTY') and rows and not merge_keys:
+        errors.append(f'WRITE_EMPTY fails because table {table} contains {rows} rows.')
+
+    partitioning = job_config.time_partitioning
+    current = existing.time_partitioning
+    if partitioning is not None and (current is None or partitioning.type_ != current.type_
+                                     or partitioning.field != current.field):
+        errors.append(f'The partitioning of table {table} differs from the job configuration.')
+
+    if disposition.endswith('WRITE_TRUNCATE') and not merge_keys:
+        if [(f.name, _field_type(f), f.mode) for f in existing.schema] != \
+                [(f.name, _field_type(f), f.mode) for f in schema.values()]:
+            warnings.append(f'WRITE_TRUNCATE replaces the schema of table {table}.')
+        return errors, warnings
+
+    columns = {schema_field.name: schema_field for schema_field in existing.schema}
+    for name, schema_field in schema.items():
+        column = columns.get(name)
+        if column is None:
+            errors.append(f'Column {name} does not exist in table {table}.')
+        elif _field_type(column) != _field_type(schema_field):
+            errors.append(f'Column {name} is {_field_type(column)} in table {table} '
+                          f'but {_field_type(schema_field)} in the schema.')
+        elif (column.mode or 'NULLABLE') != (schema_field.mode or 'NULLABLE'):
+            errors.append(f'Column {name} is {column.mode} in table {table} but {schema_field.mode} in the schema.')
+
+    for name, column in columns.items():
+        if name not in schema and column.mode == 'REQUIRED':
+            errors.append(f'Required column {name} of table {table} is missing in the schema.')
+
+    return errors, warnings
+
+
+def _plan_files(plan: LoadPlan,
+                files: Iterable[DiscoveredFile],
+                compression: Optional[str],
+                sample_files: int,
+                sample_bytes: int) -> List[DiscoveredFile]:
+    files = list(files)
+    plan.files = len(files)
+    plan.bytes = sum(file.size for file in files)
+
+    if compression == 'gzip':
+        plan.compression_ratio = sample_compression_ratio(files, sample_files, sample_bytes)
+    plan.upload_bytes = int(plan.bytes * plan.compression_ratio)
+
+    return files
+
+
+def plan_load(client,
+              table,
+              job_config,
+              files: Iterable[DiscoveredFile],
+              source_format: str,
+              max_uploads: int = 4,
+              compression: Optional[str] = None,
+              coalesce_bytes: int = 0,
+              staging_shards: int = 0,
+              merge_keys: Optional[List[str]] = None,
+              throughput: Optional[Throughput] = None,
+              sample_files: int = 5,
+              sample_bytes: int = 1024 ** 2) -> LoadPlan:
+    """
+    This function estimates the load jobs, bytes, duration and storage cost
+    of loading local files into a table and checks the job configuration
+    against the table. Nothing is uploaded.
+
+    Parameters
+    ----------
+    client: google.cloud.bigquery.Client
+        The BigQuery client, only used to read the destination table
+    table: google.cloud.bigquery.TableReference
+        The destination table
+    job_config: google.cloud.bigquery.LoadJobConfig
+        The configuration of the load jobs
+    files: Iterable[DiscoveredFile]
+        The files which would be loaded
+    source_format: str
+        The file format
+    max_uploads: int
+        Number of concurrent uploads
+    compression: str
+        If 'gzip', the compression ratio is sampled from the files
+    coalesce_bytes: int
+        If greater than 0, files are counted in batches of about this many bytes
+    staging_shards: int
+        If greater than 0, one more job publishes the staging tables
+    merge_keys: List[str]
+        If given, one more job merges the staging tables into the table
+    throughput: Throughput
+        The throughput of previous runs, see measured_throughput
+    sample_files: int
+        Number of files from which the compression ratio is sampled
+    sample_bytes: int
+        Number of bytes which are sampled from each file
+    Returns
+    -------
+    LoadPlan
+        The estimate and the errors and warnings of the checks
+    """
+
+    plan = LoadPlan(target=str(table), throughput=throughput or Throughput())
+    files = _plan_files(plan, files, compression, sample_files, sample_bytes)
+
+    if coalesce_bytes > 0:
+        batches = size = 0
+        for file in files:
+            if size and size + file.size > coalesce_bytes:
+                batches += 1
+                size = 0
+            size += file.size
+        plan.load_jobs = batches + bool(size)
+    else:
+        plan.load_jobs = len(files)
+
+    staged = staging_shards > 0 or bool(merge_keys)
+    jobs_on_table = 1 if staged else plan.load_jobs
+    plan.load_jobs += int(staged)
+    plan.requests = plan.load_jobs
+
+    if jobs_on_table > LOAD_JOBS_PER_TABLE_PER_DAY:
+        plan.errors.append(f'{jobs_on_table} load jobs exceed the quota of {LOAD_JOBS_PER_TABLE_PER_DAY} '
+                           f'per table and day. Coalesce the files or use staging tables.')
+    elif plan.load_jobs > LOAD_JOBS_PER_PROJECT_PER_DAY:
+        plan.errors.append(f'{plan.load_jobs} load jobs exceed the quota of {LOAD_JOBS_PER_PROJECT_PER_DAY} '
+                           f'per project and day.')
+
+    if coalesce_bytes > MAX_LOAD_JOB_BYTES:
+        plan.errors.append(f'Batches of {coalesce_bytes} bytes exceed the limit of {MAX_LOAD_JOB_BYTES} per load job.')
+
+    if compression == 'gzip' and source_format in TEXT_FORMATS:
+        too_large = [file.name for file in files if file.size * plan.compression_ratio > MAX_COMPRESSED_FILE_BYTES]
+        if too_large:
+            plan.errors.append(f'{len(too_large)} files exceed {MAX_COMPRESSED_FILE_BYTES} bytes after compression, '
+                               f'the limit of compressed {source_format} files, e.g. {too_large[0]}.')
+
+    errors, warnings = check_destination(client, table, job_config, merge_keys)
+    plan.errors.extend(errors)
+    plan.warnings.extend(warnings)
+
+    plan.upload_seconds = plan.upload_bytes / (plan.throughput.upload_bytes_per_second * max(max_uploads, 1))
+    plan.job_seconds = plan.throughput.job_seconds * (1 + int(staged)) if plan.load_jobs else 0.0
+    plan.cost = plan.bytes / GIB * STORAGE_PRICE_PER_GIB_MONTH
+
+    return plan
+
+
+def plan_upload(files: Iterable[DiscoveredFile],
+                target: str,
+                max_workers: int = 32,
+                compression: Optional[str] = None,
+                composite_threshold: Optional[int] = None,
+                composite_chunk_size: int = 256 * 1024 ** 2,
+                throughput: Optional[Throughput] = None,
+                sample_files: int = 5,
+                sample_bytes: int = 1024 ** 2) -> LoadPlan:
+    """
+    This function estimates the bytes, write requests, duration and cost of
+    uploading local files into a Google Bucket. Nothing is uploaded.
+
+    Parameters
+    ----------
+    files: Iterable[DiscoveredFile]
+        The files which would be uploaded
+    target: str
+        The destination, e.g. 'gs://bucket/directory'
+    max_workers: int
+        Number of concurrent uploads
+    compression: str
+        If 'gzip', the compression ratio is sampled from the files
+    composite_threshold: int
+        Files larger than this many bytes are counted as composite uploads
+    composite_chunk_size: int
+        Number of bytes per part of a composite upload
+    throughput: Throughput
+        The throughput of previous runs, see measured_throughput
+    sample_files: int
+        Number of files from which the compression ratio is sampled
+    sample_bytes: int
+        Number of bytes which are sampled from each file
+    Returns
+    -------
+    LoadPlan
+        The estimate of the upload
+    """
+
+    plan = LoadPlan(target=target, throughput=throughput or Throughput())
+    files = _plan_files(plan, files, compression, sample_files, sample_bytes)
+
+    for file in files:
+        if compression is None and composite_threshold is not None and file.size > composite_threshold:
+            parts = -(-file.size // composite_chunk_size)
+            plan.requests += parts + 1 + (-(-parts // 32) if parts > 32 else 0)
+        else:
+            plan.requests += 1
+
+    plan.upload_seconds = plan.upload_bytes / (plan.throughput.upload_bytes_per_second * max(max_workers, 1))
+    plan.cost = (plan.upload_bytes / GIB * STORAGE_PRICE_PER_GIB_MONTH
+                 + plan.requests / 1000 * WRITE_PRICE_PER_1000_REQUESTS)
+
+    return plan
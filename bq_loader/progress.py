@@ -0,0 +1,352 @@
+import io
+import sys
+import time
+import threading
+import warnings
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Union
+
+MB = 1024 ** 2
+
+
+@dataclass
+class ProgressSnapshot:
+    bytes_done: int = 0
+    bytes_total: int = 0
+    files_done: int = 0
+    files_total: int = 0
+    files_failed: int = 0
+    in_flight: int = 0
+    jobs_done: int = 0
+    jobs_total: int = 0
+    elapsed: float = 0.0
+    bytes_per_second: float = 0.0
+    finished: bool = False
+
+    @property
+    def fraction(self) -> float:
+        if self.bytes_total:
+            return min(self.bytes_done / self.bytes_total, 1.0)
+        return 1.0 if self.finished else 0.0
+
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        """
+        Seconds until the known bytes are transferred at the current rate,
+        None while the rate is unknown.
+        """
+        if self.finished:
+            return 0.0
+        if self.bytes_per_second <= 0:
+            return None
+        return max(self.bytes_total - self.bytes_done, 0) / self.bytes_per_second
+
+
+class ProgressTask:
+    """
+    The transfer of one file. ``advance`` only increments a counter of the
+    task and is meant to be called by the thread which reads the file, so the
+    hot path takes no lock.
+    """
+
+    __slots__ = ('name', 'size', 'done', '_progress')
+
+    def __init__(self, progress: 'Progress', name: str, size: int):
+        self.name = name
+        self.size = size
+        self.done = 0
+        self._progress = progress
+
+    def advance(self, n: int) -> None:
+        self.done += n
+
+    def update(self, done: int) -> None:
+        self.done = done
+
+    def track(self, file_obj) -> '_TrackedReader':
+        return _TrackedReader(file_obj, self)
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self._progress._finish(self, error)
+
+
+class _TrackedReader(io.RawIOBase):
+    """
+    A read-only binary stream which counts the bytes read from another
+    stream into a ProgressTask. A rewind, e.g. before a retry, is subtracted.
+    """
+
+    def __init__(self, file_obj, task: ProgressTask):
+        super().__init__()
+        self._file = file_obj
+        self._task = task
+        self.name = getattr(file_obj, 'name', None)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return self._file.seekable()
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        before = self._file.tell()
+        position = self._file.seek(offset, whence)
+        if position < before:
+            self._task.advance(position - before)
+        return position
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._file.read(size)
+        self._task.advance(len(data))
+        return data
+
+    def readinto(self, buffer) -> int:
+        n = self._file.readinto(buffer)
+        self._task.advance(n or 0)
+        return n
+
+    def close(self) -> None:
+        if not self.closed:
+            self._file.close()
+        super().close()
+
+
+class Progress:
+    """
+    Collects the progress of uploads and load jobs across worker threads
+    and publishes it to callbacks.
+
+    Workers report the files they start, the bytes they read and the jobs
+    which finish. A background thread sums them up every ``interval``
+    seconds into a ProgressSnapshot with the transfer rate and the estimated
+    time remaining and passes it to every callback, so rendering costs the
+    same however many files are transferred. The totals grow while files are
+    discovered. A final snapshot is published by ``close``.
+
+    Parameters
+    ----------
+    callbacks: List[Callable[[ProgressSnapshot], None]]
+        Called with each snapshot from the background thread, e.g. a ProgressBar
+    interval: float
+        Seconds between two snapshots
+    smoothing: float
+        Weight of the latest interval in the moving average of the rate
+    """
+
+    def __init__(self,
+                 callbacks: Optional[List[Callable[[ProgressSnapshot], None]]] = None,
+                 interval: float = 0.5,
+                 smoothing: float = 0.3):
+        self.callbacks = list(callbacks or [])
+        self.interval = interval
+        self.smoothing = smoothing
+
+        self._lock = threading.Lock()
+        self._active = set()
+        self._bytes_finished = 0
+        self._bytes_skipped = 0
+        self._bytes_total = 0
+        self._files_done = 0
+        self._files_total = 0
+        self._files_failed = 0
+        self._jobs_done = 0
+        self._jobs_total = 0
+        self._rate = 0.0
+        self._last = (0.0, 0)
+        self._start = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def subscribe(self, callback: Callable[[ProgressSnapshot], None]) -> None:
+        self.callbacks.append(callback)
+
+    def expect(self, size: int) -> None:
+        """
+        This method adds a file which will be transferred to the totals. A
+        file which is transferred again, e.g. for a requeued job, is added
+        again.
+        """
+
+        with self._lock:
+            self._files_total += 1
+            self._bytes_total += size
+        self._ensure_started()
+
+    def task(self, name: str, size: int) -> ProgressTask:
+        """
+        This method starts the transfer of a file.
+        """
+
+        task = ProgressTask(self, name, size)
+        with self._lock:
+            self._active.add(task)
+        self._ensure_started()
+        return task
+
+    def skip(self, size: int) -> None:
+        """
+        This method counts an expected file which needs no transfer as done.
+        Its bytes do not count towards the rate.
+        """
+
+        with self._lock:
+            self._files_done += 1
+            self._bytes_finished += size
+            self._bytes_skipped += size
+
+    def _finish(self, task: ProgressTask, error: Optional[BaseException]) -> None:
+        with self._lock:
+            self._active.discard(task)
+            if error is None:
+                self._files_done += 1
+                self._bytes_finished += task.size
+            else:
+                self._files_failed += 1
+                self._bytes_total -= task.size
+
+    def job_submitted(self) -> None:
+        with self._lock:
+            self._jobs_total += 1
+        self._ensure_started()
+
+    def job_done(self) -> None:
+        with self._lock:
+            self._jobs_done += 1
+
+    def snapshot(self, finished: bool = False) -> ProgressSnapshot:
+        """
+        This method returns the current progress.
+        """
+
+        now = time.perf_counter()
+        with self._lock:
+            active = list(self._active)
+            snapshot = ProgressSnapshot(bytes_done=self._bytes_finished,
+                                        bytes_total=self._bytes_total,
+                                        files_done=self._files_done,
+                                        files_total=self._files_total,
+                                        files_failed=self._files_failed,
+                                        in_flight=len(active),
+                                        jobs_done=self._jobs_done,
+                                        jobs_total=self._jobs_total,
+                                        elapsed=now - self._start if self._start is not None else 0.0,
+                                        finished=finished)
+            snapshot.bytes_done += sum(min(task.done, task.size) for task in active)
+
+            transferred = snapshot.bytes_done - self._bytes_skipped
+            last_time, last_bytes = self._last
+            if now > last_time and last_time:
+                rate = max(transferred - last_bytes, 0) / (now - last_time)
+                self._rate = rate if not self._rate else self.smoothing * rate + (1 - self.smoothing) * self._rate
+            self._last = (now, transferred)
+            snapshot.bytes_per_second = self._rate
+
+        return snapshot
+
+    def publish(self, finished: bool = False) -> ProgressSnapshot:
+        snapshot = self.snapshot(finished)
+        for callback in list(self.callbacks):
+            try:
+                callback(snapshot)
+            except Exception as e:
+                self.callbacks.remove(callback)
+                warnings.warn(f'Progress callback {callback!r} failed and was removed: {e}')
+        return snapshot
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._start = time.perf_counter()
+            self._last = (self._start, 0)
+            self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.publish()
+
+    def close(self) -> ProgressSnapshot:
+        """
+        This method stops the background thread and publishes the final snapshot.
+        """
+
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.publish(finished=True)
+
+    def __enter__(self) -> 'Progress':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def _duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return '--:--'
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}:{minutes:02d}:{seconds:02d}' if hours else f'{minutes:02d}:{seconds:02d}'
+
+
+class ProgressBar:
+    """
+    Renders progress snapshots as one line which is overwritten in place,
+    with the transferred bytes, the rate, the estimated time remaining, the
+    number of uploads in flight and the finished load jobs.
+
+    Parameters
+    ----------
+    stream: TextIO
+        The stream the line is written to, stdout if not given
+    width: int
+        Number of characters of the bar
+    """
+
+    def __init__(self, stream=None, width: int = 30):
+        self.stream = stream
+        self.width = width
+        self._length = 0
+
+    def format(self, snapshot: ProgressSnapshot) -> str:
+        block = int(round(self.width * snapshot.fraction))
+        text = (f'|{"=" * block}{" " * (self.width - block)}| {int(snapshot.fraction * 100):3d}% '
+                f'{snapshot.bytes_done / MB:.1f}/{snapshot.bytes_total / MB:.1f} MB '
+                f'{snapshot.bytes_per_second / MB:.1f} MB/s ETA {_duration(snapshot.eta_seconds)} '
+                f'{snapshot.in_flight} in flight {snapshot.files_done}/{snapshot.files_total} files')
+        if snapshot.jobs_total:
+            text += f' {snapshot.jobs_done}/{snapshot.jobs_total} jobs'
+        if snapshot.files_failed:
+            text += f' {snapshot.files_failed} failed'
+        return text
+
+    def __call__(self, snapshot: ProgressSnapshot) -> None:
+        stream = self.stream or sys.stdout
+        text = self.format(snapshot)
+        stream.write('\r' + text + ' ' * max(self._length - len(text), 0))
+        self._length = len(text)
+        if snapshot.finished:
+            stream.write('\n')
+            self._length = 0
+        stream.flush()
+
+
+def resolve_progress(progress: Union[bool, Progress, None]) -> Optional[Progress]:
+    """
+    This function returns the Progress of a ``progress`` argument: a new one
+    which renders a ProgressBar for True, None for False and the object itself
+    otherwise.
+    """
+
+    if progress is True:
+        return Progress(callbacks=[ProgressBar()])
+    if not progress:
+        return None
+    return progress
@@ -0,0 +1,147 @@
+import os
+from typing import Callable, Optional
+
+CHUNK_GRANULARITY = 256 * 1024
+
+
+def _http_error(response) -> Exception:
+    from google.api_core.exceptions import from_http_response
+    return from_http_response(response)
+
+
+def _persisted_bytes(response) -> int:
+    """
+    Number of bytes the server confirmed in a 308 response of a resumable upload.
+    """
+
+    byte_range = response.headers.get('Range')
+    if not byte_range:
+        return 0
+    return int(byte_range.rsplit('-', 1)[1]) + 1
+
+
+def query_session(transport, session_url: str, size: int) -> Optional[int]:
+    """
+    This function asks Cloud Storage how many bytes of a resumable upload
+    session were persisted.
+
+    Parameters
+    ----------
+    transport: google.auth.transport.requests.AuthorizedSession
+        The authorized HTTP session of the storage client
+    session_url: str
+        The URL of the resumable upload session
+    size: int
+        The total size of the upload
+    Returns
+    -------
+    Optional[int]
+        The offset at which the upload continues, ``size`` if the upload is
+        complete or None if the session expired
+    """
+
+    response = transport.put(session_url, data=b'', headers={'Content-Range': f'bytes */{size}'})
+
+    if response.status_code in (200, 201):
+        return size
+    if response.status_code == 308:
+        return _persisted_bytes(response)
+    if response.status_code in (404, 410):
+        return None
+    raise _http_error(response)
+
+
+def upload_file_resumable(blob,
+                          file_path: str,
+                          session_url: Optional[str] = None,
+                          on_session: Optional[Callable[[str], None]] = None,
+                          chunk_size: int = 32 * 1024 ** 2,
+                          content_type: Optional[str] = None,
+                          on_progress: Optional[Callable[[int], None]] = None,
+                          max_stalls: int = 5) -> Optional[dict]:
+    """
+    This function uploads a file through a Cloud Storage resumable upload
+    session. If the URL of an earlier session is given, the upload continues
+    at the last byte the server persisted instead of starting over.
+
+    Parameters
+    ----------
+    blob: google.cloud.storage.Blob
+        The destination blob
+    file_path: str
+        The file which should be uploaded
+    session_url: str
+        The URL of an interrupted upload session
+    on_session: Callable[[str], None]
+        Called with the URL of a newly created session before any data is sent
+    chunk_size: int
+        Number of bytes per request, rounded down to a multiple of 256 KiB
+    content_type: str
+        The content type of the blob
+    on_progress: Callable[[int], None]
+        Called with the number of bytes the server persisted after each request
+    max_stalls: int
+        Number of requests in a row after which the server persisted no new
+        bytes before the upload is given up
+    Returns
+    -------
+    Optional[dict]
+        The object resource returned by Cloud Storage, if the upload was not
+        already complete
+    Raises
+    ------
+    ConnectionError
+        If the server persisted no new bytes after max_stalls requests in a
+        row. The session can be resumed later.
+    """
+
+    size = os.path.getsize(file_path)
+    chunk_size = max(chunk_size - chunk_size % CHUNK_GRANULARITY, CHUNK_GRANULARITY)
+    transport = blob.client._http
+
+    offset = None
+    if session_url:
+        offset = query_session(transport, session_url, size)
+
+    if offset is None:
+        session_url = blob.create_resumable_upload_session(content_type=content_type, size=size)
+        if on_session is not None:
+            on_session(session_url)
+        offset = 0
+
+    if on_progress is not None:
+        on_progress(offset)
+
+    if size == 0:
+        response = transport.put(session_url, data=b'', headers={'Content-Range': 'bytes */0'})
+        if response.status_code not in (200, 201):
+            raise _http_error(response)
+        return response.json()
+
+    stalls = 0
+    with open(file_path, 'rb') as file:
+        while offset < size:
+            file.seek(offset)
+            chunk = file.read(chunk_size)
+            end = offset + len(chunk) - 1
+            response = transport.put(session_url,
+                                     data=chunk,
+                                     headers={'Content-Range': f'bytes {offset}-{end}/{size}'})
+
+            if response.status_code in (200, 201):
+                if on_progress is not None:
+                    on_progress(size)
+                return response.json()
+            if response.status_code != 308:
+                raise _http_error(response)
+
+            persisted = _persisted_bytes(response)
+            stalls = stalls + 1 if persisted <= offset else 0
+            if stalls >= max_stalls:
+                raise ConnectionError(f'Upload session {session_url} persisted no bytes after offset {offset} '
+                                      f'in {stalls} requests.')
+            offset = persisted
+            if on_progress is not None:
+                on_progress(offset)
+
+    return None
@@ -0,0 +1,361 @@
+import io
+import json
+import time as timer
+import base64
+from collections import deque
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+from .metrics import RunMetrics
+from .pipeline import FileLoadResult
+
+DICT = 'dict'
+PANDAS = 'pandas'
+ARROW = 'arrow'
+
+
+@dataclass
+class RowChunk:
+    kind: str
+    data: Any
+    rows: int
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode('ascii')
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def _kind(item) -> str:
+    if isinstance(item, Mapping):
+        return DICT
+    package = type(item).__module__.split('.')[0]
+    if package == 'pandas':
+        return PANDAS
+    if package == 'pyarrow':
+        return ARROW
+    raise TypeError('Rows of type {0} cannot be loaded.'.format(type(item).__name__))
+
+
+def _kind_or_none(item) -> Optional[str]:
+    try:
+        return _kind(item)
+    except TypeError:
+        return None
+
+
+def chunk_rows(rows, chunk_size: int = 10000) -> Iterator[RowChunk]:
+    """
+    This function splits rows into chunks of at most ``chunk_size`` rows.
+
+    Parameters
+    ----------
+    rows: Union[Iterable[dict], DataFrame, pyarrow.Table, Iterable[Union[DataFrame, pyarrow.Table, pyarrow.RecordBatch]]]
+        The rows as dicts, a pandas DataFrame, an Arrow table or an iterable
+        of DataFrames, Arrow tables or record batches
+    chunk_size: int
+        Number of rows per chunk
+    Returns
+    -------
+    Iterator[RowChunk]
+        Lists of dicts, DataFrame slices or Arrow record batches
+    Raises
+    ------
+    TypeError
+        If the rows are of an unsupported type or of different types
+    """
+
+    if not isinstance(rows, Mapping) and _kind_or_none(rows) in (PANDAS, ARROW):
+        rows = [rows]
+
+    kind = None
+    buffer = []
+
+    for item in rows:
+        item_kind = _kind(item)
+        if kind is None:
+            kind = item_kind
+        elif item_kind != kind:
+            raise TypeError('Rows of type {0} and {1} cannot be mixed.'.format(kind, item_kind))
+
+        if kind == DICT:
+            buffer.append(item)
+            if len(buffer) >= chunk_size:
+                yield RowChunk(DICT, buffer, len(buffer))
+                buffer = []
+        elif kind == PANDAS:
+            for start in range(0, len(item), chunk_size):
+                chunk = item.iloc[start:start + chunk_size]
+                yield RowChunk(PANDAS, chunk, len(chunk))
+        else:
+            batches = item.to_batches(max_chunksize=chunk_size) if hasattr(item, 'to_batches') else [item]
+            for batch in batches:
+                for start in range(0, batch.num_rows, chunk_size):
+                    chunk = batch.slice(start, chunk_size)
+                    yield RowChunk(ARROW, chunk, chunk.num_rows)
+
+    if buffer:
+        yield RowChunk(DICT, buffer, len(buffer))
+
+
+def encode_json(chunk: RowChunk) -> bytes:
+    """
+    This function serializes a chunk of dicts or a DataFrame slice into
+    newline delimited JSON. Dates and times are written in ISO format,
+    decimals as strings and bytes in base64 like BigQuery expects them.
+    """
+
+    if chunk.kind == PANDAS:
+        text = chunk.data.to_json(orient='records', lines=True, date_format='iso', date_unit='us')
+        return (text if text.endswith('\n') else text + '\n').encode('utf-8')
+
+    return ''.join(json.dumps(row, default=_json_default, separators=(',', ':')) + '\n'
+                   for row in chunk.data).encode('utf-8')
+
+
+class _Sink(io.RawIOBase):
+
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b''.join(self._parts)
+        self._parts.clear()
+        return data
+
+
+class ParquetEncoder:
+    """
+    Writes Arrow record batches as one Parquet file, of which each call
+    returns the bytes written so far. The footer is returned by finish.
+    """
+
+    def __init__(self):
+        self._sink = _Sink()
+        self._writer = None
+
+    def __call__(self, chunk: RowChunk) -> bytes:
+        import pyarrow.parquet as pq
+
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self._sink, chunk.data.schema)
+        self._writer.write_batch(chunk.data)
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        if self._writer is not None:
+            self._writer.close()
+        return self._sink.drain()
+
+
+class RowStream(io.RawIOBase):
+    """
+    A read-only binary stream which serializes chunks of rows on the fly.
+
+    Chunks are taken from the iterator while the stream is read and
+    serialized on a thread pool, and the results are emitted in order. At
+    most ``2 * workers`` chunks are held in memory at a time, so an
+    unbounded generator is loaded with bounded memory. Encoders with a
+    ``finish`` method, which keep state between chunks like the Parquet
+    encoder, run on a single thread.
+
+    Parameters
+    ----------
+    chunks: Iterable[RowChunk]
+        The chunks which should be serialized
+    encode: Callable[[RowChunk], bytes]
+        Serializes one chunk
+    workers: int
+        Number of threads which serialize chunks in parallel
+    """
+
+    def __init__(self, chunks: Iterable[RowChunk], encode: Callable[[RowChunk], bytes] = encode_json, workers: int = 4):
+        super().__init__()
+        self.name = '<rows>'
+        self.rows = 0
+        self._chunks = iter(chunks)
+        self._encode = encode
+        self._finish = getattr(encode, 'finish', None)
+        self._workers = 1 if self._finish is not None else max(workers, 1)
+        self._executor = ThreadPoolExecutor(max_workers=self._workers)
+        self._futures = deque()
+        self._buffer = memoryview(b'')
+        self._eof = False
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if (whence == io.SEEK_SET and offset == self._position) or (whence == io.SEEK_CUR and offset == 0):
+            return self._position
+        raise io.UnsupportedOperation('RowStream can only be read sequentially')
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast('B')
+        while not self._buffer:
+            self._fill()
+            if not self._futures:
+                return 0
+            self._buffer = memoryview(self._futures.popleft().result())
+
+        n = min(len(view), len(self._buffer))
+        view[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        self._position += n
+        return n
+
+    def _fill(self) -> None:
+        while not self._eof and len(self._futures) < 2 * self._workers:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._eof = True
+                if self._finish is not None:
+                    self._futures.append(self._executor.submit(self._finish))
+                break
+            self.rows += chunk.rows
+            self._futures.append(self._executor.submit(self._encode, chunk))
+
+    def close(self) -> None:
+        if not self.closed:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        super().close()
+
+
+def load_rows(client,
+              table,
+              job_config,
+              chunks: Iterable[RowChunk],
+              workers: int = 4,
+              rows_per_job: Optional[int] = None,
+              metrics: Optional[RunMetrics] = None) -> List[FileLoadResult]:
+    """
+    This function streams chunks of rows into load jobs without writing
+    files.
+
+    Each load job reads a RowStream while the chunks are serialized. With
+    ``rows_per_job`` a new load job is started after about this many rows,
+    so an unbounded generator is loaded in pieces. The next job is uploaded
+    while the previous ones run. The write disposition of the job config
+    applies to the first job, all further jobs append.
+
+    Parameters
+    ----------
+    client: google.cloud.bigquery.Client
+        The BigQuery client
+    table: google.cloud.bigquery.TableReference
+        The destination table
+    job_config: google.cloud.bigquery.LoadJobConfig
+        The configuration of the first load job
+    chunks: Iterable[RowChunk]
+        The chunks of rows, e.g. of chunk_rows
+    workers: int
+        Number of threads which serialize chunks in parallel
+    rows_per_job: int
+        Upper bound of rows per load job, rounded up to whole chunks. All
+        rows are loaded by one job if not given.
+    metrics: RunMetrics
+        Collects upload times, job wait times and the statistics of the jobs
+    Returns
+    -------
+    List[FileLoadResult]
+        Bytes, upload throughput, job id and state of each load job
+    Raises
+    ------
+    Exception
+        The first error of a load job, after all other jobs finished
+    """
+
+    from google.cloud.bigquery import LoadJobConfig, WriteDisposition
+
+    metrics = metrics or RunMetrics()
+    chunks = iter(chunks)
+    append_config = LoadJobConfig.from_api_repr(job_config.to_api_repr())
+    append_config.write_disposition = WriteDisposition.WRITE_APPEND
+
+    def job_chunks(head: RowChunk) -> Iterator[RowChunk]:
+        rows = 0
+        chunk = head
+        while chunk is not None:
+            yield chunk
+            rows += chunk.rows
+            if rows_per_job and rows >= rows_per_job:
+                return
+            chunk = next(chunks, None)
+
+    results = []
+    jobs = []
+    head = next(chunks, None)
+
+    while head is not None:
+        encode = ParquetEncoder() if head.kind == ARROW else encode_json
+        result = FileLoadResult(file=f'<rows {len(results)}>', size=0)
+        results.append(result)
+
+        start = timer.perf_counter()
+        with RowStream(job_chunks(head), encode=encode, workers=workers) as stream:
+            try:
+                job = client.load_table_from_file(stream,
+                                                  table,
+                                                  job_config=job_config if not jobs else append_config)
+            except Exception as e:
+                result.error = e
+                job = None
+            result.size = stream.tell()
+            rows = stream.rows
+        result.upload_seconds = timer.perf_counter() - start
+        metrics.observe('upload', result.upload_seconds)
+
+        if job is None:
+            break
+
+        metrics.count('rows_uploaded', rows)
+        metrics.count('bytes_uploaded', result.size)
+        result.job_id = getattr(job, 'job_id', None)
+        jobs.append((result, job, timer.perf_counter()))
+        head = next(chunks, None)
+
+    for result, job, submitted in jobs:
+        try:
+            job.result()
+        except Exception as e:
+            result.error = e
+            metrics.count('jobs_failed')
+        result.job_seconds = timer.perf_counter() - submitted
+        result.state = getattr(job, 'state', None)
+        metrics.observe('job_wait', result.job_seconds)
+        metrics.record_job(job)
+
+    for result in results:
+        if result.error is not None:
+            raise result.error
+
+    return results
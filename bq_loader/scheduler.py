@@ -0,0 +1,249 @@
+import time
+import random
+import threading
+from functools import lru_cache
+from typing import Callable, Optional
+from .metrics import RunMetrics
+
+TRANSIENT_REASONS = ('rateLimitExceeded', 'backendError', 'internalError', 'jobBackendError', 'jobInternalError')
+
+
+@lru_cache(maxsize=None)
+def _transient_errors() -> tuple:
+    from google.api_core import exceptions
+
+    return (exceptions.TooManyRequests,
+            exceptions.InternalServerError,
+            exceptions.BadGateway,
+            exceptions.ServiceUnavailable,
+            exceptions.GatewayTimeout,
+            ConnectionError,
+            TimeoutError)
+
+
+def _reasons(error) -> list:
+    return [entry.get('reason') for entry in getattr(error, 'errors', None) or [] if isinstance(entry, dict)]
+
+
+def is_transient(error: BaseException = None, error_result: dict = None) -> bool:
+    """
+    This function classifies an error of a request or a failed job.
+
+    Rate limits and server errors are transient and worth a retry, e.g. 429,
+    5xx whatever their reasons, 403 with reason 'rateLimitExceeded' or a job
+    which failed with reason 'backendError'. Invalid data, missing permissions and exceeded
+    daily quotas are permanent.
+
+    Parameters
+    ----------
+    error: BaseException
+        The exception of a request or of ``job.result()``
+    error_result: dict
+        The ``error_result`` of a failed job
+    Returns
+    -------
+    bool
+        Whether the request or job should be retried
+    """
+
+    if error_result is not None and error_result.get('reason') in TRANSIENT_REASONS:
+        return True
+
+    if error is None:
+        return False
+
+    from google.api_core import exceptions
+
+    try:
+        from requests import exceptions as requests_exceptions
+        if isinstance(error, (requests_exceptions.ConnectionError, requests_exceptions.Timeout)):
+            return True
+    except ImportError:
+        pass
+
+    if isinstance(error, _transient_errors()):
+        return True
+
+    if isinstance(error, (exceptions.Forbidden, exceptions.BadRequest)):
+        return any(reason in TRANSIENT_REASONS for reason in _reasons(error))
+
+    return False
+
+
+class TokenBucket:
+    """
+    Paces calls to at most ``rate`` per second with bursts of up to
+    ``capacity`` calls. A rate of None does not limit calls.
+    """
+
+    def __init__(self, rate: Optional[float], capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate or 1, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        This method blocks until a token is available and returns the seconds it waited.
+        """
+
+        if not self.rate:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class CircuitBreaker:
+    """
+    Stops all calls for ``reset_timeout`` seconds after ``failure_threshold``
+    transient failures in a row. Afterwards a single trial call is let
+    through; its success closes the circuit and its failure opens it again.
+    """
+
+    CLOSED = 'CLOSED'
+    OPEN = 'OPEN'
+    HALF_OPEN = 'HALF_OPEN'
+
+    def __init__(self, failure_threshold: int = 10, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened = 0.0
+        self._condition = threading.Condition()
+
+    def wait(self) -> None:
+        """
+        This method blocks while the circuit is open or a trial call is running.
+        """
+
+        with self._condition:
+            while True:
+                if self.state == self.CLOSED:
+                    return
+                if self.state == self.OPEN:
+                    remaining = self.opened + self.reset_timeout - time.monotonic()
+                    if remaining <= 0:
+                        self.state = self.HALF_OPEN
+                        return
+                    self._condition.wait(remaining)
+                else:
+                    self._condition.wait()
+
+    def success(self) -> None:
+        with self._condition:
+            self.failures = 0
+            self.state = self.CLOSED
+            self._condition.notify_all()
+
+    def failure(self) -> None:
+        with self._condition:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened = time.monotonic()
+            self._condition.notify_all()
+
+
+class Scheduler:
+    """
+    Paces and retries the requests of a run: uploads and load job submissions.
+
+    Every call waits for a token of a shared token bucket, so submissions
+    stay below ``rate`` per second. Transient errors are retried with
+    exponential backoff and full jitter. A circuit breaker pauses all calls
+    after repeated transient failures, so a throttled or unavailable service
+    is not hammered by every worker. Load jobs which failed for transient
+    reasons are requeued up to ``max_attempts`` times.
+
+    Parameters
+    ----------
+    rate: float
+        Calls per second. None does not limit calls.
+    burst: float
+        Number of calls which may be made at once after an idle period
+    max_attempts: int
+        Number of attempts of a call or a load job
+    initial_backoff: float
+        Upper bound of the first delay in seconds
+    max_backoff: float
+        Upper bound of every delay in seconds
+    failure_threshold: int
+        Number of transient failures in a row which open the circuit
+    reset_timeout: float
+        Seconds for which the open circuit stops all calls
+    metrics: RunMetrics
+        Counts retries and the seconds spent waiting for tokens
+    """
+
+    def __init__(self,
+                 rate: float = None,
+                 burst: float = None,
+                 max_attempts: int = 5,
+                 initial_backoff: float = 1.0,
+                 max_backoff: float = 60.0,
+                 failure_threshold: int = 10,
+                 reset_timeout: float = 30.0,
+                 metrics: Optional[RunMetrics] = None):
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.max_attempts = max_attempts
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.metrics = metrics or RunMetrics()
+        self.random = random.Random()
+
+    def backoff(self, attempt: int) -> float:
+        """
+        This method returns a random delay between 0 and the exponential
+        backoff of the attempt, which starts at 1.
+        """
+
+        return self.random.uniform(0, min(self.max_backoff, self.initial_backoff * 2 ** (attempt - 1)))
+
+    def call(self, function: Callable, *args, **kwargs):
+        """
+        This method calls the function with pacing and retries.
+
+        Returns
+        -------
+        The return value of the function
+        Raises
+        ------
+        Exception
+            A permanent error or the transient error of the last attempt
+        """
+
+        attempt = 1
+        while True:
+            self.breaker.wait()
+            waited = self.bucket.acquire()
+            if waited:
+                self.metrics.observe('throttle', waited)
+            try:
+                value = function(*args, **kwargs)
+            except Exception as e:
+                if not is_transient(e):
+                    self.breaker.success()
+                    raise
+                self.breaker.failure()
+                if attempt >= self.max_attempts:
+                    raise
+                self.metrics.count('retries')
+                time.sleep(self.backoff(attempt))
+                attempt += 1
+            else:
+                self.breaker.success()
+                return value
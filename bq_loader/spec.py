@@ -0,0 +1,235 @@
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from typing import List, Optional, Union
+from .metrics import RunMetrics
+
+METHODS = ('create_table_from_local', 'create_table_from_bucket', 'create_tables_from_bucket', 'upload_files_to_bucket',
+           'stream_rows_to_table')
+PLANNED_METHODS = ('create_table_from_local', 'upload_files_to_bucket')
+DONE = 'DONE'
+FAILED = 'FAILED'
+SKIPPED = 'SKIPPED'
+
+
+@dataclass
+class TaskResult:
+    name: str
+    method: str
+    status: str
+    seconds: float = 0.0
+    error: Optional[BaseException] = None
+
+
+def load_spec(path: str) -> dict:
+    """
+    This function reads a job spec from a YAML or JSON file.
+
+    Parameters
+    ----------
+    path: str
+        Path to a '.yaml', '.yml' or '.json' file
+    Returns
+    -------
+    dict
+        The job spec
+    """
+
+    with open(path, 'r') as spec_file:
+        if os.path.splitext(path)[1].lower() in ('.yaml', '.yml'):
+            import yaml
+            return yaml.safe_load(spec_file)
+        return json.load(spec_file)
+
+
+def _tasks(spec: dict) -> List[dict]:
+    """
+    Applies the defaults of the spec to its tasks and checks names, methods
+    and dependencies.
+    """
+
+    defaults = spec.get('defaults', {})
+    tasks = []
+    names = set()
+
+    for n, task in enumerate(spec.get('tasks', [])):
+        task = {**defaults, **task}
+        task.setdefault('name', f'task_{n}')
+        depends_on = task.get('depends_on', [])
+        task['depends_on'] = [depends_on] if isinstance(depends_on, str) else list(depends_on)
+
+        if task['name'] in names:
+            raise ValueError('Task name {0} is not unique.'.format(task['name']))
+        if task.get('method') not in METHODS:
+            raise ValueError('Method {0} of task {1} is not implemented.'.format(task.get('method'), task['name']))
+        names.add(task['name'])
+        tasks.append(task)
+
+    for task in tasks:
+        for dependency in task['depends_on']:
+            if dependency not in names:
+                raise ValueError('Task {0} depends on unknown task {1}.'.format(task['name'], dependency))
+
+    remaining = {task['name']: set(task['depends_on']) for task in tasks}
+    while remaining:
+        ready = [name for name, dependencies in remaining.items() if not dependencies & remaining.keys()]
+        if not ready:
+            raise ValueError('Tasks {0} have cyclic dependencies.'.format(', '.join(sorted(remaining))))
+        for name in ready:
+            del remaining[name]
+
+    return tasks
+
+
+def run_spec(spec: Union[str, dict],
+             max_workers: int = None,
+             metrics: RunMetrics = None,
+             report_path: str = None,
+             dry_run: bool = False,
+             history: List[str] = None) -> List[TaskResult]:
+    """
+    This function runs the loads, uploads and bucket imports of a job spec
+    concurrently in one process.
+
+    All tasks share the BigQuery and storage clients and the parsed schemas.
+    A task starts as soon as the tasks in its 'depends_on' list are done, e.g.
+    a load after the upload of its files. A task fails if its method raises or,
+    for create_tables_from_bucket, if one of its loads failed. Tasks whose
+    dependencies failed are skipped. At most ``max_workers`` tasks run at the same time.
+
+    A spec has the form::
+
+        max_workers: 4
+        defaults:
+          project_id: bigschol
+          dataset_id: test_dataset
+        tasks:
+          - name: upload
+            method: upload_files_to_bucket
+            bucket_name: bigschol
+            file_path: test_data/*
+            gcb_dir: tests
+          - name: load
+            method: create_table_from_bucket
+            depends_on: upload
+            uri: gs://bigschol/tests/*
+            table_id: crossref
+            schema_file_path: test_schema/schema_crossref.json
+            source_format: jsonl
+
+    Every other key of a task is passed to its method.
+
+    Parameters
+    ----------
+    spec: Union[str, dict]
+        The spec or the path to a YAML or JSON spec file
+    max_workers: int
+        Number of tasks which run at the same time. Overrides 'max_workers' of the spec.
+    metrics: RunMetrics
+        Collects the metrics of all tasks
+    report_path: str
+        If given, the run report of the metrics is written to this JSON file.
+        Overrides 'report_path' of the spec.
+    dry_run: bool
+        If True, the loads from local files and the uploads are only planned
+        and all other tasks are skipped. Dependencies are not awaited. A task
+        fails if its plan contains errors.
+    history: List[str]
+        Paths of run reports of previous runs, from which the throughput of
+        a dry run is estimated
+    Returns
+    -------
+    List[TaskResult]
+        The status and duration of each task in the order of the spec
+    Raises
+    ------
+    ValueError
+        If a task name is not unique, a method is not implemented or the
+        dependencies are unknown or cyclic
+    """
+
+    import bq_loader
+
+    if isinstance(spec, str):
+        spec = load_spec(spec)
+
+    tasks = _tasks(spec)
+    max_workers = max_workers or spec.get('max_workers', 4)
+    report_path = report_path or spec.get('report_path')
+    metrics = metrics or RunMetrics()
+
+    results = {task['name']: TaskResult(name=task['name'], method=task['method'], status=SKIPPED)
+               for task in tasks}
+
+    def run(task: dict) -> None:
+        result = results[task['name']]
+        kwargs = {key: value for key, value in task.items() if key not in ('name', 'method', 'depends_on')}
+        if task['method'] != 'stream_rows_to_table':
+            kwargs['metrics'] = metrics
+        if task['method'] == 'create_table_from_bucket':
+            kwargs['raise_errors'] = True
+        if dry_run:
+            if task['method'] not in PLANNED_METHODS:
+                print(f'Task {task["name"]} skipped, {task["method"]} cannot be planned.')
+                return
+            kwargs.update(dry_run=True, history=history)
+        start = time.perf_counter()
+        try:
+            value = getattr(bq_loader, task['method'])(**kwargs)
+            if dry_run and not value.valid:
+                raise ValueError(' '.join(value.errors))
+            if task['method'] == 'create_tables_from_bucket':
+                errors = [load.error for load in value if load.error is not None]
+                if errors:
+                    raise errors[0]
+            status = DONE
+        except Exception as e:
+            result.error = e
+            status = FAILED
+        result.seconds = time.perf_counter() - start
+        metrics.observe(f'task:{task["name"]}', result.seconds)
+        result.status = status
+
+    pending = list(tasks)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            for task in list(pending):
+                unfinished = running.keys() | {other['name'] for other in pending}
+                if not dry_run and unfinished.intersection(task['depends_on']):
+                    continue
+                pending.remove(task)
+                if dry_run or all(results[dependency].status == DONE for dependency in task['depends_on']):
+                    running[task['name']] = executor.submit(run, task)
+                else:
+                    print(f'Task {task["name"]} skipped, a dependency failed.')
+
+            if running:
+                finished, _ = wait(running.values(), return_when=FIRST_COMPLETED)
+                for name in [name for name, future in running.items() if future in finished]:
+                    running.pop(name).result()
+
+    if report_path:
+        metrics.write_report(report_path)
+
+    ordered = [results[task['name']] for task in tasks]
+    print_summary(ordered)
+    return ordered
+
+
+def print_summary(results: List[TaskResult]) -> None:
+    """
+    This function prints one line per task and the number of tasks per status.
+    """
+
+    width = max((len(result.name) for result in results), default=4)
+    print()
+    for result in results:
+        error = f'  {result.error}' if result.error is not None else ''
+        print(f'{result.name:<{width}}  {result.method:<26} {result.status:<8} {result.seconds:8.1f}s{error}')
+
+    counts = {status: sum(result.status == status for result in results) for status in (DONE, FAILED, SKIPPED)}
+    print(', '.join(f'{count} {status.lower()}' for status, count in counts.items()))
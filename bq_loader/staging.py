@@ -0,0 +1,249 @@
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Union
+from .coalesce import FileBatch
+from .metrics import RunMetrics
+from .pipeline import LoadPipeline, FileLoadResult
+from .progress import Progress, resolve_progress
+from .scheduler import Scheduler
+
+
+def _size(source: Union[str, FileBatch]) -> int:
+    return source.size if isinstance(source, FileBatch) else os.path.getsize(source)
+
+
+def shard_files(files: List[Union[str, FileBatch]], shards: int) -> List[List[int]]:
+    """
+    This function splits files into up to ``shards`` groups of about the same
+    number of bytes. The largest files are placed first, each into the
+    group with the fewest bytes so far.
+
+    Parameters
+    ----------
+    files: List[Union[str, FileBatch]]
+        The files or batches which should be split
+    shards: int
+        Number of groups
+    Returns
+    -------
+    List[List[int]]
+        The positions of the files of each non-empty group in ascending order
+    """
+
+    groups = [[] for _ in range(max(min(shards, len(files)), 1))]
+    sizes = [0] * len(groups)
+
+    for n, size in sorted(enumerate(map(_size, files)), key=lambda item: item[1], reverse=True):
+        group = sizes.index(min(sizes))
+        groups[group].append(n)
+        sizes[group] += size
+
+    return [sorted(group) for group in groups if group]
+
+
+def merge_statement(table,
+                    staging_tables: list,
+                    columns: List[str],
+                    merge_keys: List[str]) -> str:
+    """
+    This function returns a MERGE statement which upserts the rows of all
+    staging tables into the table, matching rows on the merge keys.
+
+    Parameters
+    ----------
+    table: google.cloud.bigquery.TableReference
+        The target table
+    staging_tables: List[google.cloud.bigquery.TableReference]
+        The tables with the new rows
+    columns: List[str]
+        All columns of the schema
+    merge_keys: List[str]
+        The columns which identify a row
+    Returns
+    -------
+    str
+        The MERGE statement
+    """
+
+    source = '\n    UNION ALL\n    '.join(f'SELECT * FROM `{staging_table}`' for staging_table in staging_tables)
+    condition = ' AND '.join(f'target.`{key}` = source.`{key}`' for key in merge_keys)
+    updates = ', '.join(f'`{column}` = source.`{column}`' for column in columns if column not in merge_keys)
+
+    statement = f'MERGE `{table}` AS target\nUSING (\n    {source}\n) AS source\nON {condition}\n'
+    if updates:
+        statement += f'WHEN MATCHED THEN UPDATE SET {updates}\n'
+    return statement + 'WHEN NOT MATCHED THEN INSERT ROW'
+
+
+def _table(reference, job_config, expires: Optional[datetime] = None):
+    from google.cloud.bigquery import Table
+
+    table = Table(reference, schema=job_config.schema)
+    table.time_partitioning = job_config.time_partitioning
+    table.clustering_fields = job_config.clustering_fields
+    if expires is not None:
+        table.expires = expires
+    return table
+
+
+def load_staged(client,
+                table,
+                job_config,
+                files: List[Union[str, FileBatch]],
+                shards: int = 4,
+                merge_keys: Optional[List[str]] = None,
+                max_uploads: int = 4,
+                max_in_flight_bytes: int = 4 * 1024 ** 3,
+                compression: Optional[str] = None,
+                staging_expiration: timedelta = timedelta(days=1),
+                metrics: Optional[RunMetrics] = None,
+                poll_interval: float = 1.0,
+                scheduler: Optional[Scheduler] = None,
+                progress: Union[bool, Progress] = False) -> List[FileLoadResult]:
+    """
+    This function loads groups of files in parallel into staging tables and
+    publishes them to the table with one job, so the table either receives
+    all rows or none.
+
+    Each of up to ``shards`` groups is loaded into its own staging table
+    '<table>__staging_<run>_<n>' next to the table. Once all groups are
+    loaded, a copy job with all staging tables as sources writes them to the
+    table with the write disposition of the job config. With ``merge_keys``
+    a MERGE statement upserts the rows instead: rows with the same keys are
+    updated and all other rows are inserted. If a load fails, the table is
+    not touched. The staging tables are deleted in any case and expire after
+    ``staging_expiration`` should the deletion not happen.
+
+    Parameters
+    ----------
+    client: google.cloud.bigquery.Client
+        The BigQuery client
+    table: google.cloud.bigquery.TableReference
+        The target table
+    job_config: google.cloud.bigquery.LoadJobConfig
+        The configuration of the loads. Its write disposition is used for
+        the copy into the table.
+    files: List[Union[str, FileBatch]]
+        The files or batches which should be loaded
+    shards: int
+        Number of staging tables which are loaded at the same time
+    merge_keys: List[str]
+        If given, the rows are merged into the table on these columns
+    max_uploads: int
+        Number of concurrent uploads of all shards
+    max_in_flight_bytes: int
+        Upper bound of bytes which are uploaded at the same time by all shards
+    compression: str
+        If 'gzip', the data is compressed while it is uploaded
+    staging_expiration: timedelta
+        Time after which left over staging tables expire
+    metrics: RunMetrics
+        Collects upload times, job wait times and the statistics of the jobs
+    poll_interval: float
+        Seconds between two polls of a pending load job
+    scheduler: Scheduler
+        Paces the submissions of all shards and retries transient errors
+    progress: Union[bool, Progress]
+        Whether one progress bar of all shards should be printed, or a
+        Progress which receives the uploads, the load jobs and the publishing job
+    Returns
+    -------
+    List[FileLoadResult]
+        Size, upload throughput, job id and state of each file in order of the files
+    Raises
+    ------
+    ValueError
+        If a merge key is not in the schema
+    Exception
+        The first error of a load, the copy job or the MERGE statement
+    """
+
+    from google.cloud.bigquery import CopyJobConfig, DatasetReference, LoadJobConfig, TableReference, WriteDisposition
+
+    metrics = metrics or RunMetrics()
+    scheduler = scheduler or Scheduler(metrics=metrics)
+    files = list(files)
+
+    columns = [field.name for field in job_config.schema or []]
+    for key in merge_keys or []:
+        if key not in columns:
+            raise ValueError('Merge key {0} is not in the schema.'.format(key))
+
+    if not files:
+        return []
+
+    groups = shard_files(files, shards)
+    owns_progress = progress is True
+    progress = resolve_progress(progress)
+
+    run = uuid.uuid4().hex[:8]
+    dataset = DatasetReference(table.project, table.dataset_id)
+    staging_tables = [TableReference(dataset, f'{table.table_id}__staging_{run}_{n}') for n in range(len(groups))]
+
+    staging_config = LoadJobConfig.from_api_repr(job_config.to_api_repr())
+    staging_config.write_disposition = WriteDisposition.WRITE_APPEND
+    expires = datetime.now(timezone.utc) + staging_expiration
+
+    def load(staging_table, group: List[int]) -> List[FileLoadResult]:
+        sources = [files[n] for n in group]
+        pipeline = LoadPipeline(client,
+                                staging_table,
+                                staging_config,
+                                max_uploads=max(max_uploads // len(groups), 1),
+                                poll_interval=poll_interval,
+                                max_in_flight_bytes=max(max_in_flight_bytes // len(groups), 1),
+                                progress=progress,
+                                compression=compression,
+                                metrics=metrics,
+                                scheduler=scheduler)
+        try:
+            return pipeline.run(sources)
+        except Exception as e:
+            return [FileLoadResult(file=getattr(source, 'name', source), size=_size(source), error=e)
+                    for source in sources]
+
+    try:
+        with metrics.timer('staging'):
+            for staging_table in staging_tables:
+                scheduler.call(client.create_table, _table(staging_table, job_config, expires))
+
+        with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+            results = [None] * len(files)
+            for group, shard_results in zip(groups, executor.map(load, staging_tables, groups)):
+                for n, result in zip(group, shard_results):
+                    results[n] = result
+
+        for result in results:
+            if result.error is not None:
+                raise result.error
+
+        with metrics.timer('publish'):
+            if merge_keys:
+                scheduler.call(client.create_table, _table(table, job_config), exists_ok=True)
+                job = scheduler.call(client.query, merge_statement(table, staging_tables, columns, merge_keys))
+            else:
+                copy_config = CopyJobConfig(write_disposition=job_config.write_disposition)
+                job = scheduler.call(client.copy_table, staging_tables, table, job_config=copy_config)
+            if progress is not None:
+                progress.job_submitted()
+            try:
+                job.result()
+            finally:
+                metrics.record_job(job)
+                if progress is not None:
+                    progress.job_done()
+
+        print(f'Published {len(staging_tables)} staging tables to {table}.')
+    finally:
+        with metrics.timer('cleanup'):
+            for staging_table in staging_tables:
+                try:
+                    client.delete_table(staging_table, not_found_ok=True)
+                except Exception as e:
+                    print(f'Staging table {staging_table} could not be deleted: {e}')
+        if owns_progress:
+            progress.close()
+
+    return results
@@ -0,0 +1,336 @@
+import glob
+import json
+import queue
+import base64
+import threading
+from decimal import Decimal
+from datetime import date, datetime, time, timezone
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional
+from .conversion import _read_rows, _batches, _parse_timestamp, _parse_bool, _field_type
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+STREAM_TYPES = ('committed', 'pending')
+
+
+@dataclass
+class StreamResult:
+    rows: int = 0
+    batches: int = 0
+    streams: List[str] = field(default_factory=list)
+    commit_time: Optional[datetime] = None
+
+
+def _proto_descriptor(schema: List[dict], name: str = 'Row'):
+    """
+    This function builds a self-contained proto2 descriptor for a BigQuery schema.
+    RECORD fields become nested message types.
+    """
+
+    from google.protobuf import descriptor_pb2
+
+    field_types = descriptor_pb2.FieldDescriptorProto
+    scalars = {'INTEGER': field_types.TYPE_INT64, 'FLOAT': field_types.TYPE_DOUBLE,
+               'BOOLEAN': field_types.TYPE_BOOL, 'BYTES': field_types.TYPE_BYTES,
+               'TIMESTAMP': field_types.TYPE_INT64, 'DATE': field_types.TYPE_INT32}
+
+    descriptor = descriptor_pb2.DescriptorProto(name=name)
+    for number, schema_field in enumerate(schema, start=1):
+        field_type = _field_type(schema_field)
+        mode = schema_field.get('mode', 'NULLABLE').upper()
+        proto_field = descriptor.field.add(name=schema_field['name'], number=number)
+        proto_field.label = {'REPEATED': field_types.LABEL_REPEATED,
+                             'REQUIRED': field_types.LABEL_REQUIRED}.get(mode, field_types.LABEL_OPTIONAL)
+        if field_type == 'RECORD':
+            nested = _proto_descriptor(schema_field.get('fields', []), f'{name}_{schema_field["name"]}')
+            descriptor.nested_type.append(nested)
+            proto_field.type = field_types.TYPE_MESSAGE
+            proto_field.type_name = nested.name
+        else:
+            proto_field.type = scalars.get(field_type, field_types.TYPE_STRING)
+    return descriptor
+
+
+def _message_class(descriptor):
+    from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+
+    file_descriptor = descriptor_pb2.FileDescriptorProto(name=f'{descriptor.name}.proto',
+                                                         package='bq_loader',
+                                                         syntax='proto2')
+    file_descriptor.message_type.append(descriptor)
+    pool = descriptor_pool.DescriptorPool()
+    pool.Add(file_descriptor)
+    return message_factory.GetMessageClass(pool.FindMessageTypeByName(f'bq_loader.{descriptor.name}'))
+
+
+def _proto_value(field_type: str, value):
+    """
+    Converts a value of a jsonl or csv file or a Python object into the
+    representation the Storage Write API expects for the field type.
+    """
+
+    if field_type == 'TIMESTAMP':
+        value = value if isinstance(value, datetime) else _parse_timestamp(value)
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        delta = value - EPOCH
+        return (delta.days * 86400 + delta.seconds) * 10 ** 6 + delta.microseconds
+    if field_type == 'DATE':
+        value = value if isinstance(value, date) else date.fromisoformat(value.strip())
+        return (value - EPOCH.date()).days
+    if field_type in ('DATETIME', 'TIME'):
+        return value.isoformat() if isinstance(value, (datetime, time)) else str(value)
+    if field_type == 'INTEGER':
+        return int(value)
+    if field_type == 'FLOAT':
+        return float(value)
+    if field_type == 'BOOLEAN':
+        return _parse_bool(value)
+    if field_type == 'BYTES':
+        return value if isinstance(value, bytes) else base64.b64decode(value)
+    if field_type == 'JSON' and not isinstance(value, str):
+        return json.dumps(value)
+    if isinstance(value, Decimal):
+        return format(value, 'f')
+    return str(value)
+
+
+def _fill(message, schema: List[dict], row: dict, from_csv: bool) -> None:
+    for schema_field in schema:
+        name = schema_field['name']
+        value = row.get(name)
+        field_type = _field_type(schema_field)
+        if value is None or (from_csv and value == '' and field_type != 'STRING'):
+            continue
+
+        if schema_field.get('mode', '').upper() == 'REPEATED':
+            target = getattr(message, name)
+            for item in value:
+                if field_type == 'RECORD':
+                    _fill(target.add(), schema_field.get('fields', []), item, from_csv)
+                else:
+                    target.append(_proto_value(field_type, item))
+        elif field_type == 'RECORD':
+            getattr(message, name).SetInParent()
+            _fill(getattr(message, name), schema_field.get('fields', []), value, from_csv)
+        else:
+            setattr(message, name, _proto_value(field_type, value))
+
+
+class RowSerializer:
+    """
+    Serializes rows into protocol buffers which match a BigQuery schema.
+
+    Parameters
+    ----------
+    schema: List[dict]
+        The schema in the JSON representation of BigQuery
+    from_csv: bool
+        Whether the rows were read from csv files, where empty strings are null
+    """
+
+    def __init__(self, schema: List[dict], from_csv: bool = False):
+        self.schema = schema
+        self.from_csv = from_csv
+        self.descriptor = _proto_descriptor(schema)
+        self.message_class = _message_class(self.descriptor)
+
+    def serialize(self, row: dict) -> bytes:
+        message = self.message_class()
+        _fill(message, self.schema, row, self.from_csv)
+        return message.SerializeToString()
+
+
+class _AppendStream:
+    """
+    One write stream with its own offset. Every append carries the offset of
+    its first row, so a retried append is deduplicated by BigQuery.
+    """
+
+    def __init__(self, write_client, parent: str, stream_type: str, serializer: RowSerializer, max_retries: int):
+        from google.cloud.bigquery_storage_v1 import types
+
+        self.types = types
+        self.write_client = write_client
+        self.serializer = serializer
+        self.max_retries = max_retries
+        self.offset = 0
+
+        write_stream = types.WriteStream(type_=types.WriteStream.Type.PENDING if stream_type == 'pending'
+                                         else types.WriteStream.Type.COMMITTED)
+        self.name = write_client.create_write_stream(parent=parent, write_stream=write_stream).name
+
+    def append(self, rows: List[dict]) -> None:
+        from google.api_core.exceptions import AlreadyExists, GoogleAPICallError
+
+        types = self.types
+        proto_rows = types.ProtoRows(serialized_rows=[self.serializer.serialize(row) for row in rows])
+        request = types.AppendRowsRequest(
+            write_stream=self.name,
+            offset=self.offset,
+            proto_rows=types.AppendRowsRequest.ProtoData(
+                writer_schema=types.ProtoSchema(proto_descriptor=self.serializer.descriptor),
+                rows=proto_rows))
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                for response in self.write_client.append_rows(iter([request])):
+                    if response.error.code:
+                        raise RuntimeError(f'Append to {self.name} failed: {response.error.message}')
+                break
+            except AlreadyExists:
+                break
+            except GoogleAPICallError:
+                if attempt == self.max_retries:
+                    raise
+
+        self.offset += len(rows)
+
+    def finalize(self) -> None:
+        self.write_client.finalize_write_stream(name=self.name)
+
+
+def stream_rows_to_table(table_id: str,
+                         project_id: str,
+                         dataset_id: str,
+                         schema_file_path: str,
+                         rows: Iterable[dict] = None,
+                         file_path: str = None,
+                         source_format: str = 'jsonl',
+                         csv_field_delimiter: str = ',',
+                         csv_quote_character: str = '"',
+                         csv_skip_leading_rows: int = 0,
+                         stream_type: str = 'committed',
+                         max_streams: int = 4,
+                         batch_rows: int = 500,
+                         max_retries: int = 3,
+                         write_client=None) -> StreamResult:
+    """
+    This function appends rows to an existing table through the BigQuery
+    Storage Write API instead of a load job.
+
+    Rows are serialized into protocol buffers in batches and appended by
+    ``max_streams`` parallel write streams. With 'committed' streams rows are
+    visible as soon as they are appended. With 'pending' streams nothing is
+    visible until all streams were finalized and committed together in a
+    single atomic commit, which gives exactly-once delivery for the whole run.
+    Each append carries its stream offset, so retries do not duplicate rows.
+
+    Requires ``google-cloud-bigquery-storage``.
+
+    Parameters
+    ----------
+    table_id: str
+        The name of the table
+    project_id: str
+        The name of the project in BigQuery
+    dataset_id: str
+        The name of the dataset in BigQuery
+    schema_file_path: str
+        Path to the table schema
+    rows: Iterable[dict]
+        Rows as dictionaries, e.g. from a generator
+    file_path: str
+        The directory or file from which rows are read, if rows is not given
+    source_format: str
+        The format of the files, 'jsonl' or 'csv'
+    stream_type: str
+        'committed' or 'pending'
+    max_streams: int
+        Number of parallel write streams
+    batch_rows: int
+        Number of rows per append request
+    max_retries: int
+        Number of retries of a failed append request
+    write_client: google.cloud.bigquery_storage_v1.BigQueryWriteClient
+        The write client. A new client is created if not given.
+    Returns
+    -------
+    StreamResult
+        The number of rows and batches, the names of the streams and the
+        commit time of pending streams
+    Raises
+    ------
+    ValueError
+        If neither or both of rows and file_path are given or the stream type is not supported
+    FileNotFoundError
+        If the file_path does not exist
+    """
+
+    if (rows is None) == (file_path is None):
+        raise ValueError('Either rows or file_path must be given.')
+
+    if stream_type not in STREAM_TYPES:
+        raise ValueError('Stream type {0} is not implemented.'.format(stream_type))
+
+    if write_client is None:
+        from google.cloud.bigquery_storage_v1 import BigQueryWriteClient
+        write_client = BigQueryWriteClient()
+
+    from google.cloud.bigquery_storage_v1 import types
+
+    with open(schema_file_path, 'r') as schema_file:
+        schema = json.load(schema_file)
+
+    if file_path is not None:
+        files = glob.glob(file_path)
+        if not files:
+            raise FileNotFoundError('No such file or directory: {0}'.format(file_path))
+        options = {'csv_field_delimiter': csv_field_delimiter,
+                   'csv_quote_character': csv_quote_character,
+                   'csv_skip_leading_rows': int(csv_skip_leading_rows)}
+        rows = (row for file in files for row in _read_rows(file, source_format, schema, options))
+
+    serializer = RowSerializer(schema, from_csv=file_path is not None and source_format == 'csv')
+    parent = write_client.table_path(project_id, dataset_id, table_id)
+    streams = [_AppendStream(write_client, parent, stream_type, serializer, max_retries) for _ in range(max_streams)]
+
+    result = StreamResult(streams=[stream.name for stream in streams])
+    batches = queue.Queue(maxsize=2 * max_streams)
+    errors = []
+    lock = threading.Lock()
+
+    def worker(stream: _AppendStream) -> None:
+        while True:
+            batch = batches.get()
+            if batch is None:
+                return
+            if errors:
+                continue
+            try:
+                stream.append(batch)
+                with lock:
+                    result.rows += len(batch)
+                    result.batches += 1
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(stream,), daemon=True) for stream in streams]
+    for thread in threads:
+        thread.start()
+
+    try:
+        for batch in _batches(rows, batch_rows):
+            if errors:
+                break
+            batches.put(batch)
+    finally:
+        for _ in threads:
+            batches.put(None)
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+
+    for stream in streams:
+        stream.finalize()
+
+    if stream_type == 'pending':
+        response = write_client.batch_commit_write_streams(
+            types.BatchCommitWriteStreamsRequest(parent=parent, write_streams=result.streams))
+        if response.stream_errors:
+            raise RuntimeError(f'Commit of write streams failed: {response.stream_errors[0].error_message}')
+        result.commit_time = response.commit_time
+
+    return result
@@ -0,0 +1,121 @@
+import os
+import json
+import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+
+def crc32c_hash(file_path: str, chunk_size: int = 8 * 1024 ** 2) -> str:
+    """
+    This function returns the base64 encoded CRC32C checksum of a file, the
+    same representation Cloud Storage uses for ``Blob.crc32c``.
+    """
+
+    import google_crc32c
+
+    checksum = google_crc32c.Checksum()
+    with open(file_path, 'rb') as file:
+        while chunk := file.read(chunk_size):
+            checksum.update(chunk)
+    return base64.b64encode(checksum.digest()).decode('ascii')
+
+
+class HashCache:
+    """
+    A JSON file which caches the CRC32C checksums of local files by their
+    size and modification time, so unchanged files are not hashed again.
+
+    Parameters
+    ----------
+    path: str
+        Path of the cache file. If None, checksums are only cached in memory.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+
+        if path and os.path.exists(path):
+            with open(path, 'r') as file:
+                self._entries = json.load(file)
+
+    def crc32c(self, file_path: str) -> str:
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+
+        with self._lock:
+            entry = self._entries.get(file_path)
+        if entry is not None and entry[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return entry[2]
+
+        checksum = crc32c_hash(file_path)
+        with self._lock:
+            self._entries[file_path] = [stat.st_size, stat.st_mtime_ns, checksum]
+        return checksum
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            with open(self.path, 'w') as file:
+                json.dump(self._entries, file)
+
+
+def plan_sync(storage_client,
+              bucket_name: str,
+              prefix: str,
+              files: Dict[str, str],
+              hash_cache: HashCache,
+              max_workers: int = 32) -> Tuple[Dict[str, str], List[str]]:
+    """
+    This function compares local files with the blobs below a prefix.
+
+    The blobs are listed once. A local file is uploaded if its blob does not
+    exist, has a different size or a different CRC32C checksum. Checksums of
+    local files are only computed if the sizes match; this is done in parallel.
+
+    Parameters
+    ----------
+    storage_client: google.cloud.storage.Client
+        The storage client
+    bucket_name: str
+        The name of your Google Bucket
+    prefix: str
+        The prefix of the blobs which are compared
+    files: Dict[str, str]
+        Local file paths by blob name
+    hash_cache: HashCache
+        The cache of local checksums
+    max_workers: int
+        Number of files which are hashed at the same time
+    Returns
+    -------
+    Tuple[Dict[str, str], List[str]]
+        Local file paths which should be uploaded by blob name and the names
+        of blobs which have no local file
+    """
+
+    remote = {blob.name: blob for blob in storage_client.list_blobs(bucket_name, prefix=prefix)}
+
+    changed = {}
+    candidates = {}
+    for blob_name, file_path in files.items():
+        blob = remote.get(blob_name)
+        if blob is None or blob.size != os.path.getsize(file_path):
+            changed[blob_name] = file_path
+        else:
+            candidates[blob_name] = file_path
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        checksums = executor.map(hash_cache.crc32c, candidates.values())
+        for (blob_name, file_path), checksum in zip(candidates.items(), checksums):
+            if checksum != remote[blob_name].crc32c:
+                changed[blob_name] = file_path
+
+    hash_cache.save()
+
+    orphans = [blob_name for blob_name in remote if blob_name not in files]
+
+    return changed, orphans
@@ -1,4 +1,3 @@
-from google.cloud import bigquery
 import sys
 
 
@@ -10,6 +9,8 @@ def source_format_validator(source_format: str):
     ----------
     source_format: str
     """
+    from google.cloud import bigquery
+
     if source_format == 'jsonl':
         source_format = bigquery.SourceFormat.NEWLINE_DELIMITED_JSON
 
@@ -42,6 +43,8 @@ def write_disposition_validator(write_disposition: str):
     ----------
     write_disposition: str
     """
+    from google.cloud import bigquery
+
     if write_disposition == 'WRITE_EMPTY':
         write_disposition = bigquery.WriteDisposition.WRITE_EMPTY
 
@@ -57,6 +60,98 @@ def write_disposition_validator(write_disposition: str):
     return write_disposition
 
 
+def compression_validator(compression: str):
+    """
+
+
+    Parameters
+    ----------
+    compression: str
+    """
+    if compression in (None, '', 'none'):
+        compression = None
+
+    elif compression == 'gzip':
+        compression = 'gzip'
+
+    else:
+        raise ValueError('Compression {0} is not implemented.'.format(compression))
+
+    return compression
+
+
+def destination_format_validator(destination_format: str):
+    """
+
+
+    Parameters
+    ----------
+    destination_format: str
+    """
+    from google.cloud import bigquery
+
+    if destination_format == 'jsonl':
+        destination_format = bigquery.DestinationFormat.NEWLINE_DELIMITED_JSON
+
+    elif destination_format == 'csv':
+        destination_format = bigquery.DestinationFormat.CSV
+
+    elif destination_format == 'avro':
+        destination_format = bigquery.DestinationFormat.AVRO
+
+    elif destination_format == 'parquet':
+        destination_format = bigquery.DestinationFormat.PARQUET
+
+    else:
+        raise ValueError('Destination format {0} is not implemented.'.format(destination_format))
+
+    return destination_format
+
+
+def export_compression_validator(compression: str):
+    """
+
+
+    Parameters
+    ----------
+    compression: str
+    """
+    from google.cloud import bigquery
+
+    if compression in (None, '', 'none'):
+        compression = None
+
+    elif compression.upper() in ('GZIP', 'DEFLATE', 'SNAPPY', 'ZSTD'):
+        compression = getattr(bigquery.Compression, compression.upper())
+
+    else:
+        raise ValueError('Compression {0} is not implemented.'.format(compression))
+
+    return compression
+
+
+def partition_type_validator(partition_type: str):
+    """
+
+
+    Parameters
+    ----------
+    partition_type: str
+    """
+    from google.cloud import bigquery
+
+    if partition_type in (None, ''):
+        partition_type = None
+
+    elif partition_type.upper() in ('HOUR', 'DAY', 'MONTH', 'YEAR'):
+        partition_type = getattr(bigquery.TimePartitioningType, partition_type.upper())
+
+    else:
+        raise ValueError('Partition type {0} is not implemented.'.format(partition_type))
+
+    return partition_type
+
+
 def print_progress(progress: float) -> None:
     """
     This method prints out the current progress status.
@@ -0,0 +1,441 @@
+import os
+import re
+import csv
+import json
+import base64
+import itertools
+import binascii
+from datetime import date
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+INTEGER = re.compile(r'^[+-]?\d+$')
+FLOAT = re.compile(r'^[+-]?((\d+\.?\d*|\.\d+)([eE][+-]?\d+)?|inf|infinity|nan)$', re.IGNORECASE)
+DATE = re.compile(r'^(\d{4})-(\d{1,2})-(\d{1,2})$')
+TIME = re.compile(r'^([01]?\d|2[0-3]):[0-5]?\d(:[0-5]?\d(\.\d{1,6})?)?$')
+TIMEZONE = re.compile(r'(\s*(Z|UTC|[+-]\d{1,2}(:?\d{2})?))$', re.IGNORECASE)
+BOOLEANS = ('true', 'false', '1', '0')
+
+
+@dataclass
+class ValidationError:
+    file: str
+    line: int
+    field: str
+    message: str
+
+    def __str__(self) -> str:
+        return f'{self.file}:{self.line}: {self.field}: {self.message}'
+
+
+@dataclass
+class ValidationReport:
+    files: List[str] = field(default_factory=list)
+    errors: List[ValidationError] = field(default_factory=list)
+    rows: int = 0
+    bad_rows: int = 0
+
+    @property
+    def valid(self) -> bool:
+        return self.bad_rows == 0
+
+    def __str__(self) -> str:
+        lines = [f'{self.bad_rows} of {self.rows} rows are invalid.']
+        lines.extend(str(error) for error in self.errors)
+        return '\n'.join(lines)
+
+
+def _is_date(value: str) -> bool:
+    match = DATE.match(value)
+    if not match:
+        return False
+    try:
+        date(*(int(group) for group in match.groups()))
+    except ValueError:
+        return False
+    return True
+
+
+def _is_datetime(value: str) -> bool:
+    parts = re.split(r'[ T]', value.strip(), maxsplit=1)
+    if not _is_date(parts[0]):
+        return False
+    return len(parts) == 1 or bool(TIME.match(parts[1]))
+
+
+def _check_scalar(field_type: str, value, from_csv: bool) -> Optional[str]:
+    """
+    Returns an error message if ``value`` cannot be loaded into a column of
+    ``field_type``. Values of CSV files are always strings.
+    """
+
+    if field_type in ('INTEGER', 'INT64'):
+        if isinstance(value, bool):
+            return 'expected an integer'
+        if isinstance(value, int) or (isinstance(value, float) and value.is_integer()):
+            return None
+        if isinstance(value, str) and INTEGER.match(value.strip()):
+            return None
+        return 'expected an integer'
+
+    if field_type in ('FLOAT', 'FLOAT64', 'NUMERIC', 'BIGNUMERIC'):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return None
+        if isinstance(value, str) and FLOAT.match(value.strip()):
+            return None
+        return 'expected a number'
+
+    if field_type in ('BOOLEAN', 'BOOL'):
+        if isinstance(value, bool) or value in (0, 1):
+            return None
+        if isinstance(value, str) and value.strip().lower() in BOOLEANS:
+            return None
+        return 'expected a boolean'
+
+    if field_type == 'STRING':
+        if isinstance(value, (str, int, float, bool)):
+            return None
+        return 'expected a string'
+
+    if field_type == 'BYTES':
+        if not isinstance(value, str):
+            return 'expected base64 encoded bytes'
+        if from_csv:
+            return None
+        try:
+            base64.b64decode(value, validate=True)
+        except (binascii.Error, ValueError):
+            return 'expected base64 encoded bytes'
+        return None
+
+    if field_type == 'DATE':
+        return None if isinstance(value, str) and _is_date(value.strip()) else 'expected a date (YYYY-MM-DD)'
+
+    if field_type == 'TIME':
+        return None if isinstance(value, str) and TIME.match(value.strip()) else 'expected a time (HH:MM:SS)'
+
+    if field_type == 'DATETIME':
+        return None if isinstance(value, str) and _is_datetime(value) else 'expected a datetime'
+
+    if field_type == 'TIMESTAMP':
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return None
+        if isinstance(value, str):
+            stripped = value.strip()
+            if _is_datetime(stripped) or _is_datetime(TIMEZONE.sub('', stripped)) or FLOAT.match(stripped):
+                return None
+        return 'expected a timestamp'
+
+    if field_type == 'JSON' and from_csv:
+        try:
+            json.loads(value)
+        except ValueError:
+            return 'expected a JSON value'
+        return None
+
+    return None
+
+
+def _check_fields(schema: List[dict],
+                  row: dict,
+                  ignore_unknown_values: bool,
+                  path: str = '') -> Optional[tuple]:
+    """
+    Returns the path of the first invalid field of a JSON row and the error message.
+    """
+
+    known = set()
+    for schema_field in schema:
+        name = schema_field['name']
+        known.add(name)
+        field_path = f'{path}{name}'
+        field_type = schema_field.get('type', 'STRING').upper()
+        mode = schema_field.get('mode', 'NULLABLE').upper()
+        value = row.get(name)
+
+        if value is None:
+            if mode == 'REQUIRED':
+                return field_path, 'missing required field'
+            continue
+
+        values = [value]
+        if mode == 'REPEATED':
+            if not isinstance(value, list):
+                return field_path, 'expected an array'
+            values = value
+
+        for n, item in enumerate(values):
+            item_path = f'{field_path}[{n}]' if mode == 'REPEATED' else field_path
+            if item is None:
+                if mode == 'REPEATED':
+                    return item_path, 'arrays cannot contain null'
+                continue
+            if field_type in ('RECORD', 'STRUCT'):
+                if not isinstance(item, dict):
+                    return item_path, 'expected a record'
+                error = _check_fields(schema_field.get('fields', []), item, ignore_unknown_values, f'{item_path}.')
+                if error:
+                    return error
+            else:
+                message = _check_scalar(field_type, item, from_csv=False)
+                if message:
+                    return item_path, message
+
+    if not ignore_unknown_values:
+        for name in row:
+            if name not in known:
+                return f'{path}{name}', 'no such field in schema'
+
+    return None
+
+
+def _check_csv_row(schema: List[dict], row: List[str], ignore_unknown_values: bool) -> Optional[tuple]:
+    if len(row) > len(schema) and not ignore_unknown_values:
+        return f'column {len(schema) + 1}', f'expected {len(schema)} columns, got {len(row)}'
+    if len(row) < len(schema):
+        return schema[len(row)]['name'], f'expected {len(schema)} columns, got {len(row)}'
+
+    for schema_field, value in zip(schema, row):
+        field_type = schema_field.get('type', 'STRING').upper()
+        if value == '' and field_type not in ('STRING', 'BYTES'):
+            value = None
+        if value is None:
+            if schema_field.get('mode', 'NULLABLE').upper() == 'REQUIRED':
+                return schema_field['name'], 'missing required field'
+            continue
+        message = _check_scalar(field_type, value, from_csv=True)
+        if message:
+            return schema_field['name'], message
+    return None
+
+
+def _quarantine_root(files: List[str]) -> str:
+    """
+    Returns the deepest directory which contains all files, so files of the
+    same name in different directories keep apart in the quarantine.
+    """
+
+    if not files:
+        return ''
+    return os.path.commonpath([os.path.dirname(os.path.abspath(file)) for file in files])
+
+
+def _quarantine_paths(file_path: str, quarantine_dir: str, root: str) -> tuple:
+    path = os.path.join(quarantine_dir, os.path.relpath(os.path.abspath(file_path), root))
+    return path, f'{path}.rejected'
+
+
+def _open_quarantine(file_path: str, quarantine_dir: str, root: str, **kwargs) -> tuple:
+    clean_path, rejected_path = _quarantine_paths(file_path, quarantine_dir, root)
+    os.makedirs(os.path.dirname(clean_path), exist_ok=True)
+    return open(clean_path, **kwargs), open(rejected_path, **kwargs)
+
+
+def _validate_jsonl(file_path, schema, options, quarantine_dir, max_errors):
+    errors = []
+    rows = bad_rows = 0
+    clean = rejected = None
+
+    if quarantine_dir:
+        clean, rejected = _open_quarantine(file_path, quarantine_dir, options['quarantine_root'], mode='wb')
+
+    try:
+        with open(file_path, 'rb') as file:
+            for line_number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                rows += 1
+                try:
+                    row = json.loads(line)
+                    error = None if isinstance(row, dict) else ('', 'expected a JSON object')
+                    if error is None:
+                        error = _check_fields(schema, row, options['ignore_unknown_values'])
+                except ValueError as e:
+                    error = ('', f'invalid JSON: {e}')
+
+                if error:
+                    bad_rows += 1
+                    if len(errors) < max_errors:
+                        errors.append(ValidationError(file_path, line_number, *error))
+                    if rejected:
+                        rejected.write(line if line.endswith(b'\n') else line + b'\n')
+                elif clean:
+                    clean.write(line if line.endswith(b'\n') else line + b'\n')
+    finally:
+        if quarantine_dir:
+            clean.close()
+            rejected.close()
+
+    return errors, rows, bad_rows
+
+
+def _validate_csv(file_path, schema, options, quarantine_dir, max_errors):
+    errors = []
+    rows = bad_rows = 0
+    dialect = {'delimiter': options['csv_field_delimiter'],
+               'quotechar': options['csv_quote_character'] or None,
+               'quoting': csv.QUOTE_MINIMAL if options['csv_quote_character'] else csv.QUOTE_NONE}
+    clean = rejected = None
+
+    if quarantine_dir:
+        clean_file, rejected_file = _open_quarantine(file_path, quarantine_dir, options['quarantine_root'],
+                                                     mode='w', newline='', encoding='utf-8')
+        clean = csv.writer(clean_file, **dialect)
+        rejected = csv.writer(rejected_file, **dialect)
+
+    try:
+        with open(file_path, 'r', newline='', encoding='utf-8') as file:
+            reader = csv.reader(file, strict=True, **dialect)
+            line_number = 1
+            try:
+                for n, row in enumerate(reader):
+                    start_line, line_number = line_number, reader.line_num + 1
+                    if n < options['csv_skip_leading_rows']:
+                        if clean:
+                            clean.writerow(row)
+                        continue
+                    if not row:
+                        continue
+                    rows += 1
+
+                    error = None
+                    if not options['csv_allow_quoted_newlines'] and reader.line_num > start_line:
+                        error = ('', 'quoted newline, but csv_allow_quoted_newlines is False')
+                    if error is None:
+                        error = _check_csv_row(schema, row, options['ignore_unknown_values'])
+
+                    if error:
+                        bad_rows += 1
+                        if len(errors) < max_errors:
+                            errors.append(ValidationError(file_path, start_line, *error))
+                        if rejected:
+                            rejected.writerow(row)
+                    elif clean:
+                        clean.writerow(row)
+            except csv.Error as e:
+                remaining = _quarantine_rest(file_path, line_number, rejected_file if rejected else None)
+                rows += remaining
+                bad_rows += remaining
+                errors.append(ValidationError(file_path, line_number, '',
+                                              f'invalid CSV: {e}, {remaining} lines from here on are rejected'))
+    finally:
+        if quarantine_dir:
+            clean_file.close()
+            rejected_file.close()
+
+    return errors, rows, bad_rows
+
+
+def _quarantine_rest(file_path: str, line_number: int, rejected_file) -> int:
+    """
+    Counts the non-empty lines of a file from line_number on and copies them
+    to the rejected file, since the csv reader cannot continue after an error.
+    """
+
+    remaining = 0
+    with open(file_path, 'r', newline='', encoding='utf-8') as file:
+        for line in itertools.islice(file, line_number - 1, None):
+            if line.strip():
+                remaining += 1
+            if rejected_file is not None:
+                rejected_file.write(line)
+    return max(remaining, 1)
+
+
+def _validate_file(file_path, schema, source_format, options, quarantine_dir, max_errors):
+    if source_format == 'csv':
+        return _validate_csv(file_path, schema, options, quarantine_dir, max_errors)
+    return _validate_jsonl(file_path, schema, options, quarantine_dir, max_errors)
+
+
+def validate_files(files: List[str],
+                   schema_file_path: str,
+                   source_format: str,
+                   csv_field_delimiter: str = ',',
+                   csv_quote_character: str = '"',
+                   csv_allow_quoted_newlines: bool = False,
+                   csv_skip_leading_rows: int = 0,
+                   ignore_unknown_values: bool = False,
+                   quarantine_dir: str = None,
+                   max_errors: int = 100,
+                   max_processes: int = os.cpu_count()) -> ValidationReport:
+    """
+    This function checks local jsonl or csv files against a BigQuery schema
+    before they are loaded.
+
+    Every row is checked for its types, required fields, REPEATED and RECORD
+    nesting and, for csv files, the number of columns and the delimiter and
+    quote settings. The files are read as streams, one file per process.
+
+    Parameters
+    ----------
+    files: List[str]
+        The files which should be checked
+    schema_file_path: str
+        Path to the table schema
+    source_format: str
+        The file format, 'jsonl' or 'csv'
+    quarantine_dir: str
+        If given, the valid rows of each file are written to a file of the same
+        path relative to the common directory of the files in this directory
+        and the invalid rows to a '.rejected' file next to it. After a csv
+        syntax error, all following lines of the file are rejected.
+    max_errors: int
+        Maximum number of errors which are reported per file
+    max_processes: int
+        Number of files which are checked at the same time
+    Returns
+    -------
+    ValidationReport
+        The number of rows and invalid rows and the errors with file, line and field
+    Raises
+    ------
+    ValueError
+        If the source format cannot be validated or the csv settings are invalid
+    """
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    if source_format not in ('jsonl', 'csv'):
+        raise ValueError('Files in source format {0} cannot be validated.'.format(source_format))
+
+    with open(schema_file_path, 'r') as schema_file:
+        schema = json.load(schema_file)
+
+    if source_format == 'csv':
+        if len(csv_field_delimiter) != 1:
+            raise ValueError('CSV field delimiter must be a single character: {0!r}'.format(csv_field_delimiter))
+        if len(csv_quote_character) > 1:
+            raise ValueError('CSV quote character must be a single character: {0!r}'.format(csv_quote_character))
+        nested = [schema_field['name'] for schema_field in schema
+                  if schema_field.get('type', '').upper() in ('RECORD', 'STRUCT')
+                  or schema_field.get('mode', '').upper() == 'REPEATED']
+        if nested:
+            raise ValueError('CSV files cannot be loaded into nested or repeated fields: {0}'.format(', '.join(nested)))
+
+    if quarantine_dir:
+        os.makedirs(quarantine_dir, exist_ok=True)
+
+    options = {'csv_field_delimiter': csv_field_delimiter,
+               'csv_quote_character': csv_quote_character,
+               'csv_allow_quoted_newlines': csv_allow_quoted_newlines,
+               'csv_skip_leading_rows': int(csv_skip_leading_rows),
+               'ignore_unknown_values': ignore_unknown_values,
+               'quarantine_root': _quarantine_root(files)}
+
+    report = ValidationReport()
+
+    with ProcessPoolExecutor(max_workers=max_processes) as executor:
+        futures = [executor.submit(_validate_file, file, schema, source_format, options, quarantine_dir, max_errors)
+                   for file in files]
+        for file, future in zip(files, futures):
+            errors, rows, bad_rows = future.result()
+            report.errors.extend(errors)
+            report.rows += rows
+            report.bad_rows += bad_rows
+            if quarantine_dir:
+                report.files.append(_quarantine_paths(file, quarantine_dir, options['quarantine_root'])[0])
+            else:
+                report.files.append(file)
+
+    return report
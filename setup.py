@@ -25,9 +25,32 @@ setup(name='bq_loader',
         'google-cloud-bigquery',
         'google-cloud-storage',
         'google-api-core',
+        'google-crc32c',
         'inquirer==2.8.0'
       ],
       extras_require={
+       'parquet': [
+           'pyarrow'
+       ],
+       'avro': [
+           'fastavro'
+       ],
+       'storage': [
+           'google-cloud-bigquery-storage',
+           'pyarrow'
+       ],
+       'prometheus': [
+           'prometheus-client'
+       ],
+       'opentelemetry': [
+           'opentelemetry-api'
+       ],
+       'yaml': [
+           'PyYAML'
+       ],
+       'pandas': [
+           'pandas'
+       ],
        'dev': [
            'pytest',
            'coverage',
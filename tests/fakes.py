@@ -0,0 +1,183 @@
+import base64
+import itertools
+import threading
+from datetime import datetime, timedelta, timezone
+import google_crc32c
+from google.api_core.exceptions import BadRequest, Conflict, NotFound
+
+
+class FakeLoadJob:
+
+    _ids = itertools.count()
+
+    def __init__(self, error=None, polls=0, job_id=None):
+        self.job_id = job_id or f'fake_job_{next(self._ids)}'
+        self.state = 'RUNNING'
+        self.error = error
+        self.errors = None
+        self.error_result = None
+        self.polls = polls
+
+    def done(self):
+        if self.polls > 0:
+            self.polls -= 1
+            return False
+        self.state = 'DONE'
+        return True
+
+    def result(self):
+        self.state = 'DONE'
+        self.created = datetime(2021, 1, 1, tzinfo=timezone.utc)
+        self.started = self.created + timedelta(seconds=1)
+        self.ended = self.started + timedelta(seconds=2)
+        self._properties = {'statistics': {'totalSlotMs': '1500', 'load': {'inputFileBytes': '100',
+                                                                          'outputRows': '10'}}}
+        if self.error is not None:
+            self.errors = [{'message': str(self.error)}]
+            self.error_result = self.errors[0]
+            raise self.error
+        return self
+
+
+class FakeBigQueryClient:
+
+    def __init__(self, fail_on=(), polls=0):
+        self.fail_on = fail_on
+        self.polls = polls
+        self.loaded = []
+        self.uris = []
+        self.jobs = {}
+        self.tables = {}
+        self.deleted = []
+        self.copies = []
+        self.queries = []
+        self.extracts = []
+        self._lock = threading.Lock()
+
+    def load_table_from_file(self, file_obj, destination, job_id=None, job_config=None):
+        if job_id in self.jobs:
+            raise Conflict(f'Already Exists: Job {job_id}')
+        data = file_obj.read()
+        with self._lock:
+            self.loaded.append((getattr(file_obj, 'name', None), data, destination, job_config))
+        error = None
+        if any(name in str(getattr(file_obj, 'name', '')) for name in self.fail_on):
+            error = RuntimeError('load failed')
+        job = FakeLoadJob(error=error, job_id=job_id)
+        self.jobs[job.job_id] = job
+        return job
+
+    def load_table_from_uri(self, source_uris, destination, job_config=None):
+        with self._lock:
+            self.uris.append((source_uris, destination, job_config))
+        error = None
+        if any(name in source_uris for name in self.fail_on):
+            error = BadRequest('load failed')
+        job = FakeLoadJob(error=error, polls=self.polls)
+        self.jobs[job.job_id] = job
+        return job
+
+    def create_table(self, table, exists_ok=False):
+        with self._lock:
+            self.tables[str(table.reference)] = table
+        return table
+
+    def get_table(self, table):
+        if str(table) not in self.tables:
+            raise NotFound(f'Table {table} not found')
+        return self.tables[str(table)]
+
+    def delete_table(self, table, not_found_ok=False):
+        with self._lock:
+            self.tables.pop(str(table), None)
+            self.deleted.append(str(table))
+
+    def copy_table(self, sources, destination, job_config=None):
+        self.copies.append(([str(source) for source in sources], str(destination), job_config))
+        job = FakeLoadJob()
+        self.jobs[job.job_id] = job
+        return job
+
+    def query(self, query, job_config=None):
+        self.queries.append(query)
+        job = FakeLoadJob()
+        self.jobs[job.job_id] = job
+        return job
+
+    def extract_table(self, source, destination_uris, job_config=None):
+        self.extracts.append((str(source), destination_uris, job_config))
+        job = FakeLoadJob()
+        self.jobs[job.job_id] = job
+        return job
+
+    def get_job(self, job_id):
+        return self.jobs[job_id]
+
+
+class FakeBlob:
+
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.content_type = None
+
+    @property
+    def size(self):
+        return len(self.bucket.objects[self.name])
+
+    @property
+    def crc32c(self):
+        return base64.b64encode(google_crc32c.Checksum(self.bucket.objects[self.name]).digest()).decode('ascii')
+
+    def upload_from_filename(self, filename, **kwargs):
+        with open(filename, 'rb') as file_obj:
+            self.upload_from_file(file_obj, **kwargs)
+
+    def upload_from_file(self, file_obj, content_type=None, **kwargs):
+        self.content_type = content_type
+        data = b''
+        while chunk := file_obj.read(1024 ** 2):
+            data += chunk
+        self.bucket.objects[self.name] = data
+
+    def upload_from_string(self, data, content_type=None, **kwargs):
+        self.content_type = content_type
+        self.bucket.objects[self.name] = data.encode('utf-8') if isinstance(data, str) else data
+
+    def download_as_bytes(self, start=None, end=None, **kwargs):
+        data = self.bucket.objects[self.name]
+        self.bucket.ranges.append((self.name, start, end))
+        return data[start or 0:None if end is None else end + 1]
+
+    def compose(self, sources):
+        self.bucket.objects[self.name] = b''.join(self.bucket.objects[source.name] for source in sources)
+        self.bucket.compose_calls += 1
+
+
+class FakeBucket:
+
+    def __init__(self, name):
+        self.name = name
+        self.objects = {}
+        self.compose_calls = 0
+        self.ranges = []
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+    def delete_blobs(self, blobs, on_error=None):
+        for blob in blobs:
+            self.objects.pop(blob.name, None)
+
+
+class FakeStorageClient:
+
+    def __init__(self):
+        self.buckets = {}
+
+    def bucket(self, name):
+        return self.buckets.setdefault(name, FakeBucket(name))
+
+    def list_blobs(self, bucket_name, prefix=''):
+        bucket = self.bucket(bucket_name)
+        return [bucket.blob(name) for name in sorted(bucket.objects) if name.startswith(prefix)]
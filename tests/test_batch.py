@@ -0,0 +1,68 @@
+import json
+import pytest
+from bq_loader import create_tables_from_bucket
+from bq_loader.batch import JobPoller, BucketLoadResult
+from bq_loader.progress import Progress
+from google.api_core.exceptions import BadRequest
+from tests.fakes import FakeBigQueryClient, FakeLoadJob
+
+
+@pytest.fixture
+def schema(tmp_path):
+    path = tmp_path / 'schema.json'
+    path.write_text(json.dumps([{'name': 'id', 'type': 'INTEGER', 'mode': 'NULLABLE'}]))
+    return str(path)
+
+
+class Test_batch:
+
+    def test_failed_job_does_not_stop_the_batch(self, schema, monkeypatch):
+        client = FakeBigQueryClient(fail_on=('broken',), polls=2)
+        monkeypatch.setattr('bq_loader.get_bigquery_client', lambda: client)
+        loads = [(f'gs://bucket/{name}/*', name) for name in ('a', 'broken', 'c')]
+
+        results = create_tables_from_bucket(loads, 'project', 'dataset', schema, 'jsonl',
+                                            max_jobs=2, min_poll_interval=0.001)
+
+        assert [result.table_id for result in results] == ['a', 'broken', 'c']
+        assert [result.state for result in results] == ['DONE', 'FAILED', 'DONE']
+        assert isinstance(results[1].error, BadRequest)
+        assert results[1].errors == [{'message': '400 load failed'}]
+        assert len(client.uris) == 3
+
+    def test_overrides_per_table(self, tmp_path, schema, monkeypatch):
+        client = FakeBigQueryClient()
+        monkeypatch.setattr('bq_loader.get_bigquery_client', lambda: client)
+
+        create_tables_from_bucket([{'uri': 'gs://bucket/a.csv', 'table_id': 'a', 'source_format': 'csv'},
+                                   ('gs://bucket/b/*', 'b')],
+                                  'project', 'dataset', schema, 'jsonl', min_poll_interval=0.001)
+
+        assert [config.source_format for _, _, config in client.uris] == ['CSV', 'NEWLINE_DELIMITED_JSON']
+        assert str(client.uris[0][1]) == 'project.dataset.a'
+
+    def test_invalid_uri(self, schema):
+        with pytest.raises(ValueError):
+            create_tables_from_bucket([('bucket/a', 'a')], 'project', 'dataset', schema, 'jsonl')
+
+    def test_poller_caps_running_jobs_and_backs_off(self, monkeypatch):
+        sleeps = []
+        monkeypatch.setattr('bq_loader.batch.time.sleep', sleeps.append)
+        running = []
+
+        def submit():
+            running.append(sum(job.polls > 0 for job in jobs))
+            job = FakeLoadJob(polls=3)
+            jobs.append(job)
+            return job
+
+        jobs = []
+        progress = Progress()
+        poller = JobPoller(max_jobs=2, min_poll_interval=1, max_poll_interval=2, progress=progress)
+        results = poller.run([(BucketLoadResult(uri=str(n), table_id=str(n)), submit) for n in range(4)])
+
+        assert all(result.state == 'DONE' for result in results)
+        snapshot = progress.close()
+        assert (snapshot.jobs_done, snapshot.jobs_total) == (4, 4)
+        assert max(running) <= 1
+        assert sleeps == [1, 1.5, 2, 1, 1.5, 2]
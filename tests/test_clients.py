@@ -0,0 +1,60 @@
+import os
+import json
+from bq_loader import JobConfig
+from bq_loader.clients import load_schema
+
+
+def write_schema(path, names):
+    path.write_text(json.dumps([{'name': name, 'type': 'STRING', 'mode': 'NULLABLE'} for name in names]))
+
+
+class Test_clients:
+
+    def test_load_schema_is_reloaded_after_modification(self, tmp_path):
+        schema_file = tmp_path / 'schema.json'
+        write_schema(schema_file, ['a'])
+        assert [field.name for field in load_schema(str(schema_file))] == ['a']
+
+        write_schema(schema_file, ['a', 'b'])
+        os.utime(schema_file, ns=(0, os.stat(schema_file).st_mtime_ns + 10 ** 9))
+        assert [field.name for field in load_schema(str(schema_file))] == ['a', 'b']
+
+    def test_job_config_is_memoized(self, tmp_path):
+        schema_file = tmp_path / 'schema.json'
+        write_schema(schema_file, ['a'])
+
+        job_config = JobConfig(project_id='project',
+                               dataset_id='dataset',
+                               schema_file_path=str(schema_file),
+                               source_format='jsonl')
+
+        assert job_config.config is job_config.config
+        assert job_config.config.schema[0].name == 'a'
+
+    def test_connection_pool_is_resized_in_place(self):
+        import ssl
+        from types import SimpleNamespace
+        from requests import Session
+        from requests.adapters import HTTPAdapter
+        from bq_loader import configure_connection_pool
+
+        class TlsAdapter(HTTPAdapter):
+
+            def init_poolmanager(self, *args, **kwargs):
+                kwargs['ssl_context'] = context
+                super().init_poolmanager(*args, **kwargs)
+
+        context = ssl.create_default_context()
+        session = Session()
+        adapter = TlsAdapter()
+        session.mount('https://', adapter)
+
+        configure_connection_pool(SimpleNamespace(_http=session), 32)
+
+        assert session.get_adapter('https://') is adapter
+        assert adapter.poolmanager.connection_pool_kw['maxsize'] == 32
+        assert adapter.poolmanager.connection_pool_kw['ssl_context'] is context
+        assert session.get_adapter('http://')._pool_maxsize == 32
+
+        configure_connection_pool(SimpleNamespace(_http=session), 8)
+        assert adapter._pool_maxsize == 32
@@ -0,0 +1,51 @@
+import pytest
+from bq_loader.coalesce import coalesce_files, ConcatenatedFile
+from bq_loader.pipeline import LoadPipeline
+from tests.fakes import FakeBigQueryClient
+
+
+class Test_coalesce:
+
+    def test_batches_respect_target_size(self, tmp_path):
+        files = []
+        for i in range(5):
+            file = tmp_path / f'{i}.jsonl'
+            file.write_bytes(b'{"a": 1}\n' * 10)
+            files.append(str(file))
+
+        batches = list(coalesce_files(files, target_size=200, source_format='jsonl'))
+
+        assert [len(batch.files) for batch in batches] == [2, 2, 1]
+        assert sum(batch.size for batch in batches) == 450
+
+    def test_binary_formats_are_rejected(self):
+        with pytest.raises(ValueError):
+            list(coalesce_files(['a.parquet'], target_size=1, source_format='parquet'))
+
+    def test_concatenation_skips_headers_and_terminates_lines(self, tmp_path):
+        first = tmp_path / 'first.csv'
+        first.write_bytes(b'a,b\n1,2')
+        second = tmp_path / 'second.csv'
+        second.write_bytes(b'a,b\n3,4\n')
+
+        with ConcatenatedFile([str(first), str(second)], skip_leading_rows=1) as stream:
+            data = b''
+            while chunk := stream.read(3):
+                data += chunk
+            assert stream.tell() == len(data)
+
+        assert data == b'a,b\n1,2\n3,4\n'
+
+    def test_pipeline_submits_one_job_per_batch(self, tmp_path):
+        files = []
+        for i in range(4):
+            file = tmp_path / f'{i}.jsonl'
+            file.write_bytes(b'{"a": %d}' % i)
+            files.append(str(file))
+        client = FakeBigQueryClient()
+
+        pipeline = LoadPipeline(client, 'dataset.table', None, poll_interval=0.01, progress=False)
+        pipeline.run(coalesce_files(files, target_size=10 ** 6, source_format='jsonl'))
+
+        assert len(client.loaded) == 1
+        assert client.loaded[0][1] == b'{"a": 0}\n{"a": 1}\n{"a": 2}\n{"a": 3}'
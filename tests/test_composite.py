@@ -0,0 +1,34 @@
+import os
+import mmap
+from bq_loader import upload_file_to_bucket
+from tests.fakes import FakeStorageClient
+
+
+class Test_composite:
+
+    def test_large_file_is_composed_from_parts(self, tmp_path, monkeypatch):
+        file = tmp_path / 'large.jsonl'
+        file.write_bytes(os.urandom(40 * mmap.ALLOCATIONGRANULARITY + 123))
+        storage_client = FakeStorageClient()
+        monkeypatch.setattr('bq_loader.get_storage_client', lambda: storage_client)
+
+        upload_file_to_bucket('bucket', 'tests/large.jsonl', str(file),
+                              composite_threshold=1024,
+                              composite_chunk_size=mmap.ALLOCATIONGRANULARITY)
+
+        bucket = storage_client.bucket('bucket')
+        assert list(bucket.objects) == ['tests/large.jsonl']
+        assert bucket.objects['tests/large.jsonl'] == file.read_bytes()
+        assert bucket.compose_calls == 3
+
+    def test_small_file_is_uploaded_directly(self, tmp_path, monkeypatch):
+        file = tmp_path / 'small.jsonl'
+        file.write_bytes(b'{"a": 1}\n')
+        storage_client = FakeStorageClient()
+        monkeypatch.setattr('bq_loader.get_storage_client', lambda: storage_client)
+
+        upload_file_to_bucket('bucket', 'tests/small.jsonl', str(file), composite_threshold=1024)
+
+        bucket = storage_client.bucket('bucket')
+        assert bucket.objects == {'tests/small.jsonl': b'{"a": 1}\n'}
+        assert bucket.compose_calls == 0
@@ -0,0 +1,36 @@
+import io
+import gzip
+import pytest
+from bq_loader import upload_file_to_bucket
+from bq_loader.compression import GzipStream
+from bq_loader.utils import compression_validator
+from tests.fakes import FakeStorageClient
+
+
+class Test_compression:
+
+    def test_gzip_stream_is_a_valid_multi_member_gzip(self):
+        data = b''.join(b'{"id": %d}\n' % i for i in range(10000))
+
+        with GzipStream(io.BytesIO(data), block_size=4096, workers=4) as stream:
+            compressed = stream.read()
+
+        assert len(compressed) < len(data)
+        assert gzip.decompress(compressed) == data
+
+    def test_compression_validator(self):
+        assert compression_validator(None) is None
+        assert compression_validator('gzip') == 'gzip'
+        with pytest.raises(ValueError):
+            compression_validator('zstd')
+
+    def test_upload_file_to_bucket_with_gzip(self, tmp_path, monkeypatch):
+        file = tmp_path / 'data.jsonl'
+        file.write_bytes(b'{"a": 1}\n' * 100)
+        storage_client = FakeStorageClient()
+        monkeypatch.setattr('bq_loader.get_storage_client', lambda: storage_client)
+
+        upload_file_to_bucket('bucket', 'tests/data.jsonl', str(file), compression='gzip')
+
+        objects = storage_client.bucket('bucket').objects
+        assert gzip.decompress(objects['tests/data.jsonl.gz']) == file.read_bytes()
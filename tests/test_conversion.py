@@ -0,0 +1,141 @@
+import json
+import pytest
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from bq_loader import upload_files_to_bucket
+from bq_loader.conversion import convert_files
+from tests.fakes import FakeStorageClient
+
+SCHEMA = [{'name': 'id', 'type': 'INTEGER', 'mode': 'REQUIRED'},
+          {'name': 'amount', 'type': 'NUMERIC', 'mode': 'NULLABLE'},
+          {'name': 'created', 'type': 'TIMESTAMP', 'mode': 'NULLABLE'},
+          {'name': 'day', 'type': 'DATE', 'mode': 'NULLABLE'},
+          {'name': 'tags', 'type': 'STRING', 'mode': 'REPEATED'},
+          {'name': 'author', 'type': 'RECORD', 'mode': 'NULLABLE',
+           'fields': [{'name': 'name', 'type': 'STRING', 'mode': 'NULLABLE'}]}]
+
+ROWS = [{'id': '1', 'amount': 1.25, 'created': '2021-01-01 10:00:00 UTC', 'day': '2021-01-01',
+         'tags': ['a', 'b'], 'author': {'name': 'x'}},
+        {'id': 2}]
+
+
+@pytest.fixture
+def data(tmp_path):
+    schema = tmp_path / 'schema.json'
+    schema.write_text(json.dumps(SCHEMA))
+    file = tmp_path / 'data.jsonl'
+    file.write_text('\n'.join(json.dumps(row) for row in ROWS) + '\n')
+    return str(file), str(schema)
+
+
+class Test_conversion:
+
+    def test_jsonl_to_parquet_uses_schema_types(self, tmp_path, data):
+        pq = pytest.importorskip('pyarrow.parquet')
+        file, schema = data
+
+        [(source, converted)] = convert_files([file], schema, 'jsonl', 'parquet', str(tmp_path / 'out'),
+                                              row_group_size=1, max_processes=1)
+
+        table = pq.read_table(converted)
+        assert source == file
+        assert pq.ParquetFile(converted).metadata.num_row_groups == 2
+        assert table.to_pylist() == [
+            {'id': 1, 'amount': Decimal('1.250000000'), 'created': datetime(2021, 1, 1, 10, tzinfo=timezone.utc),
+             'day': date(2021, 1, 1), 'tags': ['a', 'b'], 'author': {'name': 'x'}},
+            {'id': 2, 'amount': None, 'created': None, 'day': None, 'tags': [], 'author': None}]
+
+    def test_jsonl_to_avro(self, tmp_path, data):
+        fastavro = pytest.importorskip('fastavro')
+        file, schema = data
+
+        [(_, converted)] = convert_files([file], schema, 'jsonl', 'avro', str(tmp_path / 'out'), max_processes=1)
+
+        with open(converted, 'rb') as avro_file:
+            rows = list(fastavro.reader(avro_file))
+        assert [row['id'] for row in rows] == [1, 2]
+        assert rows[0]['day'] == date(2021, 1, 1)
+
+    def test_upload_files_to_bucket_converts_before_upload(self, tmp_path, data, monkeypatch):
+        pytest.importorskip('pyarrow')
+        file, schema = data
+        monkeypatch.chdir(tmp_path)
+        storage_client = FakeStorageClient()
+        monkeypatch.setattr('bq_loader.get_storage_client', lambda: storage_client)
+
+        upload_files_to_bucket('bucket', 'data.jsonl', 'tests', convert_to='parquet',
+                               schema_file_path=schema, source_format='jsonl')
+
+        objects = storage_client.bucket('bucket').objects
+        assert list(objects) == ['tests/data.parquet']
+        assert objects['tests/data.parquet'][:4] == b'PAR1'
+
+    def test_conversions_wait_for_the_consumer(self, tmp_path, data):
+        pytest.importorskip('pyarrow')
+        file, schema = data
+        pulled = []
+
+        def files():
+            for n in range(5):
+                pulled.append(n)
+                yield file
+
+        converted = convert_files(files(), schema, 'jsonl', 'parquet', str(tmp_path / 'out'), max_processes=1,
+                                  max_pending=2)
+
+        next(converted)
+        assert len(pulled) == 2
+        assert len(list(converted)) == 4
+
+    def test_converted_files_are_deleted_after_upload(self, tmp_path, data, monkeypatch):
+        pytest.importorskip('pyarrow')
+        file, schema = data
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr('bq_loader.get_storage_client', FakeStorageClient)
+        (tmp_path / 'broken.jsonl').write_text('{broken\n')
+        monkeypatch.setattr('tempfile.tempdir', str(tmp_path / 'tmp'))
+        (tmp_path / 'tmp').mkdir()
+
+        upload_files_to_bucket('bucket', 'data.jsonl', 'tests', convert_to='parquet', schema_file_path=schema,
+                               source_format='jsonl', conversion_dir=str(tmp_path / 'out'))
+        assert list((tmp_path / 'out').iterdir()) == []
+
+        with pytest.raises(ValueError):
+            upload_files_to_bucket('bucket', '*.jsonl', 'tests', convert_to='parquet', schema_file_path=schema,
+                                   source_format='jsonl')
+        assert list((tmp_path / 'tmp').iterdir()) == []
+
+    def test_upload_converts_csv_with_header(self, tmp_path, monkeypatch):
+        pq = pytest.importorskip('pyarrow.parquet')
+        schema = tmp_path / 'schema.json'
+        schema.write_text(json.dumps([{'name': 'id', 'type': 'INTEGER', 'mode': 'REQUIRED'},
+                                      {'name': 'name', 'type': 'STRING', 'mode': 'NULLABLE'}]))
+        (tmp_path / 'data.csv').write_text('id;name\n1;"a;b"\n2;c\n')
+        monkeypatch.chdir(tmp_path)
+        storage_client = FakeStorageClient()
+        monkeypatch.setattr('bq_loader.get_storage_client', lambda: storage_client)
+
+        upload_files_to_bucket('bucket', 'data.csv', 'tests', convert_to='parquet', schema_file_path=str(schema),
+                               source_format='csv', csv_field_delimiter=';', csv_skip_leading_rows=1)
+
+        uploaded = tmp_path / 'uploaded.parquet'
+        uploaded.write_bytes(storage_client.bucket('bucket').objects['tests/data.parquet'])
+        assert pq.read_table(str(uploaded)).to_pylist() == [{'id': 1, 'name': 'a;b'}, {'id': 2, 'name': 'c'}]
+
+    def test_nested_datetimes_to_avro(self, tmp_path):
+        fastavro = pytest.importorskip('fastavro')
+        schema = tmp_path / 'schema.json'
+        schema.write_text(json.dumps([
+            {'name': 'seen', 'type': 'DATETIME', 'mode': 'REPEATED'},
+            {'name': 'event', 'type': 'RECORD', 'mode': 'REPEATED',
+             'fields': [{'name': 'at', 'type': 'DATETIME', 'mode': 'NULLABLE'}]}]))
+        file = tmp_path / 'data.jsonl'
+        file.write_text(json.dumps({'seen': ['2021-01-01 10:00:00'], 'event': [{'at': '2021-01-02 11:00:00'}]}) + '\n')
+
+        [(_, converted)] = convert_files([str(file)], str(schema), 'jsonl', 'avro', str(tmp_path / 'out'),
+                                         max_processes=1)
+
+        with open(converted, 'rb') as avro_file:
+            [row] = list(fastavro.reader(avro_file))
+        assert row['seen'] == ['2021-01-01 10:00:00']
+        assert row['event'] == [{'at': '2021-01-02 11:00:00'}]
@@ -0,0 +1,93 @@
+import os
+import pytest
+from bq_loader import upload_files_to_bucket
+from bq_loader.discovery import discover_files, iter_files, match_path, prefetch, split_pattern
+from tests.fakes import FakeStorageClient
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for name in ('a.jsonl', 'b.csv', '.hidden.jsonl', '2021/01/c.jsonl', '2021/02/d.jsonl',
+                 '2021/02/e.tmp', 'logs/f.jsonl', '.cache/g.jsonl'):
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'x' * 3)
+    return tmp_path
+
+
+def names(file_path, **kwargs):
+    return sorted(file.name for file in iter_files(file_path, **kwargs))
+
+
+class Test_discovery:
+
+    def test_split_pattern(self, tree):
+        assert split_pattern(f'{tree}/2021/**/*.jsonl') == (f'{tree}/2021', ['**', '*.jsonl'])
+        assert split_pattern(str(tree)) == (str(tree), ['*'])
+        assert split_pattern(f'{tree}/a.jsonl') == (str(tree), ['a.jsonl'])
+
+    @pytest.mark.parametrize('names_, patterns, expected', [
+        (['a.jsonl'], ['**', '*.jsonl'], True),
+        (['2021', '01', 'c.jsonl'], ['**', '*.jsonl'], True),
+        (['2021', '01', 'c.jsonl'], ['*', '*.jsonl'], False),
+        (['.cache', 'g.jsonl'], ['**', '*.jsonl'], False),
+        (['.hidden.jsonl'], ['*'], False),
+    ])
+    def test_match_path(self, names_, patterns, expected):
+        assert match_path(names_, patterns) == expected
+
+    def test_glob_compatible(self, tree):
+        assert names(f'{tree}/*') == ['a.jsonl', 'b.csv']
+        assert names(str(tree)) == ['a.jsonl', 'b.csv']
+        assert names(f'{tree}/*/*/*.jsonl') == ['2021/01/c.jsonl', '2021/02/d.jsonl']
+
+    def test_recursive_pattern_with_filters(self, tree):
+        assert names(f'{tree}/**/*.jsonl') == ['2021/01/c.jsonl', '2021/02/d.jsonl', 'a.jsonl', 'logs/f.jsonl']
+        assert names(f'{tree}/**', exclude=['logs', '*.tmp']) == ['2021/01/c.jsonl', '2021/02/d.jsonl',
+                                                                   'a.jsonl', 'b.csv']
+        assert names(f'{tree}/**', include=['2021/**']) == ['2021/01/c.jsonl', '2021/02/d.jsonl', '2021/02/e.tmp']
+
+    def test_relative_pattern_keeps_relative_paths(self, tree, monkeypatch):
+        monkeypatch.chdir(tree)
+
+        assert [file.path for file in iter_files('*.jsonl')] == ['a.jsonl']
+        assert sorted(file.path for file in iter_files('2021/*/*.jsonl')) == [os.path.join('2021', '01', 'c.jsonl'),
+                                                                        os.path.join('2021', '02', 'd.jsonl')]
+
+    def test_files_before_sorted_subdirectories(self, tree):
+        assert [file.name for file in iter_files(f'{tree}/**/*.jsonl')][-3:] == ['2021/01/c.jsonl',
+                                                                                  '2021/02/d.jsonl',
+                                                                                  'logs/f.jsonl']
+
+    def test_single_level_pattern_does_not_enter_subdirectories(self, tree, monkeypatch):
+        scanned = []
+        scandir = os.scandir
+        monkeypatch.setattr(os, 'scandir', lambda path: scanned.append(path) or scandir(path))
+
+        assert names(f'{tree}/*') == ['a.jsonl', 'b.csv']
+        assert scanned == [str(tree)]
+
+    def test_discover_files_raises_without_match(self, tree):
+        assert [file.size for file in discover_files(f'{tree}/**/*.jsonl', maxsize=1)] == [3, 3, 3, 3]
+        with pytest.raises(FileNotFoundError):
+            discover_files(f'{tree}/**/*.parquet')
+
+    def test_prefetch_raises_error_of_producer(self):
+        def items():
+            yield 1
+            raise OSError('scan failed')
+
+        results = prefetch(items(), maxsize=1)
+
+        assert next(results) == 1
+        with pytest.raises(OSError):
+            next(results)
+
+    def test_upload_uses_relative_blob_names(self, tree, monkeypatch):
+        client = FakeStorageClient()
+        monkeypatch.setattr('bq_loader.get_storage_client', lambda: client)
+
+        upload_files_to_bucket('bucket', f'{tree}/**/*.jsonl', 'raw', max_workers=2, exclude=['logs'])
+
+        assert sorted(client.bucket('bucket').objects) == ['raw/2021/01/c.jsonl', 'raw/2021/02/d.jsonl',
+                                                           'raw/a.jsonl']
@@ -0,0 +1,195 @@
+import os
+import json
+import pytest
+from bq_loader import download_files_from_bucket, export_table_to_bucket, export_table_to_local, read_table_to_local
+from bq_loader.export import download_blob, split_uri
+from tests.fakes import FakeBigQueryClient, FakeStorageClient
+
+pa = pytest.importorskip('pyarrow')
+
+
+class ExportingClient(FakeBigQueryClient):
+
+    def __init__(self, storage_client, shards):
+        super().__init__()
+        self.storage_client = storage_client
+        self.shards = shards
+
+    def extract_table(self, source, destination_uris, job_config=None):
+        bucket_name, name, _ = split_uri(destination_uris)
+        for n, data in enumerate(self.shards):
+            self.storage_client.bucket(bucket_name).objects[name.replace('*', f'{n:012d}')] = data
+        return super().extract_table(source, destination_uris, job_config)
+
+
+class FakeReadClient:
+
+    def __init__(self, batches):
+        self.batches = batches
+        self.requests = []
+
+    def create_read_session(self, parent, read_session, max_stream_count):
+        from google.cloud.bigquery_storage_v1 import types
+
+        self.requests.append((parent, read_session, max_stream_count))
+        streams = [types.ReadStream(name=f'stream-{n}') for n in range(min(max_stream_count, len(self.batches)))]
+        schema = self.batches[0].schema.serialize().to_pybytes()
+        return types.ReadSession(streams=streams, arrow_schema=types.ArrowSchema(serialized_schema=schema))
+
+    def read_rows(self, name, offset=0):
+        from google.cloud.bigquery_storage_v1 import types
+
+        batch = self.batches[int(name.split('-')[1])]
+        serialized = batch.serialize().to_pybytes()
+        yield types.ReadRowsResponse(row_count=batch.num_rows,
+                                     arrow_record_batch=types.ArrowRecordBatch(serialized_record_batch=serialized,
+                                                                               row_count=batch.num_rows))
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    client = FakeStorageClient()
+    monkeypatch.setattr('bq_loader.get_storage_client', lambda: client)
+    return client
+
+
+class Test_export:
+
+    def test_split_uri(self):
+        assert split_uri('gs://bucket/exports/crossref/part-*.jsonl') == ('bucket', 'exports/crossref/part-*.jsonl',
+                                                                          'exports/crossref/')
+        assert split_uri('gs://bucket/exports/') == ('bucket', 'exports/', 'exports/')
+        with pytest.raises(ValueError):
+            split_uri('bucket/exports')
+
+    def test_ranged_download_matches_blob(self, storage, tmp_path):
+        bucket = storage.bucket('bucket')
+        bucket.objects['exports/big.jsonl'] = os.urandom(10000)
+
+        ranges = download_blob(bucket.blob('exports/big.jsonl'), str(tmp_path / 'big.jsonl'), chunk_size=1024)
+
+        assert ranges == 10
+        assert (tmp_path / 'big.jsonl').read_bytes() == bucket.objects['exports/big.jsonl']
+        assert sorted(os.listdir(tmp_path)) == ['big.jsonl']
+
+    def test_interrupted_download_resumes_missing_ranges(self, storage, tmp_path):
+        bucket = storage.bucket('bucket')
+        data = os.urandom(4096)
+        bucket.objects['big.jsonl'] = data
+        blob = bucket.blob('big.jsonl')
+        (tmp_path / 'big.jsonl.part').write_bytes(data[:2048] + b'\0' * 2048)
+        (tmp_path / 'big.jsonl.part.json').write_text(json.dumps({'size': 4096, 'crc32c': blob.crc32c,
+                                                                  'generation': None, 'chunk_size': 1024,
+                                                                  'done': [0, 1]}))
+
+        assert download_blob(blob, str(tmp_path / 'big.jsonl'), chunk_size=1024) == 2
+        assert (tmp_path / 'big.jsonl').read_bytes() == data
+        assert [start for _, start, _ in bucket.ranges] == [2048, 3072]
+
+    def test_checksum_mismatch_raises(self, storage, tmp_path):
+        bucket = storage.bucket('bucket')
+        data = os.urandom(2048)
+        bucket.objects['big.jsonl'] = data
+        blob = bucket.blob('big.jsonl')
+        (tmp_path / 'big.jsonl.part').write_bytes(b'\0' * 2048)
+        (tmp_path / 'big.jsonl.part.json').write_text(json.dumps({'size': 2048, 'crc32c': blob.crc32c,
+                                                                  'generation': None, 'chunk_size': 1024,
+                                                                  'done': [0, 1]}))
+
+        with pytest.raises(ValueError):
+            download_blob(blob, str(tmp_path / 'big.jsonl'), chunk_size=1024)
+        assert not os.path.exists(tmp_path / 'big.jsonl')
+
+        download_blob(blob, str(tmp_path / 'big.jsonl'), chunk_size=1024)
+        assert (tmp_path / 'big.jsonl').read_bytes() == data
+
+    def test_download_skips_unchanged_files(self, storage, tmp_path):
+        bucket = storage.bucket('bucket')
+        bucket.objects['exports/part-0.jsonl'] = b'{"id": 1}\n' * 300
+        bucket.objects['exports/sub/part-1.jsonl'] = b'{"id": 2}\n' * 300
+        bucket.objects['exports/other.csv'] = b'id\n1\n'
+
+        results = download_files_from_bucket('gs://bucket/exports/*.jsonl', str(tmp_path), chunk_size=1000)
+
+        assert [result.file_path for result in results] == [str(tmp_path / 'part-0.jsonl'),
+                                                             str(tmp_path / 'sub' / 'part-1.jsonl')]
+        assert (tmp_path / 'sub' / 'part-1.jsonl').read_bytes() == bucket.objects['exports/sub/part-1.jsonl']
+        assert [result.ranges for result in results] == [3, 3]
+
+        bucket.objects['exports/part-0.jsonl'] = b'{"id": 3}\n' * 300
+        results = download_files_from_bucket('gs://bucket/exports/*.jsonl', str(tmp_path), chunk_size=1000)
+
+        assert [result.skipped for result in results] == [False, True]
+        assert (tmp_path / 'part-0.jsonl').read_bytes() == bucket.objects['exports/part-0.jsonl']
+
+    def test_download_raises_without_blobs(self, storage, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            download_files_from_bucket('gs://bucket/exports/', str(tmp_path))
+
+    def test_export_table_to_local(self, storage, tmp_path, monkeypatch):
+        client = ExportingClient(storage, [b'{"id": 1}\n', b'{"id": 2}\n'])
+        monkeypatch.setattr('bq_loader.get_bigquery_client', lambda: client)
+
+        results = export_table_to_local('crossref', 'project', 'dataset', 'gs://bucket/exports/part-*.jsonl',
+                                        str(tmp_path), compression='gzip', delete_exported=True)
+
+        source, uri, job_config = client.extracts[0]
+        assert (source, uri) == ('project.dataset.crossref', 'gs://bucket/exports/part-*.jsonl')
+        assert (job_config.destination_format, job_config.compression) == ('NEWLINE_DELIMITED_JSON', 'GZIP')
+        assert sorted(os.listdir(tmp_path)) == ['part-000000000000.jsonl', 'part-000000000001.jsonl']
+        assert len(results) == 2
+        assert storage.bucket('bucket').objects == {}
+
+    def test_export_refuses_prefix_with_existing_shards(self, storage, tmp_path, monkeypatch):
+        client = ExportingClient(storage, [b'{"id": 1}\n'])
+        monkeypatch.setattr('bq_loader.get_bigquery_client', lambda: client)
+        storage.bucket('bucket').objects['exports/part-000000000007.jsonl'] = b'{"id": 0}\n'
+
+        with pytest.raises(FileExistsError):
+            export_table_to_local('crossref', 'project', 'dataset', 'gs://bucket/exports/part-*.jsonl',
+                                  str(tmp_path), delete_exported=True)
+
+        assert client.extracts == []
+        assert list(storage.bucket('bucket').objects) == ['exports/part-000000000007.jsonl']
+        assert os.listdir(tmp_path) == []
+
+    def test_resume_reuses_shards_of_finished_export(self, storage, tmp_path, monkeypatch):
+        client = ExportingClient(storage, [b'{"id": 1}\n', b'{"id": 2}\n'])
+        monkeypatch.setattr('bq_loader.get_bigquery_client', lambda: client)
+        uri = 'gs://bucket/exports/part-*.jsonl'
+        export_table_to_bucket('crossref', 'project', 'dataset', uri)
+        (tmp_path / 'part-000000000000.jsonl').write_bytes(b'{"id": 1}\n')
+
+        with pytest.raises(FileExistsError):
+            export_table_to_local('crossref', 'project', 'dataset', uri, str(tmp_path), compression='gzip',
+                                  resume=True)
+        results = export_table_to_local('crossref', 'project', 'dataset', uri, str(tmp_path), resume=True)
+
+        assert len(client.extracts) == 1
+        assert [result.skipped for result in results] == [True, False]
+        assert sorted(os.listdir(tmp_path)) == ['part-000000000000.jsonl', 'part-000000000001.jsonl']
+
+    @pytest.mark.parametrize('file_format', ['parquet', 'jsonl'])
+    def test_read_table_to_local(self, tmp_path, file_format):
+        pytest.importorskip('google.cloud.bigquery_storage_v1')
+        import pyarrow.parquet as pq
+
+        batches = [pa.record_batch([pa.array([1, 2]), pa.array(['a', 'b'])], names=['id', 'name']),
+                   pa.record_batch([pa.array([3]), pa.array(['c'])], names=['id', 'name'])]
+        read_client = FakeReadClient(batches)
+
+        result = read_table_to_local('crossref', 'project', 'dataset', str(tmp_path), file_format=file_format,
+                                     max_streams=8, selected_fields=['id', 'name'], read_client=read_client)
+
+        parent, session, max_streams = read_client.requests[0]
+        assert (parent, session.table) == ('projects/project', 'projects/project/datasets/dataset/tables/crossref')
+        assert list(session.read_options.selected_fields) == ['id', 'name']
+        assert result.rows == 3
+        assert [os.path.basename(path) for path in result.files] == [f'part-00000.{file_format}',
+                                                                     f'part-00001.{file_format}']
+        assert sorted(os.listdir(tmp_path)) == [os.path.basename(path) for path in result.files]
+
+        if file_format == 'parquet':
+            assert pq.read_table(result.files[0]).column('id').to_pylist() == [1, 2]
+        else:
+            assert (tmp_path / 'part-00001.jsonl').read_text() == '{"id":3,"name":"c"}\n'
@@ -0,0 +1,34 @@
+import sys
+import subprocess
+
+HEAVY_MODULES = ('google.cloud.bigquery', 'google.cloud.storage', 'google.api_core',
+                 'concurrent.futures.process', 'requests', 'inquirer')
+
+
+def imported_modules(code: str) -> list:
+    process = subprocess.run([sys.executable, '-c', f'{code}\nimport sys\nprint("\\n".join(sys.modules))'],
+                             capture_output=True, text=True, check=True)
+    return process.stdout.splitlines()
+
+
+class Test_imports:
+
+    def test_package_import_is_lazy(self):
+        modules = imported_modules('import bq_loader')
+
+        assert 'bq_loader.pipeline' in modules
+        assert not [name for name in modules if name.startswith(HEAVY_MODULES)]
+
+    def test_cli_import_is_lazy(self):
+        modules = imported_modules('import bq_loader.__main__')
+
+        assert not [name for name in modules if name.startswith(HEAVY_MODULES)]
+
+    def test_config_imports_bigquery_on_use(self, tmp_path):
+        schema = tmp_path / 'schema.json'
+        schema.write_text('[{"name": "id", "type": "INTEGER", "mode": "NULLABLE"}]')
+
+        modules = imported_modules(f'import bq_loader\n'
+                                   f'bq_loader.JobConfig("p", "d", {str(schema)!r}, "jsonl").config')
+
+        assert 'google.cloud.bigquery' in modules
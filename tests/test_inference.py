@@ -0,0 +1,55 @@
+import json
+import pytest
+from bq_loader import infer_schema
+
+
+def fields(schema):
+    return {field['name']: (field['type'], field['mode']) for field in schema}
+
+
+class Test_inference:
+
+    def test_jsonl_types_are_merged_across_files(self, tmp_path):
+        first = tmp_path / 'first.jsonl'
+        first.write_text('{"id": 1, "score": 1, "tags": ["a"], "author": {"name": "x"}, "day": "2021-01-01"}\n')
+        second = tmp_path / 'second.jsonl'
+        second.write_text('{"id": 2, "score": 1.5, "author": {"name": "y", "age": 3}, "day": "2021-01-01T10:00:00Z",'
+                          ' "empty": null}\n')
+
+        schema = infer_schema([str(first), str(second)], 'jsonl', max_processes=2)
+
+        assert fields(schema) == {'id': ('INTEGER', 'NULLABLE'),
+                                  'score': ('FLOAT', 'NULLABLE'),
+                                  'tags': ('STRING', 'REPEATED'),
+                                  'author': ('RECORD', 'NULLABLE'),
+                                  'day': ('TIMESTAMP', 'NULLABLE'),
+                                  'empty': ('STRING', 'NULLABLE')}
+        author = next(field for field in schema if field['name'] == 'author')
+        assert fields(author['fields']) == {'name': ('STRING', 'NULLABLE'), 'age': ('INTEGER', 'NULLABLE')}
+
+    def test_csv_header_names_and_existing_schema_is_widened(self, tmp_path):
+        data = tmp_path / 'data.csv'
+        data.write_text('id,value,flag\n1,2,true\n2,x,false\n')
+        existing = tmp_path / 'schema.json'
+        existing.write_text(json.dumps([{'name': 'id', 'type': 'INTEGER', 'mode': 'REQUIRED'},
+                                        {'name': 'old', 'type': 'DATE', 'mode': 'NULLABLE'}]))
+        output = tmp_path / 'inferred.json'
+
+        schema = infer_schema([str(data)], 'csv', output_path=str(output), schema_file_path=str(existing),
+                              csv_skip_leading_rows=1, max_processes=1)
+
+        assert [field['name'] for field in schema] == ['id', 'value', 'flag', 'old']
+        assert fields(schema) == {'id': ('INTEGER', 'NULLABLE'),
+                                  'old': ('DATE', 'NULLABLE'),
+                                  'value': ('STRING', 'NULLABLE'),
+                                  'flag': ('BOOLEAN', 'NULLABLE')}
+        assert json.loads(output.read_text()) == schema
+
+    def test_csv_files_with_different_column_order_raise(self, tmp_path):
+        first = tmp_path / 'first.csv'
+        first.write_text('id,value\n1,x\n')
+        second = tmp_path / 'second.csv'
+        second.write_text('value,id\nx,1\n')
+
+        with pytest.raises(ValueError):
+            infer_schema([str(first), str(second)], 'csv', csv_skip_leading_rows=1, max_processes=1)
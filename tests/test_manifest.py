@@ -0,0 +1,139 @@
+import os
+import pytest
+from types import SimpleNamespace
+from bq_loader.manifest import Manifest, DONE, SUBMITTED
+from bq_loader.pipeline import LoadPipeline
+from bq_loader.resumable import upload_file_resumable
+from tests.fakes import FakeBigQueryClient
+
+
+class FakeSessionTransport:
+    """
+    Accepts at most ``fail_after`` chunks, then refuses further requests.
+    """
+
+    def __init__(self, fail_after=None):
+        self.data = b''
+        self.fail_after = fail_after
+        self.requests = 0
+
+    def put(self, url, data, headers):
+        content_range = headers['Content-Range'].split(' ')[1]
+        byte_range, total = content_range.split('/')
+        if byte_range == '*':
+            if len(self.data) == int(total):
+                return SimpleNamespace(status_code=200, headers={}, json=lambda: {})
+            return SimpleNamespace(status_code=308, headers={'Range': f'bytes=0-{len(self.data) - 1}'})
+
+        self.requests += 1
+        if self.fail_after is not None and self.requests > self.fail_after:
+            raise ConnectionError('connection lost')
+        self.data += data
+        if len(self.data) == int(total):
+            return SimpleNamespace(status_code=200, headers={}, json=lambda: {'md5Hash': 'hash'})
+        return SimpleNamespace(status_code=308, headers={'Range': f'bytes=0-{len(self.data) - 1}'})
+
+
+class FakeResumableBlob:
+
+    def __init__(self, transport):
+        self.client = SimpleNamespace(_http=transport)
+        self.sessions = 0
+
+    def create_resumable_upload_session(self, content_type=None, size=None):
+        self.sessions += 1
+        return f'https://upload/{self.sessions}'
+
+
+class Test_manifest:
+
+    def test_changed_files_are_not_done(self, tmp_path):
+        file = tmp_path / 'data.jsonl'
+        file.write_bytes(b'{"a": 1}\n')
+
+        with Manifest(str(tmp_path / 'manifest.db')) as manifest:
+            manifest.record('load', 'table', [str(file)], DONE, job_id='job')
+            assert manifest.is_done('load', 'table', [str(file)])
+
+            file.write_bytes(b'{"a": 2}\n{"a": 3}\n')
+            assert not manifest.is_done('load', 'table', [str(file)])
+
+    def test_pipeline_skips_finished_and_reattaches_submitted_jobs(self, tmp_path):
+        files = []
+        for i in range(3):
+            file = tmp_path / f'{i}.jsonl'
+            file.write_bytes(b'{"a": %d}\n' % i)
+            files.append(str(file))
+        client = FakeBigQueryClient()
+
+        with Manifest(str(tmp_path / 'manifest.db')) as manifest:
+            pipeline = LoadPipeline(client, 'dataset.table', None, poll_interval=0.01,
+                                    progress=False, manifest=manifest)
+            pipeline.run(files[:1])
+
+            job = client.load_table_from_file(open(files[1], 'rb'), 'dataset.table')
+            manifest.record('load', 'dataset.table', [files[1]], SUBMITTED, job_id=job.job_id)
+
+            results = pipeline.run(files)
+
+        assert [result.state for result in results] == ['SKIPPED', 'DONE', 'DONE']
+        assert results[1].job_id == job.job_id
+        assert len(client.loaded) == 3
+
+    def test_interrupted_upload_resumes_session(self, tmp_path):
+        file = tmp_path / 'data.bin'
+        file.write_bytes(os.urandom(3 * 256 * 1024 + 10))
+        transport = FakeSessionTransport(fail_after=2)
+        blob = FakeResumableBlob(transport)
+        sessions = []
+
+        try:
+            upload_file_resumable(blob, str(file), on_session=sessions.append, chunk_size=256 * 1024)
+        except ConnectionError:
+            pass
+
+        transport.fail_after = None
+        resource = upload_file_resumable(blob, str(file), session_url=sessions[-1], chunk_size=256 * 1024)
+
+        assert blob.sessions == 1
+        assert resource == {'md5Hash': 'hash'}
+        assert transport.data == file.read_bytes()
+
+    def test_stalled_upload_gives_up(self, tmp_path):
+        file = tmp_path / 'data.bin'
+        file.write_bytes(os.urandom(2 * 256 * 1024))
+        transport = FakeSessionTransport()
+        transport.put = lambda url, data, headers: SimpleNamespace(status_code=308, headers={})
+        blob = FakeResumableBlob(transport)
+
+        with pytest.raises(ConnectionError):
+            upload_file_resumable(blob, str(file), chunk_size=256 * 1024, max_stalls=3)
+
+    def test_upload_files_share_one_manifest(self, tmp_path, monkeypatch):
+        from bq_loader import upload_files_to_bucket
+        from tests.fakes import FakeStorageClient
+
+        for n in range(3):
+            (tmp_path / f'{n}.jsonl').write_bytes(b'{"id": 1}\n')
+        opened = []
+        monkeypatch.setattr('bq_loader.get_storage_client', FakeStorageClient)
+        monkeypatch.setattr('bq_loader.Manifest', lambda path: opened.append(path) or Manifest(path))
+
+        upload_files_to_bucket('bucket', str(tmp_path / '*.jsonl'), 'dir', compression='gzip',
+                               manifest_path=str(tmp_path / 'manifest.db'))
+
+        assert opened == [str(tmp_path / 'manifest.db')]
+
+    def test_resumable_upload_keeps_content_type(self, tmp_path, monkeypatch):
+        from bq_loader import upload_file_to_bucket
+        from tests.fakes import FakeStorageClient
+
+        file = tmp_path / 'data.csv'
+        file.write_text('1,a\n')
+        calls = []
+        monkeypatch.setattr('bq_loader.get_storage_client', FakeStorageClient)
+        monkeypatch.setattr('bq_loader.upload_file_resumable', lambda blob, file_path, **kwargs: calls.append(kwargs))
+
+        upload_file_to_bucket('bucket', 'dir/data.csv', str(file), manifest_path=str(tmp_path / 'manifest.db'))
+
+        assert calls[0]['content_type'] == 'text/csv'
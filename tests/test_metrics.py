@@ -0,0 +1,87 @@
+import json
+from bq_loader import upload_files_to_bucket
+from bq_loader.metrics import RunMetrics, job_statistics
+from bq_loader.pipeline import LoadPipeline
+from tests.fakes import FakeBigQueryClient, FakeLoadJob, FakeStorageClient
+
+
+class RecordingExporter:
+
+    def __init__(self):
+        self.timers = []
+        self.counters = []
+        self.jobs = []
+
+    def on_timer(self, phase, seconds):
+        self.timers.append(phase)
+
+    def on_counter(self, name, value):
+        self.counters.append((name, value))
+
+    def on_job(self, stats):
+        self.jobs.append(stats)
+
+
+class Test_metrics:
+
+    def test_job_statistics(self):
+        job = FakeLoadJob()
+        job.result()
+
+        stats = job_statistics(job)
+
+        assert stats['slot_ms'] == 1500
+        assert stats['bytes_processed'] == 100
+        assert stats['output_rows'] == 10
+        assert stats['queue_seconds'] == 1
+        assert stats['execution_seconds'] == 2
+
+    def test_pipeline_records_phases_and_jobs(self, tmp_path):
+        files = []
+        for i in range(3):
+            file = tmp_path / f'{i}.jsonl'
+            file.write_bytes(b'x' * 100)
+            files.append(str(file))
+        exporter = RecordingExporter()
+        metrics = RunMetrics(exporters=[exporter])
+
+        LoadPipeline(FakeBigQueryClient(), 'dataset.table', None, poll_interval=0.01,
+                     progress=False, metrics=metrics).run(files)
+        report = metrics.report()
+
+        assert report['phases']['upload']['count'] == 3
+        assert report['phases']['job_execution']['seconds'] == 6
+        assert report['counters'] == {'files_uploaded': 3, 'bytes_uploaded': 300}
+        assert report['jobs']['slot_ms'] == 4500
+        assert len(exporter.jobs) == 3
+        assert 'job_queue' in exporter.timers
+
+    def test_upload_files_to_bucket_writes_report(self, tmp_path, monkeypatch):
+        data = tmp_path / 'data'
+        data.mkdir()
+        for i in range(4):
+            (data / f'{i}.jsonl').write_bytes(b'{"a": 1}\n')
+        monkeypatch.setattr('bq_loader.get_storage_client', lambda: FakeStorageClient())
+
+        upload_files_to_bucket('bucket', str(data / '*'), 'tests', report_path=str(tmp_path / 'report.json'))
+
+        report = json.loads((tmp_path / 'report.json').read_text())
+        assert report['counters']['files_uploaded'] == 4
+        assert report['counters']['bytes_uploaded'] == 36
+        assert {'glob', 'client', 'upload'} <= set(report['phases'])
+        assert report['phases']['glob']['count'] == 1
+
+    def test_glob_phase_measures_the_scan(self):
+        import time
+        from bq_loader import _counted
+
+        def slow_scan():
+            for n in range(3):
+                time.sleep(0.02)
+                yield n
+
+        metrics = RunMetrics()
+
+        assert list(_counted(slow_scan(), metrics)) == [0, 1, 2]
+        assert metrics.phases['glob']['seconds'] >= 0.05
+        assert metrics.counters['files_found'] == 3
@@ -0,0 +1,116 @@
+import os
+import json
+import pytest
+from google.cloud import bigquery
+from bq_loader import JobConfig, create_table_from_local
+from bq_loader.partition import partition_id, split_by_partition, load_partitions
+from bq_loader.progress import Progress
+from tests.fakes import FakeBigQueryClient
+
+SCHEMA = [{'name': 'id', 'type': 'INTEGER', 'mode': 'NULLABLE'},
+          {'name': 'created', 'type': 'TIMESTAMP', 'mode': 'NULLABLE'}]
+
+
+@pytest.fixture
+def schema(tmp_path):
+    path = tmp_path / 'schema.json'
+    path.write_text(json.dumps(SCHEMA))
+    return str(path)
+
+
+class Test_partition:
+
+    @pytest.mark.parametrize('value, partition_type, expected', [
+        ('2021-01-31', 'DAY', '20210131'),
+        ('2021-01-31 23:30:00 -02:00', 'DAY', '20210201'),
+        ('2021-01-31T10:00:00', 'HOUR', '2021013110'),
+        ('2021-01-31', 'MONTH', '202101'),
+        (None, 'DAY', '__NULL__'),
+        ('1700000000', 'DAY', '20231114'),
+    ])
+    def test_partition_id(self, value, partition_type, expected):
+        assert partition_id(value, partition_type) == expected
+
+    @pytest.mark.parametrize('value, field_type, expected', [
+        ('1700000000', 'TIMESTAMP', '2023111422'),
+        ('2021-01-31', 'TIMESTAMP', '2021013100'),
+        ('2021-01-31 23:30:00 -02:00', 'TIMESTAMP', '2021020101'),
+        ('2021-01-31 23:30:00', 'DATETIME', '2021013123'),
+        ('2021-01-31', 'DATE', '2021013100'),
+    ])
+    def test_partition_id_by_field_type(self, value, field_type, expected):
+        assert partition_id(value, 'HOUR', field_type) == expected
+
+    def test_job_config_partitioning_and_clustering(self, schema):
+        config = JobConfig(project_id='p', dataset_id='d', schema_file_path=schema, source_format='jsonl',
+                           time_partitioning_type='month', time_partitioning_field='created',
+                           clustering_fields=['id']).config
+
+        assert config.time_partitioning.type_ == 'MONTH'
+        assert config.time_partitioning.field == 'created'
+        assert config.clustering_fields == ['id']
+
+    def test_split_csv_drops_headers(self, tmp_path, schema):
+        file = tmp_path / 'data.csv'
+        file.write_text('id,created\n1,2021-01-01 10:00:00\n2,2021-01-02 10:00:00\n3,2021-01-01 11:00:00\n')
+
+        partitions = split_by_partition([str(file)], 'created', 'csv', str(tmp_path / 'out'),
+                                        schema=SCHEMA, csv_skip_leading_rows=1, max_processes=1)
+
+        assert list(partitions) == ['20210101', '20210102']
+        with open(partitions['20210101'][0]) as partition_file:
+            assert partition_file.read() == '1,2021-01-01 10:00:00\n3,2021-01-01 11:00:00\n'
+
+    def test_split_files_are_named_after_their_source(self, tmp_path):
+        file = tmp_path / 'data.jsonl'
+        file.write_text('{"created": 1700000000}\n{"created": "1700090000"}\n')
+
+        first = split_by_partition([str(file)], 'created', 'jsonl', str(tmp_path / 'out'),
+                                   schema=SCHEMA, max_processes=1)
+        mtimes = [os.stat(files[0]).st_mtime_ns for files in first.values()]
+        second = split_by_partition([str(file)], 'created', 'jsonl', str(tmp_path / 'out'),
+                                    schema=SCHEMA, max_processes=1)
+
+        assert list(first) == ['20231114', '20231115']
+        assert second == first
+        assert [os.stat(files[0]).st_mtime_ns for files in second.values()] == mtimes == [file.stat().st_mtime_ns] * 2
+        assert all(files[0].endswith('_data.jsonl') for files in first.values())
+
+    def test_routed_partitions_resume_from_manifest(self, tmp_path, schema, monkeypatch):
+        client = FakeBigQueryClient()
+        monkeypatch.setattr('bq_loader.get_bigquery_client', lambda: client)
+        file = tmp_path / 'data.jsonl'
+        file.write_text('{"id": 1, "created": "2021-01-01 10:00:00"}\n{"id": 2, "created": "2021-01-02 10:00:00"}\n')
+        manifest_path = str(tmp_path / 'manifest.sqlite')
+
+        for _ in range(2):
+            create_table_from_local('t', 'p', 'd', str(file), schema, 'jsonl', time_partitioning_field='created',
+                                    route_partitions=True, manifest_path=manifest_path, progress=False)
+
+        assert len(client.loaded) == 2
+        assert not os.path.exists(manifest_path + '.partitions')
+
+    def test_load_partitions_one_job_per_partition(self, tmp_path):
+        files = {}
+        for day in ('20210101', '20210102'):
+            for n in range(2):
+                path = tmp_path / f'{day}_{n}.jsonl'
+                path.write_text(f'{{"day": "{day}", "n": {n}}}\n')
+                files.setdefault(day, []).append(str(path))
+        client = FakeBigQueryClient()
+        table = bigquery.TableReference.from_string('p.d.t')
+
+        progress = Progress()
+
+        results = load_partitions(client, table, None, files, poll_interval=0.01, progress=progress)
+
+        destinations = sorted(str(destination) for _, _, destination, _ in client.loaded)
+        assert destinations == ['p.d.t$20210101', 'p.d.t$20210102']
+        assert all(data.count(b'\n') == 2 for _, data, _, _ in client.loaded)
+        assert [result.state for result in results] == ['DONE', 'DONE']
+        snapshot = progress.close()
+        assert (snapshot.jobs_done, snapshot.jobs_total, snapshot.files_done) == (2, 2, 2)
+
+    def test_route_partitions_requires_field(self, schema):
+        with pytest.raises(ValueError):
+            create_table_from_local('t', 'p', 'd', 'data/*', schema, 'jsonl', route_partitions=True)
@@ -0,0 +1,105 @@
+import pytest
+from bq_loader.pipeline import LoadPipeline, ByteBudget
+from bq_loader.scheduler import Scheduler
+from tests.fakes import FakeBigQueryClient, FakeLoadJob
+
+
+def write_files(tmp_path, n, size=100):
+    files = []
+    for i in range(n):
+        file = tmp_path / f'{i}.jsonl'
+        file.write_bytes(b'x' * size)
+        files.append(str(file))
+    return files
+
+
+class Test_pipeline:
+
+    def test_run_loads_every_file(self, tmp_path):
+        files = write_files(tmp_path, 10)
+        client = FakeBigQueryClient()
+
+        pipeline = LoadPipeline(client, 'dataset.table', None,
+                                max_uploads=3, max_in_flight_bytes=250,
+                                poll_interval=0.01, progress=False)
+        results = pipeline.run(files)
+
+        assert len(client.loaded) == 10
+        assert [result.file for result in results] == files
+        assert all(result.state == 'DONE' and result.job_id for result in results)
+        assert pipeline.budget.in_flight == 0
+
+    def test_run_raises_after_processing_all_files(self, tmp_path):
+        files = write_files(tmp_path, 4)
+        client = FakeBigQueryClient(fail_on=('2.jsonl',))
+
+        pipeline = LoadPipeline(client, 'dataset.table', None,
+                                poll_interval=0.01, progress=False)
+
+        with pytest.raises(RuntimeError):
+            pipeline.run(files)
+        assert len(client.loaded) == 4
+
+    @pytest.mark.parametrize('failures', [2, 3])
+    def test_failed_polls_are_retried_and_recorded(self, tmp_path, failures):
+        from google.api_core.exceptions import ServiceUnavailable
+
+        class FlakyJob(FakeLoadJob):
+            polls_failing = failures
+
+            def done(self):
+                if FlakyJob.polls_failing:
+                    FlakyJob.polls_failing -= 1
+                    raise ServiceUnavailable('jobs.get failed')
+                return super().done()
+
+        jobs = []
+        client = FakeBigQueryClient()
+        client.load_table_from_file = lambda *args, **kwargs: jobs.append(FlakyJob()) or jobs[-1]
+        pipeline = LoadPipeline(client, 'dataset.table', None, poll_interval=0.001, progress=False,
+                                scheduler=Scheduler(max_attempts=3, initial_backoff=0.001))
+
+        if failures < 3:
+            [result] = pipeline.run(write_files(tmp_path, 1))
+            assert result.state == 'DONE'
+        else:
+            with pytest.raises(ServiceUnavailable):
+                pipeline.run(write_files(tmp_path, 1))
+            assert pipeline.metrics.counters['polls_failed'] == 1
+        assert pipeline.metrics.counters['poll_retries'] == 2
+        assert len(jobs) == 1
+
+    def test_retried_upload_reuses_job_of_lost_response(self, tmp_path):
+        from google.api_core.exceptions import ServiceUnavailable
+
+        class LosingClient(FakeBigQueryClient):
+            def load_table_from_file(self, *args, **kwargs):
+                job = super().load_table_from_file(*args, **kwargs)
+                if len(self.jobs) == 1:
+                    raise ServiceUnavailable('response lost')
+                return job
+
+        client = LosingClient()
+        pipeline = LoadPipeline(client, 'dataset.table', None, poll_interval=0.001, progress=False,
+                                scheduler=Scheduler(max_attempts=3, initial_backoff=0.001))
+
+        [result] = pipeline.run(write_files(tmp_path, 1))
+
+        assert len(client.loaded) == 1 and list(client.jobs) == [result.job_id]
+        assert result.state == 'DONE'
+        assert pipeline.metrics.counters['jobs_recovered'] == 1
+
+    def test_delete_loaded_removes_files_after_their_jobs(self, tmp_path):
+        files = write_files(tmp_path, 3)
+
+        LoadPipeline(FakeBigQueryClient(), 'dataset.table', None, poll_interval=0.001, progress=False,
+                     delete_loaded=True).run(files)
+
+        assert list(tmp_path.iterdir()) == []
+
+    def test_byte_budget_admits_oversized_item(self):
+        budget = ByteBudget(10)
+        budget.acquire(100)
+        assert budget.in_flight == 100
+        budget.release(100)
+        assert budget.in_flight == 0
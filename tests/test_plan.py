@@ -0,0 +1,157 @@
+import os
+import json
+import pytest
+from google.cloud import bigquery
+from bq_loader import create_table_from_local, upload_files_to_bucket, run_spec
+from bq_loader.discovery import DiscoveredFile
+from bq_loader.plan import (check_destination, measured_throughput, plan_load, sample_compression_ratio,
+                            LOAD_JOBS_PER_TABLE_PER_DAY, Throughput)
+from tests.fakes import FakeBigQueryClient, FakeStorageClient
+
+SCHEMA = [{'name': 'id', 'type': 'INTEGER', 'mode': 'NULLABLE'},
+          {'name': 'name', 'type': 'STRING', 'mode': 'NULLABLE'}]
+TABLE = 'project.dataset.crossref'
+
+
+@pytest.fixture
+def schema(tmp_path):
+    path = tmp_path / 'schema.json'
+    path.write_text(json.dumps(SCHEMA))
+    return str(path)
+
+
+@pytest.fixture
+def data(tmp_path):
+    directory = tmp_path / 'data'
+    directory.mkdir()
+    for i in range(4):
+        (directory / f'{i}.jsonl').write_text(''.join(f'{{"id": {n}, "name": "name {n}"}}\n' for n in range(1000)))
+    return directory
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeBigQueryClient()
+    monkeypatch.setattr('bq_loader.get_bigquery_client', lambda: client)
+    return client
+
+
+def existing_table(client, fields, rows=0, partitioning=None):
+    table = bigquery.Table(TABLE, schema=[bigquery.SchemaField(*field) for field in fields])
+    table._properties['numRows'] = str(rows)
+    table.time_partitioning = partitioning
+    client.tables[TABLE] = table
+
+
+def config(write_disposition='WRITE_APPEND', partitioning=None):
+    job_config = bigquery.LoadJobConfig(schema=[bigquery.SchemaField(field['name'], field['type'])
+                                                for field in SCHEMA])
+    job_config.write_disposition = write_disposition
+    job_config.time_partitioning = partitioning
+    return job_config
+
+
+def files(n, size=100):
+    return [DiscoveredFile(path=f'{i}.jsonl', name=f'{i}.jsonl', size=size) for i in range(n)]
+
+
+class Test_plan:
+
+    def test_missing_table_will_be_created(self, client):
+        errors, warnings = check_destination(client, bigquery.TableReference.from_string(TABLE), config())
+
+        assert errors == []
+        assert 'does not exist' in warnings[0]
+
+    def test_write_empty_fails_on_non_empty_table(self, client):
+        existing_table(client, [('id', 'INTEGER'), ('name', 'STRING')], rows=10)
+
+        errors, _ = check_destination(client, TABLE, config('WRITE_EMPTY'))
+        assert errors == [f'WRITE_EMPTY fails because table {TABLE} contains 10 rows.']
+
+        assert check_destination(client, TABLE, config('WRITE_APPEND')) == ([], [])
+
+    def test_append_requires_compatible_schema(self, client):
+        existing_table(client, [('id', 'STRING'), ('created', 'TIMESTAMP', 'REQUIRED')])
+
+        errors, _ = check_destination(client, TABLE, config())
+
+        assert errors == [f'Column id is STRING in table {TABLE} but INTEGER in the schema.',
+                          f'Column name does not exist in table {TABLE}.',
+                          f'Required column created of table {TABLE} is missing in the schema.']
+
+    def test_truncate_replaces_schema_but_not_partitioning(self, client):
+        existing_table(client, [('id', 'INT64')], partitioning=bigquery.TimePartitioning(field='created'))
+
+        errors, warnings = check_destination(client, TABLE, config('WRITE_TRUNCATE', bigquery.TimePartitioning()))
+
+        assert errors == [f'The partitioning of table {TABLE} differs from the job configuration.']
+        assert warnings == [f'WRITE_TRUNCATE replaces the schema of table {TABLE}.']
+
+    def test_load_jobs_and_quota(self, client):
+        plan = plan_load(client, TABLE, config(), files(LOAD_JOBS_PER_TABLE_PER_DAY + 1), 'jsonl')
+        assert plan.load_jobs == LOAD_JOBS_PER_TABLE_PER_DAY + 1
+        assert 'quota' in plan.errors[0]
+
+        plan = plan_load(client, TABLE, config(), files(LOAD_JOBS_PER_TABLE_PER_DAY + 1), 'jsonl', staging_shards=4)
+        assert plan.load_jobs == LOAD_JOBS_PER_TABLE_PER_DAY + 2
+        assert plan.valid
+
+        plan = plan_load(client, TABLE, config(), files(10), 'jsonl', coalesce_bytes=350)
+        assert plan.load_jobs == 4
+
+    def test_estimate_uses_measured_throughput(self, client, tmp_path):
+        report = tmp_path / 'report.json'
+        report.write_text(json.dumps({'phases': {'upload': {'count': 2, 'seconds': 4.0},
+                                                 'job_queue': {'count': 2, 'seconds': 2.0},
+                                                 'job_execution': {'count': 2, 'seconds': 8.0}},
+                                      'counters': {'bytes_uploaded': 400}}))
+
+        throughput = measured_throughput([str(report)])
+        plan = plan_load(client, TABLE, config(), files(4), 'jsonl', max_uploads=2, throughput=throughput)
+
+        assert throughput == Throughput(upload_bytes_per_second=100, job_seconds=5, runs=1)
+        assert (plan.upload_seconds, plan.job_seconds, plan.seconds) == (2, 5, 7)
+
+    def test_sample_compression_ratio(self, data):
+        sampled = [DiscoveredFile(path=str(path), name=path.name, size=path.stat().st_size)
+                   for path in sorted(data.iterdir())]
+
+        assert 0 < sample_compression_ratio(sampled, sample_files=2, sample_bytes=4096) < 0.5
+        assert sample_compression_ratio([]) == 1.0
+
+    def test_dry_run_uploads_nothing(self, client, schema, data):
+        existing_table(client, [('id', 'INTEGER'), ('name', 'STRING')], rows=10)
+
+        plan = create_table_from_local('crossref', 'project', 'dataset', str(data), schema, 'jsonl',
+                                       compression='gzip', dry_run=True)
+
+        assert client.loaded == []
+        assert plan.files == 4 and plan.load_jobs == 4
+        assert plan.upload_bytes < plan.bytes == sum(os.path.getsize(path) for path in data.iterdir())
+        assert not plan.valid
+
+    def test_upload_dry_run(self, monkeypatch, data):
+        storage = FakeStorageClient()
+        monkeypatch.setattr('bq_loader.get_storage_client', lambda: storage)
+
+        plan = upload_files_to_bucket('bucket', str(data), 'raw', composite_threshold=10000,
+                                      composite_chunk_size=4096, dry_run=True)
+
+        assert storage.buckets == {}
+        assert plan.target == 'gs://bucket/raw'
+        assert plan.requests == 4 * (-(-plan.bytes // 4 // 4096) + 1)
+
+    def test_spec_dry_run_fails_on_plan_errors(self, client, schema, data):
+        existing_table(client, [('id', 'INTEGER'), ('name', 'STRING')], rows=10)
+        task = {'method': 'create_table_from_local', 'table_id': 'crossref', 'project_id': 'project',
+                'dataset_id': 'dataset', 'file_path': str(data), 'schema_file_path': schema,
+                'source_format': 'jsonl'}
+
+        results = run_spec({'tasks': [{**task, 'name': 'empty'},
+                                      {**task, 'name': 'append', 'write_disposition': 'WRITE_APPEND'},
+                                      {'name': 'bucket', 'method': 'create_table_from_bucket', 'uri': 'gs://b/*'}]},
+                           dry_run=True)
+
+        assert [result.status for result in results] == ['FAILED', 'DONE', 'SKIPPED']
+        assert client.loaded == []
@@ -0,0 +1,143 @@
+import io
+import mmap
+import os
+import pytest
+from bq_loader import upload_file_to_bucket, upload_files_to_bucket
+from bq_loader.pipeline import LoadPipeline
+from bq_loader.progress import Progress, ProgressBar, ProgressSnapshot, resolve_progress
+from tests.fakes import FakeBigQueryClient, FakeStorageClient
+
+
+def write_files(tmp_path, n, size=1000):
+    files = []
+    for i in range(n):
+        file = tmp_path / f'{i}.jsonl'
+        file.write_bytes(b'x' * size)
+        files.append(str(file))
+    return files
+
+
+@pytest.fixture
+def snapshots():
+    return []
+
+
+@pytest.fixture
+def progress(snapshots):
+    return Progress(callbacks=[snapshots.append], interval=60)
+
+
+class Test_progress:
+
+    def test_tracked_reads_count_while_in_flight(self, progress):
+        progress.expect(10)
+        progress.expect(5)
+        task = progress.task('a', 10)
+        reader = task.track(io.BytesIO(b'x' * 10))
+
+        reader.read(4)
+        reader.readinto(bytearray(2))
+        assert (progress.snapshot().bytes_done, progress.snapshot().in_flight) == (6, 1)
+
+        reader.seek(0)
+        assert task.done == 0
+
+        reader.read()
+        task.finish()
+        progress.skip(5)
+        snapshot = progress.close()
+
+        assert (snapshot.bytes_done, snapshot.bytes_total, snapshot.files_done, snapshot.in_flight) == (15, 15, 2, 0)
+        assert snapshot.finished and snapshot.fraction == 1.0 and snapshot.eta_seconds == 0.0
+
+    def test_failed_transfer_leaves_totals(self, progress):
+        progress.expect(10)
+        progress.expect(10)
+        progress.task('a', 10).finish()
+        progress.task('b', 10).finish(RuntimeError('failed'))
+
+        snapshot = progress.close()
+
+        assert (snapshot.bytes_done, snapshot.bytes_total, snapshot.files_done, snapshot.files_failed) == (10, 10, 1, 1)
+
+    def test_eta_from_rate(self):
+        snapshot = ProgressSnapshot(bytes_done=100, bytes_total=400, bytes_per_second=50)
+
+        assert (snapshot.fraction, snapshot.eta_seconds) == (0.25, 6.0)
+        assert ProgressSnapshot(bytes_total=400).eta_seconds is None
+
+    def test_failing_callback_is_removed(self, progress, snapshots):
+        def broken(snapshot):
+            raise ValueError('broken')
+
+        progress.subscribe(broken)
+
+        with pytest.warns(UserWarning):
+            progress.publish()
+        progress.publish()
+
+        assert progress.callbacks == [snapshots.append]
+        assert len(snapshots) == 2
+
+    def test_progress_bar_overwrites_one_line(self):
+        stream = io.StringIO()
+        bar = ProgressBar(stream=stream, width=10)
+
+        bar(ProgressSnapshot(bytes_done=5 * 1024 ** 2, bytes_total=10 * 1024 ** 2, bytes_per_second=1024 ** 2,
+                             in_flight=2, files_done=1, files_total=4, jobs_done=1, jobs_total=2))
+        bar(ProgressSnapshot(bytes_done=10 * 1024 ** 2, bytes_total=10 * 1024 ** 2, files_done=4, files_total=4,
+                             finished=True))
+
+        first, second = stream.getvalue().split('\r')[1:]
+        assert first == '|=====     |  50% 5.0/10.0 MB 1.0 MB/s ETA 00:05 2 in flight 1/4 files 1/2 jobs'
+        assert second.startswith('|==========| 100% 10.0/10.0 MB') and second.endswith('\n')
+
+    def test_resolve_progress(self, progress):
+        assert isinstance(resolve_progress(True).callbacks[0], ProgressBar)
+        assert resolve_progress(False) is None
+        assert resolve_progress(progress) is progress
+
+    @pytest.mark.parametrize('compression', [None, 'gzip'])
+    def test_pipeline_reports_bytes_and_jobs(self, tmp_path, progress, snapshots, compression):
+        files = write_files(tmp_path, 5)
+
+        LoadPipeline(FakeBigQueryClient(), 'dataset.table', None, max_uploads=2, poll_interval=0.01,
+                     compression=compression, progress=progress).run(files)
+        snapshot = progress.close()
+
+        assert (snapshot.bytes_done, snapshot.bytes_total) == (5000, 5000)
+        assert (snapshot.files_done, snapshot.jobs_done, snapshot.jobs_total, snapshot.in_flight) == (5, 5, 5, 0)
+        assert snapshots[-1] is snapshot
+
+    def test_upload_files_replaces_lines_per_file(self, tmp_path, monkeypatch, capsys, progress):
+        write_files(tmp_path, 3)
+        client = FakeStorageClient()
+        monkeypatch.setattr('bq_loader.get_storage_client', lambda: client)
+
+        for _ in range(2):
+            upload_files_to_bucket('bucket', str(tmp_path / '*.jsonl'), 'dir', max_workers=2, compression='gzip',
+                                   manifest_path=str(tmp_path / 'manifest.db'), progress=progress)
+        snapshot = progress.close()
+
+        assert 'uploaded to' not in capsys.readouterr().out
+        assert (snapshot.bytes_done, snapshot.files_done, snapshot.files_total) == (6000, 6, 6)
+        assert len(client.bucket('bucket').objects) == 3
+
+    def test_composite_upload_reports_parts(self, tmp_path, monkeypatch, progress):
+        file = tmp_path / 'large.jsonl'
+        file.write_bytes(os.urandom(4 * mmap.ALLOCATIONGRANULARITY + 10))
+        monkeypatch.setattr('bq_loader.get_storage_client', FakeStorageClient)
+        seen = []
+        task = progress.task
+
+        def recording_task(name, size):
+            seen.append(task(name, size))
+            return seen[-1]
+
+        monkeypatch.setattr(progress, 'task', recording_task)
+
+        upload_file_to_bucket('bucket', 'large.jsonl', str(file), composite_threshold=1024,
+                              composite_chunk_size=mmap.ALLOCATIONGRANULARITY, progress=progress)
+
+        assert seen[0].done == file.stat().st_size
+        assert progress.close().bytes_done == file.stat().st_size
@@ -0,0 +1,103 @@
+import json
+import pytest
+from datetime import date, datetime
+from decimal import Decimal
+from google.cloud.bigquery import LoadJobConfig
+from bq_loader import create_table_from_rows
+from bq_loader.rows import RowStream, chunk_rows, load_rows
+from tests.fakes import FakeBigQueryClient
+
+SCHEMA = [{'name': 'id', 'type': 'INTEGER', 'mode': 'NULLABLE'},
+          {'name': 'day', 'type': 'DATE', 'mode': 'NULLABLE'}]
+
+
+@pytest.fixture
+def schema(tmp_path):
+    path = tmp_path / 'schema.json'
+    path.write_text(json.dumps(SCHEMA))
+    return str(path)
+
+
+def generate(n):
+    for i in range(n):
+        yield {'id': i, 'day': date(2021, 1, 1 + i % 28)}
+
+
+class Test_rows:
+
+    def test_chunk_rows_of_dicts(self):
+        chunks = list(chunk_rows(generate(25), chunk_size=10))
+
+        assert [chunk.rows for chunk in chunks] == [10, 10, 5]
+        with pytest.raises(TypeError):
+            list(chunk_rows([1, 2]))
+
+    def test_stream_serializes_in_order(self):
+        rows = [{'id': 1, 'at': datetime(2021, 1, 1, 12), 'amount': Decimal('1.50'), 'blob': b'\x00'}] + \
+               [{'id': i} for i in range(2, 50)]
+
+        with RowStream(chunk_rows(rows, chunk_size=3), workers=4) as stream:
+            lines = stream.read().decode('utf-8').splitlines()
+
+        assert json.loads(lines[0]) == {'id': 1, 'at': '2021-01-01T12:00:00', 'amount': '1.50', 'blob': 'AA=='}
+        assert [json.loads(line)['id'] for line in lines] == list(range(1, 50))
+        assert stream.rows == 49
+
+    def test_stream_holds_few_chunks(self):
+        taken = []
+
+        def rows():
+            for i in range(1000):
+                taken.append(i)
+                yield {'id': i}
+
+        with RowStream(chunk_rows(rows(), chunk_size=10), workers=2) as stream:
+            stream.read(1)
+            assert len(taken) <= 10 * 2 * 2 + 10
+
+    def test_load_rows_splits_jobs(self):
+        client = FakeBigQueryClient()
+        config = LoadJobConfig(write_disposition='WRITE_TRUNCATE')
+
+        results = load_rows(client, 'p.d.t', config, chunk_rows(generate(25), chunk_size=5), rows_per_job=10)
+
+        assert len(results) == 3 and all(result.state == 'DONE' for result in results)
+        assert [data.count(b'\n') for _, data, _, _ in client.loaded] == [10, 10, 5]
+        assert [job_config.write_disposition for *_, job_config in client.loaded] == \
+               ['WRITE_TRUNCATE', 'WRITE_APPEND', 'WRITE_APPEND']
+        assert sum(result.size for result in results) == sum(len(data) for _, data, _, _ in client.loaded)
+
+    def test_create_table_from_rows(self, schema, monkeypatch):
+        client = FakeBigQueryClient()
+        monkeypatch.setattr('bq_loader.get_bigquery_client', lambda: client)
+
+        create_table_from_rows(generate(3), 't', 'p', 'd', schema)
+
+        [(_, data, destination, config)] = client.loaded
+        assert data.splitlines()[0] == b'{"id":0,"day":"2021-01-01"}'
+        assert str(destination) == 'p.d.t'
+        assert config.source_format == 'NEWLINE_DELIMITED_JSON'
+
+    def test_dataframe_rows(self, schema, monkeypatch):
+        pd = pytest.importorskip('pandas')
+        client = FakeBigQueryClient()
+        monkeypatch.setattr('bq_loader.get_bigquery_client', lambda: client)
+
+        create_table_from_rows(pd.DataFrame({'id': [1, 2, 3], 'day': ['2021-01-01'] * 3}), 't', 'p', 'd', schema,
+                               chunk_size=2)
+
+        [(_, data, _, _)] = client.loaded
+        assert [json.loads(line)['id'] for line in data.splitlines()] == [1, 2, 3]
+
+    def test_arrow_rows_are_loaded_as_parquet(self, schema, monkeypatch):
+        pa = pytest.importorskip('pyarrow')
+        pq = pytest.importorskip('pyarrow.parquet')
+        client = FakeBigQueryClient()
+        monkeypatch.setattr('bq_loader.get_bigquery_client', lambda: client)
+        table = pa.table({'id': list(range(10)), 'day': [date(2021, 1, 1)] * 10})
+
+        create_table_from_rows(table, 't', 'p', 'd', schema, chunk_size=3)
+
+        [(_, data, _, config)] = client.loaded
+        assert config.source_format == 'PARQUET'
+        assert pq.read_table(pa.BufferReader(data)).column('id').to_pylist() == list(range(10))
@@ -0,0 +1,182 @@
+import pytest
+from google.api_core.exceptions import BadRequest, Forbidden, InternalServerError, ServiceUnavailable, TooManyRequests
+from bq_loader import upload_files_to_bucket
+from bq_loader.batch import JobPoller, BucketLoadResult
+from bq_loader.pipeline import LoadPipeline
+from bq_loader.scheduler import CircuitBreaker, Scheduler, TokenBucket, is_transient
+from tests.fakes import FakeBigQueryClient, FakeBlob, FakeLoadJob, FakeStorageClient
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    delays = []
+    monkeypatch.setattr('bq_loader.scheduler.time.sleep', delays.append)
+    return delays
+
+
+class FlakyClient(FakeBigQueryClient):
+    """
+    Fails the first load job of every file with a transient backend error.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.seen = set()
+
+    def load_table_from_file(self, file_obj, destination, job_id=None, job_config=None):
+        job = super().load_table_from_file(file_obj, destination, job_id, job_config)
+        if file_obj.name not in self.seen:
+            self.seen.add(file_obj.name)
+            job.error = ServiceUnavailable('backend error', errors=[{'reason': 'backendError'}])
+        return job
+
+
+class Test_scheduler:
+
+    def test_is_transient(self):
+        assert is_transient(TooManyRequests('slow down'))
+        assert is_transient(ServiceUnavailable('unavailable'))
+        assert is_transient(Forbidden('quota', errors=[{'reason': 'rateLimitExceeded'}]))
+        assert is_transient(ConnectionError())
+        assert is_transient(ServiceUnavailable('unavailable', errors=[{'reason': ''}]))
+        assert is_transient(InternalServerError('internal', errors=[{'reason': 'backendErrorRetry'}]))
+        assert is_transient(BadRequest('failed', errors=[{'reason': 'backendError'}]))
+        assert is_transient(error_result={'reason': 'backendError'})
+        assert not is_transient(Forbidden('denied', errors=[{'reason': 'accessDenied'}]))
+        assert not is_transient(BadRequest('invalid', errors=[{'reason': 'invalid'}]))
+        assert not is_transient(error_result={'reason': 'quotaExceeded'})
+        assert not is_transient()
+
+    def test_token_bucket_paces_calls(self, monkeypatch):
+        now = [0.0]
+        monkeypatch.setattr('bq_loader.scheduler.time.monotonic', lambda: now[0])
+        monkeypatch.setattr('bq_loader.scheduler.time.sleep', lambda seconds: now.__setitem__(0, now[0] + seconds))
+        bucket = TokenBucket(rate=10, capacity=2)
+
+        waits = [bucket.acquire() for _ in range(4)]
+
+        assert waits[:2] == [0.0, 0.0]
+        assert waits[2:] == [pytest.approx(0.1), pytest.approx(0.1)]
+        assert TokenBucket(rate=None).acquire() == 0.0
+
+    def test_circuit_breaker_opens_and_closes(self, monkeypatch):
+        now = [0.0]
+        monkeypatch.setattr('bq_loader.scheduler.time.monotonic', lambda: now[0])
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=5)
+
+        breaker.failure()
+        assert breaker.state == CircuitBreaker.CLOSED
+        breaker.failure()
+        assert breaker.state == CircuitBreaker.OPEN
+
+        now[0] = 6
+        breaker.wait()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        breaker.failure()
+        assert breaker.state == CircuitBreaker.OPEN
+
+        now[0] = 12
+        breaker.wait()
+        breaker.success()
+        assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+
+    def test_call_retries_transient_errors(self, no_sleep):
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise ServiceUnavailable('unavailable')
+            return 'ok'
+
+        scheduler = Scheduler(max_attempts=5, initial_backoff=1, max_backoff=2)
+
+        assert scheduler.call(flaky) == 'ok'
+        assert len(calls) == 3
+        assert len(no_sleep) == 2 and all(0 <= delay <= 2 for delay in no_sleep)
+        assert scheduler.metrics.counters['retries'] == 2
+
+    def test_call_raises_permanent_errors_and_last_attempt(self, no_sleep):
+        scheduler = Scheduler(max_attempts=3)
+
+        def invalid():
+            raise BadRequest('invalid')
+
+        def unavailable():
+            raise ServiceUnavailable('unavailable')
+
+        with pytest.raises(BadRequest):
+            scheduler.call(invalid)
+        assert no_sleep == []
+
+        with pytest.raises(ServiceUnavailable):
+            scheduler.call(unavailable)
+        assert len(no_sleep) == 2
+
+    def test_pipeline_requeues_transient_job_failures(self, tmp_path, no_sleep):
+        files = []
+        for i in range(3):
+            file = tmp_path / f'{i}.jsonl'
+            file.write_bytes(b'x' * 10)
+            files.append(str(file))
+        client = FlakyClient()
+
+        pipeline = LoadPipeline(client, 'dataset.table', None, poll_interval=0.01, progress=False)
+        results = pipeline.run(files)
+
+        assert len(client.loaded) == 6
+        assert all(result.state == 'DONE' and result.error is None for result in results)
+        assert [result.attempts for result in results] == [2, 2, 2]
+        assert pipeline.metrics.counters['jobs_requeued'] == 3
+
+    def test_poller_requeues_transient_job_failures(self, no_sleep):
+        jobs = [FakeLoadJob(error=ServiceUnavailable('unavailable')), FakeLoadJob()]
+        result = BucketLoadResult(uri='gs://bucket/a', table_id='a')
+
+        [result] = JobPoller(min_poll_interval=0.001, progress=False).run([(result, lambda: jobs.pop(0))])
+
+        assert result.state == 'DONE' and result.error is None
+        assert result.attempts == 2
+
+    @pytest.mark.parametrize('failures', [2, 5])
+    def test_poller_retries_failed_polls_without_resubmitting(self, no_sleep, failures):
+        class FlakyJob(FakeLoadJob):
+            polls_failing = failures
+
+            def done(self):
+                if FlakyJob.polls_failing:
+                    FlakyJob.polls_failing -= 1
+                    raise ServiceUnavailable('jobs.get failed')
+                return super().done()
+
+        jobs = []
+        result = BucketLoadResult(uri='gs://bucket/a', table_id='a')
+        poller = JobPoller(min_poll_interval=0.001, progress=False)
+
+        [result] = poller.run([(result, lambda: jobs.append(FlakyJob()) or jobs[-1])])
+
+        assert len(jobs) == result.attempts == 1
+        if failures < poller.scheduler.max_attempts:
+            assert result.state == 'DONE' and result.error is None
+        else:
+            assert result.state == 'UNKNOWN' and isinstance(result.error, ServiceUnavailable)
+
+    def test_upload_continues_after_failure(self, tmp_path, monkeypatch, no_sleep):
+        for name in ('a', 'broken', 'c'):
+            (tmp_path / f'{name}.jsonl').write_bytes(b'x')
+        client = FakeStorageClient()
+        monkeypatch.setattr('bq_loader.get_storage_client', lambda: client)
+        upload = FakeBlob.upload_from_file
+
+        def upload_from_file(blob, file_obj, **kwargs):
+            if 'broken' in file_obj.name:
+                raise BadRequest('invalid')
+            upload(blob, file_obj, **kwargs)
+
+        monkeypatch.setattr(FakeBlob, 'upload_from_file', upload_from_file)
+
+        with pytest.raises(BadRequest):
+            upload_files_to_bucket('bucket', str(tmp_path / '*'), 'dir', max_workers=1)
+
+        uploaded = sorted(client.bucket('bucket').objects)
+        assert len(uploaded) == 2 and not any('broken' in name for name in uploaded)
@@ -0,0 +1,111 @@
+import json
+import time
+import threading
+import pytest
+from bq_loader import run_spec, load_spec
+from bq_loader.spec import DONE, FAILED, SKIPPED
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+    lock = threading.Lock()
+
+    def recorder(method):
+        def call(**kwargs):
+            with lock:
+                calls.append(('start', method, kwargs))
+            time.sleep(0.05)
+            if kwargs.get('fail'):
+                raise RuntimeError('failed')
+            with lock:
+                calls.append(('end', method, kwargs))
+        return call
+
+    for method in ('create_table_from_local', 'create_table_from_bucket', 'upload_files_to_bucket'):
+        monkeypatch.setattr(f'bq_loader.{method}', recorder(method))
+    return calls
+
+
+class Test_spec:
+
+    def test_dependencies_run_first(self, calls):
+        spec = {'defaults': {'project_id': 'p', 'dataset_id': 'd'},
+                'tasks': [{'name': 'load', 'method': 'create_table_from_bucket', 'depends_on': 'upload',
+                           'table_id': 't'},
+                          {'name': 'upload', 'method': 'upload_files_to_bucket', 'bucket_name': 'b'},
+                          {'name': 'local', 'method': 'create_table_from_local', 'table_id': 'u'}]}
+
+        results = run_spec(spec, max_workers=2)
+
+        assert [result.status for result in results] == [DONE, DONE, DONE]
+        order = [(event, method) for event, method, _ in calls]
+        assert order.index(('end', 'upload_files_to_bucket')) < order.index(('start', 'create_table_from_bucket'))
+        load_kwargs = next(kwargs for _, method, kwargs in calls if method == 'create_table_from_bucket')
+        assert load_kwargs['project_id'] == 'p' and load_kwargs['table_id'] == 't'
+        assert 'metrics' in load_kwargs
+
+    def test_dependents_of_failed_tasks_are_skipped(self, calls):
+        spec = {'tasks': [{'name': 'upload', 'method': 'upload_files_to_bucket', 'fail': True},
+                          {'name': 'load', 'method': 'create_table_from_bucket', 'depends_on': ['upload']},
+                          {'name': 'report', 'method': 'create_table_from_bucket', 'depends_on': ['load']}]}
+
+        results = run_spec(spec)
+
+        assert [result.status for result in results] == [FAILED, SKIPPED, SKIPPED]
+        assert isinstance(results[0].error, RuntimeError)
+
+    def test_failed_bucket_loads_skip_dependents(self, calls, monkeypatch):
+        from google.api_core.exceptions import BadRequest
+        from bq_loader.batch import BucketLoadResult
+
+        def create_table_from_bucket(**kwargs):
+            assert kwargs['raise_errors']
+            raise BadRequest('invalid')
+
+        def create_tables_from_bucket(**kwargs):
+            return [BucketLoadResult(uri='gs://b/a', table_id='a', state='DONE'),
+                    BucketLoadResult(uri='gs://b/b', table_id='b', state='FAILED', error=BadRequest('invalid'))]
+
+        monkeypatch.setattr('bq_loader.create_table_from_bucket', create_table_from_bucket)
+        monkeypatch.setattr('bq_loader.create_tables_from_bucket', create_tables_from_bucket)
+        spec = {'tasks': [{'name': 'load', 'method': 'create_table_from_bucket'},
+                          {'name': 'loads', 'method': 'create_tables_from_bucket'},
+                          {'name': 'after_load', 'method': 'upload_files_to_bucket', 'depends_on': 'load'},
+                          {'name': 'after_loads', 'method': 'upload_files_to_bucket', 'depends_on': 'loads'}]}
+
+        results = run_spec(spec)
+
+        assert [result.status for result in results] == [FAILED, FAILED, SKIPPED, SKIPPED]
+        assert all(isinstance(result.error, BadRequest) for result in results[:2])
+        assert calls == []
+
+    def test_max_workers_limits_concurrency(self, calls):
+        spec = {'max_workers': 2, 'tasks': [{'method': 'upload_files_to_bucket'} for _ in range(6)]}
+
+        run_spec(spec)
+
+        running = peak = 0
+        for event, _, _ in calls:
+            running += 1 if event == 'start' else -1
+            peak = max(peak, running)
+        assert peak == 2
+
+    @pytest.mark.parametrize('tasks', [
+        [{'name': 'a', 'method': 'drop_table'}],
+        [{'name': 'a', 'method': 'upload_files_to_bucket'}, {'name': 'a', 'method': 'upload_files_to_bucket'}],
+        [{'name': 'a', 'method': 'upload_files_to_bucket', 'depends_on': 'b'}],
+        [{'name': 'a', 'method': 'upload_files_to_bucket', 'depends_on': 'b'},
+         {'name': 'b', 'method': 'upload_files_to_bucket', 'depends_on': 'a'}],
+    ])
+    def test_invalid_specs(self, calls, tasks):
+        with pytest.raises(ValueError):
+            run_spec({'tasks': tasks})
+        assert calls == []
+
+    def test_load_spec_from_yaml_and_json(self, tmp_path):
+        pytest.importorskip('yaml')
+        (tmp_path / 'spec.yaml').write_text('tasks:\n  - name: a\n    method: upload_files_to_bucket\n')
+        (tmp_path / 'spec.json').write_text(json.dumps({'tasks': [{'name': 'a', 'method': 'upload_files_to_bucket'}]}))
+
+        assert load_spec(str(tmp_path / 'spec.yaml')) == load_spec(str(tmp_path / 'spec.json'))
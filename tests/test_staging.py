@@ -0,0 +1,107 @@
+import json
+import pytest
+from google.cloud import bigquery
+from bq_loader import create_table_from_local
+from bq_loader.staging import load_staged, merge_statement, shard_files
+from bq_loader.progress import Progress
+from tests.fakes import FakeBigQueryClient
+
+SCHEMA = [{'name': 'id', 'type': 'INTEGER', 'mode': 'NULLABLE'},
+          {'name': 'name', 'type': 'STRING', 'mode': 'NULLABLE'}]
+
+
+@pytest.fixture
+def schema(tmp_path):
+    path = tmp_path / 'schema.json'
+    path.write_text(json.dumps(SCHEMA))
+    return str(path)
+
+
+def write_files(tmp_path, sizes):
+    files = []
+    for i, size in enumerate(sizes):
+        file = tmp_path / f'{i}.jsonl'
+        file.write_bytes(b'x' * size)
+        files.append(str(file))
+    return files
+
+
+def config(write_disposition='WRITE_TRUNCATE'):
+    job_config = bigquery.LoadJobConfig(schema=[bigquery.SchemaField(field['name'], field['type'])
+                                                for field in SCHEMA])
+    job_config.write_disposition = write_disposition
+    return job_config
+
+
+class Test_staging:
+
+    def test_shard_files_balances_bytes(self, tmp_path):
+        files = write_files(tmp_path, [100, 10, 60, 50])
+
+        assert shard_files(files, 2) == [[0, 1], [2, 3]]
+        assert shard_files(files[:1], 4) == [[0]]
+
+    def test_merge_statement(self):
+        table = bigquery.TableReference.from_string('p.d.t')
+        staging = [bigquery.TableReference.from_string(f'p.d.s{n}') for n in range(2)]
+
+        statement = merge_statement(table, staging, ['id', 'name'], ['id'])
+
+        assert statement.startswith('MERGE `p.d.t` AS target')
+        assert 'SELECT * FROM `p.d.s0`\n    UNION ALL\n    SELECT * FROM `p.d.s1`' in statement
+        assert 'ON target.`id` = source.`id`' in statement
+        assert 'WHEN MATCHED THEN UPDATE SET `name` = source.`name`' in statement
+        assert statement.endswith('WHEN NOT MATCHED THEN INSERT ROW')
+
+    def test_load_staged_publishes_with_one_copy(self, tmp_path):
+        files = write_files(tmp_path, [10] * 5)
+        client = FakeBigQueryClient()
+        table = bigquery.TableReference.from_string('p.d.t')
+
+        progress = Progress()
+
+        results = load_staged(client, table, config(), files, shards=2, poll_interval=0.01, progress=progress)
+
+        assert [result.file for result in results] == files
+        snapshot = progress.close()
+        assert (snapshot.files_done, snapshot.jobs_done, snapshot.jobs_total) == (5, 6, 6)
+        destinations = {str(destination) for _, _, destination, _ in client.loaded}
+        assert len(destinations) == 2 and all(name.startswith('p.d.t__staging_') for name in destinations)
+        assert all(job_config.write_disposition == 'WRITE_APPEND' for *_, job_config in client.loaded)
+        [(sources, destination, copy_config)] = client.copies
+        assert sorted(sources) == sorted(destinations) and destination == 'p.d.t'
+        assert copy_config.write_disposition == 'WRITE_TRUNCATE'
+        assert sorted(client.deleted) == sorted(destinations) and not client.tables
+
+    def test_failed_load_leaves_table_untouched(self, tmp_path):
+        files = write_files(tmp_path, [10] * 4)
+        client = FakeBigQueryClient(fail_on=('2.jsonl',))
+        table = bigquery.TableReference.from_string('p.d.t')
+
+        with pytest.raises(RuntimeError):
+            load_staged(client, table, config(), files, shards=2, poll_interval=0.01)
+
+        assert client.copies == [] and client.queries == []
+        assert len(client.deleted) == 2 and not client.tables
+
+    def test_load_staged_merges_on_keys(self, tmp_path):
+        files = write_files(tmp_path, [10] * 3)
+        client = FakeBigQueryClient()
+        table = bigquery.TableReference.from_string('p.d.t')
+
+        load_staged(client, table, config(), files, shards=3, merge_keys=['id'], poll_interval=0.01)
+
+        [query] = client.queries
+        assert query.startswith('MERGE `p.d.t`') and query.count('UNION ALL') == 2
+        assert client.copies == [] and 'p.d.t' in client.tables
+
+    def test_unknown_merge_key(self, tmp_path):
+        table = bigquery.TableReference.from_string('p.d.t')
+
+        with pytest.raises(ValueError):
+            load_staged(FakeBigQueryClient(), table, config(), write_files(tmp_path, [10]), merge_keys=['missing'])
+
+    def test_staging_requires_no_manifest(self, schema):
+        with pytest.raises(ValueError):
+            create_table_from_local('t', 'p', 'd', 'data/*', schema, 'jsonl',
+                                    staging_shards=2, manifest_path='manifest.db')
@@ -0,0 +1,113 @@
+import json
+import threading
+import pytest
+from bq_loader.streaming import stream_rows_to_table, RowSerializer
+
+storage = pytest.importorskip('google.cloud.bigquery_storage_v1')
+from google.api_core.exceptions import ServiceUnavailable  # noqa: E402
+
+SCHEMA = [{'name': 'id', 'type': 'INTEGER', 'mode': 'REQUIRED'},
+          {'name': 'created', 'type': 'TIMESTAMP', 'mode': 'NULLABLE'},
+          {'name': 'day', 'type': 'DATE', 'mode': 'NULLABLE'},
+          {'name': 'tags', 'type': 'STRING', 'mode': 'REPEATED'},
+          {'name': 'author', 'type': 'RECORD', 'mode': 'NULLABLE',
+           'fields': [{'name': 'name', 'type': 'STRING', 'mode': 'NULLABLE'},
+                      {'name': 'orcid', 'type': 'RECORD', 'mode': 'NULLABLE',
+                       'fields': [{'name': 'id', 'type': 'STRING', 'mode': 'NULLABLE'}]}]}]
+
+
+class FakeWriteClient:
+
+    def __init__(self, fail_once=False):
+        self.lock = threading.Lock()
+        self.streams = {}
+        self.finalized = []
+        self.committed = None
+        self.fail_once = fail_once
+
+    def table_path(self, project, dataset, table):
+        return f'projects/{project}/datasets/{dataset}/tables/{table}'
+
+    def create_write_stream(self, parent, write_stream):
+        with self.lock:
+            name = f'{parent}/streams/{len(self.streams)}'
+            self.streams[name] = []
+        return storage.types.WriteStream(name=name, type_=write_stream.type_)
+
+    def append_rows(self, requests):
+        responses = []
+        for request in requests:
+            with self.lock:
+                if self.fail_once:
+                    self.fail_once = False
+                    raise ServiceUnavailable('unavailable')
+                rows = self.streams[request.write_stream]
+                assert request.offset == len(rows)
+                rows.extend(request.proto_rows.rows.serialized_rows)
+            responses.append(storage.types.AppendRowsResponse())
+        return iter(responses)
+
+    def finalize_write_stream(self, name):
+        self.finalized.append(name)
+
+    def batch_commit_write_streams(self, request):
+        self.committed = list(request.write_streams)
+        return storage.types.BatchCommitWriteStreamsResponse()
+
+
+@pytest.fixture
+def schema(tmp_path):
+    path = tmp_path / 'schema.json'
+    path.write_text(json.dumps(SCHEMA))
+    return str(path)
+
+
+class Test_stream_rows_to_table:
+
+    def test_serializer_encodes_bigquery_types(self):
+        serializer = RowSerializer(SCHEMA)
+        message = serializer.message_class.FromString(serializer.serialize(
+            {'id': 1, 'created': '1970-01-01 00:00:01 UTC', 'day': '1970-01-11', 'tags': ['a', 'b'],
+             'author': {'name': 'x', 'orcid': {'id': '0000'}}}))
+
+        assert message.id == 1
+        assert message.created == 1000000
+        assert message.day == 10
+        assert list(message.tags) == ['a', 'b']
+        assert message.author.orcid.id == '0000'
+
+    def test_rows_are_spread_over_streams(self, schema):
+        client = FakeWriteClient()
+
+        result = stream_rows_to_table('t', 'p', 'd', schema, rows=({'id': n} for n in range(25)),
+                                      max_streams=3, batch_rows=4, write_client=client)
+
+        assert result.rows == 25
+        assert result.batches == 7
+        assert sum(len(rows) for rows in client.streams.values()) == 25
+        assert sorted(client.finalized) == sorted(result.streams)
+        assert client.committed is None
+
+    def test_pending_streams_are_committed_together(self, tmp_path, schema):
+        file = tmp_path / 'data.csv'
+        file.write_text('id,created,day\n1,,2021-01-01\n2,2021-01-01 10:00:00,\n')
+        client = FakeWriteClient()
+
+        result = stream_rows_to_table('t', 'p', 'd', schema, file_path=str(file), source_format='csv',
+                                      csv_skip_leading_rows=1, stream_type='pending', write_client=client)
+
+        assert result.rows == 2
+        assert client.committed == result.streams
+
+    def test_failed_append_is_retried_at_the_same_offset(self, schema):
+        client = FakeWriteClient(fail_once=True)
+
+        result = stream_rows_to_table('t', 'p', 'd', schema, rows=[{'id': 1}, {'id': 2}],
+                                      max_streams=1, batch_rows=1, write_client=client)
+
+        assert result.rows == 2
+        assert len(next(iter(client.streams.values()))) == 2
+
+    def test_rows_or_file_path_required(self, schema):
+        with pytest.raises(ValueError):
+            stream_rows_to_table('t', 'p', 'd', schema, write_client=FakeWriteClient())
@@ -0,0 +1,35 @@
+import os
+from bq_loader import upload_files_to_bucket
+from tests.fakes import FakeStorageClient, FakeBlob
+
+
+class Test_sync:
+
+    def test_only_changed_files_are_uploaded(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        os.mkdir('data')
+        for i in range(5):
+            with open(f'data/{i}.jsonl', 'wb') as file:
+                file.write(b'{"a": %d}\n' % i)
+        storage_client = FakeStorageClient()
+        monkeypatch.setattr('bq_loader.get_storage_client', lambda: storage_client)
+        bucket = storage_client.bucket('bucket')
+        bucket.objects['tests/0.jsonl'] = b'{"a": 0}\n'
+        bucket.objects['tests/1.jsonl'] = b'{"a": 9}\n'
+        bucket.objects['tests/old.jsonl'] = b'{}\n'
+
+        uploaded = []
+        original = FakeBlob.upload_from_file
+
+        def upload_from_file(blob, file_obj, **kwargs):
+            uploaded.append(blob.name)
+            original(blob, file_obj, **kwargs)
+
+        monkeypatch.setattr('tests.fakes.FakeBlob.upload_from_file', upload_from_file)
+
+        upload_files_to_bucket('bucket', 'data/*', 'tests', sync=True, delete_orphans=True,
+                               hash_cache_path=str(tmp_path / 'hashes.json'))
+
+        assert sorted(uploaded) == ['tests/1.jsonl', 'tests/2.jsonl', 'tests/3.jsonl', 'tests/4.jsonl']
+        assert sorted(bucket.objects) == [f'tests/{i}.jsonl' for i in range(5)]
+        assert os.path.exists(tmp_path / 'hashes.json')
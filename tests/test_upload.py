@@ -0,0 +1,15 @@
+from bq_loader import upload_files_to_bucket
+from tests.fakes import FakeStorageClient
+
+
+class Test_upload:
+
+    def test_upload_files_to_bucket_uses_shared_client(self, tmp_path, monkeypatch):
+        for i in range(20):
+            (tmp_path / f'{i}.jsonl').write_bytes(b'{"a": %d}\n' % i)
+        storage_client = FakeStorageClient()
+        monkeypatch.setattr('bq_loader.get_storage_client', lambda: storage_client)
+
+        upload_files_to_bucket('bucket', str(tmp_path / '*'), 'tests', max_workers=8)
+
+        assert len(storage_client.bucket('bucket').objects) == 20
@@ -0,0 +1,94 @@
+import json
+import pytest
+from bq_loader.validation import validate_files
+
+SCHEMA = [{'name': 'id', 'type': 'INTEGER', 'mode': 'REQUIRED'},
+          {'name': 'created', 'type': 'TIMESTAMP', 'mode': 'NULLABLE'},
+          {'name': 'tags', 'type': 'STRING', 'mode': 'REPEATED'},
+          {'name': 'author', 'type': 'RECORD', 'mode': 'NULLABLE',
+           'fields': [{'name': 'name', 'type': 'STRING', 'mode': 'REQUIRED'},
+                      {'name': 'score', 'type': 'FLOAT', 'mode': 'NULLABLE'}]}]
+
+CSV_SCHEMA = [{'name': 'id', 'type': 'INTEGER', 'mode': 'REQUIRED'},
+              {'name': 'day', 'type': 'DATE', 'mode': 'NULLABLE'},
+              {'name': 'text', 'type': 'STRING', 'mode': 'NULLABLE'}]
+
+
+@pytest.fixture
+def schema_file(tmp_path):
+    path = tmp_path / 'schema.json'
+    path.write_text(json.dumps(SCHEMA))
+    return str(path)
+
+
+class Test_validation:
+
+    def test_jsonl_errors_report_file_line_and_field(self, tmp_path, schema_file):
+        rows = [{'id': 1, 'created': '2021-01-01 12:00:00 UTC', 'tags': ['a'], 'author': {'name': 'x', 'score': 1.5}},
+                {'id': 'two'},
+                {'id': 3, 'author': {'score': 2}},
+                {'id': 4, 'tags': 'a'},
+                {'id': 5, 'unknown': True}]
+        data = tmp_path / 'data.jsonl'
+        data.write_text('\n'.join(json.dumps(row) for row in rows) + '\n{broken\n')
+
+        report = validate_files([str(data)], schema_file, 'jsonl', max_processes=1)
+
+        assert report.rows == 6 and report.bad_rows == 5
+        assert [(error.line, error.field) for error in report.errors] == [
+            (2, 'id'), (3, 'author.name'), (4, 'tags'), (5, 'unknown'), (6, '')]
+
+    def test_quarantine_splits_valid_and_invalid_rows(self, tmp_path, schema_file):
+        data = tmp_path / 'data.jsonl'
+        data.write_text('{"id": 1}\n{"id": null}\n{"id": 3}\n')
+        quarantine = tmp_path / 'quarantine'
+
+        report = validate_files([str(data)], schema_file, 'jsonl', quarantine_dir=str(quarantine), max_processes=1)
+
+        assert report.files == [str(quarantine / 'data.jsonl')]
+        assert (quarantine / 'data.jsonl').read_text() == '{"id": 1}\n{"id": 3}\n'
+        assert (quarantine / 'data.jsonl.rejected').read_text() == '{"id": null}\n'
+
+    def test_quarantine_keeps_files_of_the_same_name_apart(self, tmp_path, schema_file):
+        for directory, rows in (('a', '{"id": 1}\n{"id": null}\n'), ('b', '{"id": 2}\n{"id": "x"}\n')):
+            (tmp_path / directory).mkdir()
+            (tmp_path / directory / 'part-0.jsonl').write_text(rows)
+        quarantine = tmp_path / 'quarantine'
+        files = [str(tmp_path / 'a' / 'part-0.jsonl'), str(tmp_path / 'b' / 'part-0.jsonl')]
+
+        report = validate_files(files, schema_file, 'jsonl', quarantine_dir=str(quarantine), max_processes=1)
+
+        assert report.files == [str(quarantine / 'a' / 'part-0.jsonl'), str(quarantine / 'b' / 'part-0.jsonl')]
+        assert (quarantine / 'a' / 'part-0.jsonl.rejected').read_text() == '{"id": null}\n'
+        assert (quarantine / 'b' / 'part-0.jsonl.rejected').read_text() == '{"id": "x"}\n'
+
+    def test_csv_syntax_error_rejects_the_rest_of_the_file(self, tmp_path):
+        schema = tmp_path / 'schema.json'
+        schema.write_text(json.dumps(CSV_SCHEMA))
+        data = tmp_path / 'data.csv'
+        data.write_text('1,2021-01-01,a\n2,2021-01-02,"b"x\n3,2021-01-03,c\n4,2021-01-04,d\n')
+        quarantine = tmp_path / 'quarantine'
+
+        report = validate_files([str(data)], str(schema), 'csv', quarantine_dir=str(quarantine), max_processes=1)
+
+        assert report.rows == 4 and report.bad_rows == 3
+        assert report.errors[0].line == 2
+        assert (quarantine / 'data.csv').read_text().splitlines() == ['1,2021-01-01,a']
+        assert (quarantine / 'data.csv.rejected').read_text() == ('2,2021-01-02,"b"x\n3,2021-01-03,c\n'
+                                                                 '4,2021-01-04,d\n')
+
+    def test_csv_columns_types_and_quoted_newlines(self, tmp_path):
+        schema = tmp_path / 'schema.json'
+        schema.write_text(json.dumps(CSV_SCHEMA))
+        data = tmp_path / 'data.csv'
+        data.write_text('id;day;text\n1;2021-02-03;a\n2;2021-02-30;b\n3;;"multi\nline"\n4;2021-01-01\n')
+
+        report = validate_files([str(data)], str(schema), 'csv', csv_field_delimiter=';',
+                                csv_skip_leading_rows=1, max_processes=1)
+
+        assert report.rows == 4 and report.bad_rows == 3
+        assert [(error.line, error.field) for error in report.errors] == [(3, 'day'), (4, ''), (6, 'text')]
+
+    def test_csv_rejects_nested_schema(self, tmp_path, schema_file):
+        with pytest.raises(ValueError):
+            validate_files([], schema_file, 'csv')